@@ -1,13 +1,27 @@
 # agent_chat.py
 import os, json
+import asyncio
+import queue
+import threading
+from typing import List, Optional
+from pydantic import BaseModel, Field
 from langchain_openai import ChatOpenAI
-from langchain.agents import create_react_agent, AgentExecutor, Tool
-from langchain.prompts import PromptTemplate
-from graph_tools import TOOLS
+from langchain.agents import create_react_agent, create_tool_calling_agent, AgentExecutor, Tool
+from langchain.prompts import PromptTemplate, ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.tools import StructuredTool
+from graph_tools import TOOLS, TYPED_TOOLS, pinned_KG
+from intent_router import route
+from graph_rag import graph_context
+
+# "react": free-text Thought/Action loop, tool input is one string the tools parse;
+# "tools": the model's native function calling with typed arguments, several calls per turn;
+# "rag": no agent loop, one model call over the question's subgraph (see graph_rag)
+AGENT_MODE = os.getenv("AGENT_MODE", "react")
+AGENT_MODES = ("react", "tools", "rag")
 
 # Global variables for lazy initialization
 _llm = None
-_agent_executor = None
+_agent_executors = {}
 
 def _get_llm():
     """Get or create LLM instance."""
@@ -20,41 +34,98 @@ def _get_llm():
         _llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, openai_api_key=api_key)
     return _llm
 
-def _get_agent_executor():
-    """Get or create agent executor."""
-    global _agent_executor
-    if _agent_executor is None:
-        # Wrap tools
-        tool_defs = [
-            Tool(
-                name="find_nodes",
-                func=TOOLS["find_nodes"],
-                description=(
-                    "Find nodes in the graph by type and/or label substring. "
-                    "Examples: find_nodes(type_='candidate', label_contains='John Doe') "
-                    "or find_nodes(label_contains='Data Scientist')."
-                ),
-            ),
-            Tool(
-                name="neighbors",
-                func=TOOLS["neighbors"],
-                description=(
-                    "Get neighbors of a node by ID. "
-                    "Example: neighbors('cand:john_doe') or neighbors('job:data_scientist')."
-                ),
-            ),
-            Tool(
-                name="skill_overlap",
-                func=TOOLS["skill_overlap"],
-                description=(
-                    "Compute skill overlap between a candidate and a job. "
-                    "Example: skill_overlap('cand:john_doe', 'job:data_scientist')."
-                ),
-            ),
-        ]
-
-        # Create ReAct prompt template
-        react_prompt = PromptTemplate.from_template("""
+# ----- tool schemas -----------------------------------------------------------
+
+class FindNodesArgs(BaseModel):
+    type_: Optional[str] = Field(None, description="Node type: candidate, job, skill, role, company, ...")
+    label_contains: Optional[str] = Field(None, description="Text the node label contains, e.g. a name or title")
+    limit: Optional[int] = Field(None, description="Page size")
+    cursor: Optional[str] = Field(None, description="next_cursor from the previous page")
+
+class NeighborsArgs(BaseModel):
+    node_id: str = Field(description="Node ID, e.g. cand:john_doe")
+    hops: int = Field(1, description="1 for direct neighbors grouped by relation, up to 3 for the wider neighborhood")
+
+class SkillOverlapArgs(BaseModel):
+    candidate_id: str = Field(description="Candidate node ID")
+    job_id: str = Field(description="Job node ID")
+
+class RankCandidatesArgs(BaseModel):
+    job_id: str = Field(description="Job node ID")
+    k: int = Field(10, description="How many candidates to return")
+
+class RankJobsArgs(BaseModel):
+    candidate_id: str = Field(description="Candidate node ID")
+    k: int = Field(10, description="How many jobs to return")
+
+class BulkOverlapArgs(BaseModel):
+    candidate_ids: List[str] = Field(description="Candidate node IDs")
+    job_ids: List[str] = Field(description="Job node IDs")
+    k: int = Field(20, description="How many of the best pairs to return")
+
+class MatchPatternArgs(BaseModel):
+    pattern: str = Field(description="Path pattern, see the tool description")
+    limit: Optional[int] = Field(None, description="Maximum number of rows")
+
+# (name, description, args schema); the descriptions are shared by both agent modes
+TOOL_SPECS = [
+    (
+        "find_nodes",
+        "Find nodes in the graph by type and/or label substring. Returns the best matches first, "
+        "the total count and a next_cursor when there are more pages. "
+        "Examples: find_nodes(type_='candidate', label_contains='John Doe') "
+        "or find_nodes(label_contains='Data Scientist') "
+        "or find_nodes(type_='skill', limit=50, cursor='3:20') for the next page "
+        "(if the graph changed in between, the cursor is rejected; search again without it).",
+        FindNodesArgs,
+    ),
+    (
+        "neighbors",
+        "Get neighbors of a node by ID. "
+        "Example: neighbors('cand:john_doe') or neighbors('job:data_scientist'). "
+        "Add a hop count for the wider neighborhood in both directions (at most 3): neighbors('cand:john_doe', 2).",
+        NeighborsArgs,
+    ),
+    (
+        "skill_overlap",
+        "Compute skill overlap between a candidate and a job. "
+        "Example: skill_overlap('cand:john_doe', 'job:data_scientist').",
+        SkillOverlapArgs,
+    ),
+    (
+        "rank_candidates_for_job",
+        "Rank the best candidates for a job by the share of its required skills they have, in one call. "
+        "Use this instead of calling skill_overlap per candidate. "
+        "Example: rank_candidates_for_job('job:data_scientist', 10).",
+        RankCandidatesArgs,
+    ),
+    (
+        "rank_jobs_for_candidate",
+        "Rank the jobs that fit a candidate best, in one call. "
+        "Example: rank_jobs_for_candidate('cand:john_doe', 5).",
+        RankJobsArgs,
+    ),
+    (
+        "bulk_skill_overlap",
+        "Skill overlap counts and scores for many candidate/job pairs at once, best pairs first. "
+        "Example: bulk_skill_overlap(candidate_ids=['cand:a', 'cand:b'], job_ids=['job:x', 'job:y']).",
+        BulkOverlapArgs,
+    ),
+    (
+        "match_pattern",
+        "Answer multi-hop questions in one call by matching a path pattern; returns rows of node IDs. "
+        "Nodes: a type (candidate, job, skill, role, company, ...), * for any, type{text} for a label "
+        "containing text, type{=text} for an exact label, or a quoted node ID. "
+        "Edges: -[relation]-> or <-[relation]- (a|b for either relation). "
+        "Example, candidates who worked at a company that also employs someone with Python: "
+        "candidate-[worked_as]->role-[at_company]->company<-[at_company]-role<-[worked_as]-candidate-[has_skill]->skill{=python}",
+        MatchPatternArgs,
+    ),
+]
+
+# ----- agents -----------------------------------------------------------------
+
+REACT_PROMPT = """
 You are a helpful assistant that can answer questions about a knowledge graph. You have to answwer questions like an HR expert.
 
 You have access to the following tools:
@@ -75,18 +146,197 @@ Begin!
 
 Question: {input}
 Thought: {agent_scratchpad}
-""")
+"""
 
-        # Create agent
-        llm = _get_llm()
-        agent = create_react_agent(llm, tool_defs, react_prompt)
-        _agent_executor = AgentExecutor(agent=agent, tools=tool_defs, verbose=True)
-    return _agent_executor
+TOOLS_SYSTEM_PROMPT = (
+    "You are a helpful assistant that can answer questions about a knowledge graph. "
+    "You have to answer questions like an HR expert. Use the tools to look things up; "
+    "when several lookups do not depend on each other, request them together in one turn."
+)
 
-def chat(query: str):
-    """Chat with the graph agent."""
-    try:
-        agent_executor = _get_agent_executor()
+RAG_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a helpful assistant that answers questions about a knowledge graph like an HR expert. "
+     "Answer from the graph context below only; if it does not contain the answer, say so. "
+     "The context is JSON: entities and nodes are [id, type, label] rows, edges are [source, relation, target], "
+     "overlaps are [candidate_id, job_id, overlap, missing, score] where score is the share of the job's "
+     "required skills the candidate has, and top_candidates / top_jobs are ranked [id, overlap, score] rows.\n\n"
+     "Graph context:\n{context}"),
+    ("human", "{input}"),
+])
+
+def answer_with_context(llm, query: str) -> str:
+    """Graph-RAG: exactly one model call, over the subgraph around the entities the question names."""
+    with pinned_KG():
+        context = graph_context(query)
+    return (RAG_PROMPT | llm).invoke({"context": context, "input": query}).content
+
+def _build_agent_executor(llm, mode: str) -> AgentExecutor:
+    """Agent executor over the graph tools for `llm` in the given mode (see AGENT_MODE)."""
+    if mode == "react":
+        tool_defs = [Tool(name=name, func=TOOLS[name], description=description)
+                     for name, description, _ in TOOL_SPECS]
+        agent = create_react_agent(llm, tool_defs, PromptTemplate.from_template(REACT_PROMPT))
+    elif mode == "tools":
+        # typed entry points: the schema's arguments go in as they are, no free-text parsing
+        tool_defs = [StructuredTool.from_function(func=TYPED_TOOLS[name], name=name, description=description,
+                                                  args_schema=schema)
+                     for name, description, schema in TOOL_SPECS]
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", TOOLS_SYSTEM_PROMPT),
+            ("human", "{input}"),
+            MessagesPlaceholder("agent_scratchpad"),
+        ])
+        agent = create_tool_calling_agent(llm, tool_defs, prompt)
+    else:
+        raise ValueError(f"unknown agent mode {mode!r}, expected one of {AGENT_MODES}")
+    return AgentExecutor(agent=agent, tools=tool_defs, verbose=True)
+
+def _get_agent_executor(mode: str = None):
+    """Get or create the agent executor for a mode."""
+    mode = mode or AGENT_MODE
+    if mode not in _agent_executors:
+        _agent_executors[mode] = _build_agent_executor(_get_llm(), mode)
+    return _agent_executors[mode]
+
+def run_agent(agent_executor: AgentExecutor, query: str, mode: str) -> str:
+    """One agent turn against a single pinned KG version."""
+    # one KG version for the whole conversation turn, even if a new one is published meanwhile
+    with pinned_KG():
+        if mode == "tools":
+            # the async executor runs the tool calls of one model turn concurrently
+            return asyncio.run(agent_executor.ainvoke({"input": query}))["output"]
         return agent_executor.invoke({"input": query})["output"]
+
+def _error_message(e: ValueError, mode: str) -> str:
+    if mode not in AGENT_MODES:
+        return f"Error: {e}."
+    return f"Error: {e}. Please set your OPENAI_API_KEY environment variable."
+
+def chat(query: str, mode: str = None):
+    """Chat with the graph agent; template-like questions are answered by intent_router without it."""
+    mode = mode or AGENT_MODE
+    with pinned_KG():
+        answer = route(query)
+    if answer is not None:
+        return answer
+    try:
+        if mode == "rag":
+            return answer_with_context(_get_llm(), query)
+        return run_agent(_get_agent_executor(mode), query, mode)
     except ValueError as e:
-        return f"Error: {e}. Please set your OPENAI_API_KEY environment variable."
+        return _error_message(e, mode)
+
+# ----- streaming --------------------------------------------------------------
+
+_FINAL_ANSWER = "Final Answer:"
+_PREVIEW = 300  # characters of tool input / output sent with a step event
+
+def _preview(value) -> str:
+    value = getattr(value, "content", value)
+    text = value if isinstance(value, str) else json.dumps(value, default=str, ensure_ascii=False)
+    return text if len(text) <= _PREVIEW else text[:_PREVIEW] + "..."
+
+def _chunk_text(chunk) -> str:
+    if isinstance(chunk, str):
+        return chunk
+    content = getattr(chunk, "content", None)
+    if content is None:
+        return getattr(chunk, "text", "")  # completion models stream GenerationChunks
+    return content if isinstance(content, str) else ""
+
+async def astream_turn(query: str, mode: str, runnable):
+    """
+    Events of one chat turn, as dicts with a "type": "tool_start" / "tool_end" for
+    each agent step, "token" for each piece of the final answer as the model
+    writes it, then "done" with the whole answer. `runnable` is the agent
+    executor for "react" / "tools" and the chat model for "rag".
+    """
+    if mode == "rag":
+        with pinned_KG():
+            context = graph_context(query)
+        parts = []
+        async for chunk in (RAG_PROMPT | runnable).astream({"context": context, "input": query}):
+            piece = _chunk_text(chunk)
+            if piece:
+                parts.append(piece)
+                yield {"type": "token", "text": piece}
+        yield {"type": "done", "answer": "".join(parts)}
+        return
+
+    buffers, sent = {}, {}
+    answer, streamed = "", False
+    actions = {}  # tool name -> tool_input of the agent's actions not started yet, in order
+    with pinned_KG():
+        async for ev in runnable.astream_events({"input": query}, version="v2"):
+            kind = ev["event"]
+            if kind == "on_chain_stream" and not ev.get("parent_ids") and isinstance(ev["data"]["chunk"], dict):
+                for action in ev["data"]["chunk"].get("actions", ()):
+                    actions.setdefault(action.tool, []).append(action.tool_input)
+            elif kind == "on_tool_start":
+                queued = actions.get(ev["name"])
+                planned = queued.pop(0) if queued else None
+                # string-input tools (react mode) start with an empty input dict; show the agent's action input
+                tool_input = ev["data"].get("input") or planned
+                yield {"type": "tool_start", "tool": ev["name"], "input": _preview(tool_input)}
+            elif kind == "on_tool_end":
+                yield {"type": "tool_end", "tool": ev["name"], "output": _preview(ev["data"].get("output"))}
+            elif kind in ("on_chat_model_stream", "on_llm_stream"):
+                piece = _chunk_text(ev["data"]["chunk"])
+                if mode == "react":
+                    # a ReAct model call writes Thought/Action text; only what follows
+                    # "Final Answer:" is the answer
+                    run = ev["run_id"]
+                    buf = buffers[run] = buffers.get(run, "") + piece
+                    start = buf.find(_FINAL_ANSWER)
+                    if start < 0:
+                        continue
+                    piece = buf[sent.get(run, start + len(_FINAL_ANSWER)):]
+                    if run not in sent:
+                        piece = piece.lstrip()
+                    sent[run] = len(buf)
+                if piece:
+                    streamed = True
+                    yield {"type": "token", "text": piece}
+            elif kind == "on_chain_end" and not ev.get("parent_ids"):
+                answer = ev["data"]["output"]["output"]
+    if not streamed and answer:
+        yield {"type": "token", "text": answer}  # the model did not stream
+    yield {"type": "done", "answer": answer}
+
+def stream_chat(query: str, mode: str = None):
+    """
+    chat() as an iterator of astream_turn events, for the SSE endpoint. The turn
+    runs on its own event loop in a worker thread; events are handed over as they come.
+    """
+    mode = mode or AGENT_MODE
+    with pinned_KG():
+        answer = route(query)
+    if answer is not None:
+        yield {"type": "token", "text": answer}
+        yield {"type": "done", "answer": answer}
+        return
+
+    events = queue.Queue()
+
+    async def produce():
+        runnable = _get_llm() if mode == "rag" else _get_agent_executor(mode)
+        async for ev in astream_turn(query, mode, runnable):
+            events.put(ev)
+
+    def worker():
+        try:
+            asyncio.run(produce())
+        except ValueError as e:
+            events.put({"type": "error", "message": _error_message(e, mode)})
+        except Exception as e:
+            events.put({"type": "error", "message": f"{type(e).__name__}: {e}"})
+        finally:
+            events.put(None)
+
+    threading.Thread(target=worker, daemon=True).start()
+    while True:
+        ev = events.get()
+        if ev is None:
+            return
+        yield ev
@@ -0,0 +1,143 @@
+# bench_agent.py
+# Replays the same question through the ReAct agent, the tool-calling agent and
+# the single-shot graph-RAG mode with scripted fake LLMs (fixed latency per
+# model call), to compare model turns, tool calls and wall time. The ReAct
+# script includes the usual retry after a malformed Action Input; the
+# tool-calling script asks for independent lookups in one turn. Tool latency
+# stands in for the graph service round trip.
+import asyncio
+import random
+import time
+from langchain_core.language_models import BaseChatModel, LLM
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from graph_tools import set_KG, TOOLS, TYPED_TOOLS
+from agent_chat import _build_agent_executor, run_agent, answer_with_context
+from nx_graph_store import build_nx_from_graph, merge_graphs, top_candidates_for_job
+
+LLM_LATENCY = 0.3
+TOOL_LATENCY = 0.05
+QUESTION = "Who are the 3 best candidates for the Data Scientist job, and which required skills does each miss?"
+SKILLS = [f"skill:s{i}" for i in range(200)]
+
+class ScriptedLLM(LLM):
+    """Completion model that answers with the next scripted text (for the ReAct agent)."""
+    script: list
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs) -> str:
+        time.sleep(self.latency)
+        self.calls += 1
+        return self.script[self.calls - 1]
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that answers with the next scripted message, tool calls included."""
+    script: list
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next(self) -> ChatResult:
+        message = self.script[self.calls]
+        self.calls += 1
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._next()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._next()
+
+def fake_kg(n_cands: int = 500, n_jobs: int = 40):
+    rnd = random.Random(7)
+    graphs = []
+    for i in range(n_cands):
+        skills = rnd.sample(SKILLS, 12)
+        nodes = [{"id": f"cand:c{i}", "type": "candidate", "label": f"Candidate {i}", "props": {}}]
+        nodes += [{"id": s, "type": "skill", "label": s[6:], "props": {}} for s in skills]
+        edges = [{"source": f"cand:c{i}", "relation": "has_skill", "target": s} for s in skills]
+        graphs.append(build_nx_from_graph({"nodes": nodes, "edges": edges})[0])
+    for j in range(n_jobs):
+        job = "job:data_scientist" if j == 0 else f"job:j{j}"
+        skills = rnd.sample(SKILLS, 8)
+        nodes = [{"id": job, "type": "job", "label": "Data Scientist" if j == 0 else f"Job {j}", "props": {}}]
+        nodes += [{"id": s, "type": "skill", "label": s[6:], "props": {}} for s in skills]
+        edges = [{"source": job, "relation": "requires_skill", "target": s} for s in skills]
+        graphs.append(build_nx_from_graph({"nodes": nodes, "edges": edges})[0])
+    return merge_graphs(graphs)
+
+def react_script(top):
+    steps = [
+        # the model forgets the comma, the tool parses it into a type that matches nothing
+        ("find_nodes", "type_=job label_contains=Data Scientist"),
+        ("find_nodes", 'type_="job", label_contains="Data Scientist"'),
+        ("rank_candidates_for_job", "'job:data_scientist', 3"),
+    ] + [("skill_overlap", f"'{c}', 'job:data_scientist'") for c in top]
+    script = [f"Thought: next lookup\nAction: {name}\nAction Input: {arg}" for name, arg in steps]
+    return script + ["Thought: I now know the final answer\nFinal Answer: " + ", ".join(top)]
+
+def tools_script(top):
+    def call(i, name, **args):
+        return {"name": name, "args": args, "id": f"call_{i}"}
+    return [
+        AIMessage(content="", tool_calls=[call(0, "find_nodes", type_="job", label_contains="Data Scientist")]),
+        AIMessage(content="", tool_calls=[call(1, "rank_candidates_for_job", job_id="job:data_scientist", k=3)]),
+        AIMessage(content="", tool_calls=[call(2 + i, "skill_overlap", candidate_id=c, job_id="job:data_scientist")
+                                          for i, c in enumerate(top)]),
+        AIMessage(content=", ".join(top)),
+    ]
+
+def _slow(fn, counter):
+    def wrapper(*args, **kwargs):
+        counter[0] += 1
+        time.sleep(TOOL_LATENCY)
+        return fn(*args, **kwargs)
+    return wrapper
+
+def run(mode: str, top):
+    tool_calls = [0]
+    originals = dict(TOOLS), dict(TYPED_TOOLS)
+    for table, fns in zip((TOOLS, TYPED_TOOLS), originals):
+        table.update({name: _slow(fn, tool_calls) for name, fn in fns.items()})
+    try:
+        if mode == "rag":
+            llm = ScriptedChatModel(script=[AIMessage(content=", ".join(top))], latency=LLM_LATENCY)
+            t0 = time.perf_counter()
+            answer = answer_with_context(llm, QUESTION)
+        else:
+            if mode == "react":
+                llm = ScriptedLLM(script=react_script(top), latency=LLM_LATENCY)
+            else:
+                llm = ScriptedChatModel(script=tools_script(top), latency=LLM_LATENCY)
+            executor = _build_agent_executor(llm, mode)
+            executor.verbose = False
+            t0 = time.perf_counter()
+            answer = run_agent(executor, QUESTION, mode)
+        seconds = time.perf_counter() - t0
+    finally:
+        for table, fns in zip((TOOLS, TYPED_TOOLS), originals):
+            table.update(fns)
+    assert answer == ", ".join(top), answer
+    return llm.calls, tool_calls[0], seconds
+
+if __name__ == "__main__":
+    KG = fake_kg()
+    set_KG(KG)
+    top = [r["candidate_id"] for r in top_candidates_for_job(KG, "job:data_scientist", 3)]
+    print(f"{'mode':>6} {'llm calls':>10} {'tool calls':>11} {'seconds':>9}")
+    for mode in ("react", "tools", "rag"):
+        llm_calls, tool_calls, seconds = run(mode, top)
+        print(f"{mode:>6} {llm_calls:>10} {tool_calls:>11} {seconds:>9.2f}")
@@ -0,0 +1,36 @@
+# bench_merge.py
+# Times build_nx_from_graph + merge_graphs on synthetic CV/JD graphs that share
+# popular skill/company nodes (with list props), to check merge cost stays linear.
+import random
+import time
+from nx_graph_store import build_nx_from_graph, merge_graphs
+
+SKILLS = [f"skill:s{i}" for i in range(300)]
+COMPANIES = [f"company:c{i}" for i in range(40)]
+
+def fake_cv(i: int, rnd: random.Random) -> dict:
+    cand = f"cand:{i}"
+    skills = rnd.sample(SKILLS, 12)
+    company = rnd.choice(COMPANIES)
+    nodes = [{"id": cand, "type": "candidate", "label": f"Candidate {i}", "props": {"location": "Beirut"}}]
+    nodes += [{"id": s, "type": "skill", "label": s[6:], "props": {"aliases": [s[6:], s[6:].upper()]}} for s in skills]
+    nodes.append({"id": company, "type": "company", "label": company[8:],
+                  "props": {"alumni": [{"candidate": cand}], "info": {"tags": [rnd.randint(0, 50)]}}})
+    nodes.append({"id": f"role:{i}", "type": "role", "label": "Engineer", "props": {"years": rnd.randint(1, 9)}})
+    edges = [{"source": cand, "relation": "has_skill", "target": s} for s in skills]
+    edges.append({"source": cand, "relation": "worked_as", "target": f"role:{i}"})
+    edges.append({"source": f"role:{i}", "relation": "at_company", "target": company})
+    return {"nodes": nodes, "edges": edges}
+
+def run(n: int) -> float:
+    rnd = random.Random(n)
+    graphs = [build_nx_from_graph(fake_cv(i, rnd))[0] for i in range(n)]
+    t0 = time.perf_counter()
+    merge_graphs(graphs)
+    return time.perf_counter() - t0
+
+if __name__ == "__main__":
+    print(f"{'graphs':>8} {'seconds':>9} {'us/graph':>9}")
+    for n in (500, 1000, 2000, 4000, 8000):
+        t = run(n)
+        print(f"{n:>8} {t:>9.3f} {t / n * 1e6:>9.1f}")
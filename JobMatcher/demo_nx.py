@@ -1,6 +1,6 @@
 # demo_nx.py
 import json
-from nx_graph_store import build_nx_from_graph, merge_graphs, find_nodes, skill_overlap, simple_draw
+from nx_graph_store import build_nx_from_graph, merge_graphs, find_nodes, skill_overlap, simple_draw, top_candidates_for_job
 
 # Pretend these are the LLM outputs from graph_extraction_chain.extract_graph_from_text(...)
 cv_graph = {
@@ -43,5 +43,8 @@ print("\nOverlap cand vs job:")
 ov = skill_overlap(KG, "cand:alice_johnson", "job:data_scientist_acme")
 print(json.dumps(ov, indent=2))
 
+print("\nTop candidates for job:")
+print(json.dumps(top_candidates_for_job(KG, "job:data_scientist_acme", k=5), indent=2))
+
 # Visualize (local debug)
 simple_draw(KG, node_limit=50)
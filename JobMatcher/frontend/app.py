@@ -1,6 +1,7 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, make_response
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, make_response, Response, stream_with_context
 import requests
 import os
+import json
 from datetime import datetime
 from flask_mail import Mail, Message
 import re
@@ -10,8 +11,10 @@ import requests
 import time
 from nx_graph_store import build_nx_from_graph, merge_graphs, find_nodes, skill_overlap, simple_draw
 from nx_graph_store import build_nx_from_graph, merge_graphs, save_gpickle
-from graph_tools import set_KG
-from agent_chat import chat
+from nx_graph_store import LoggedGraph, ego_graph, ego_to_networkx
+from graph_tools import set_KG, kg_status, GRAPH_PATH, EXPORT_PATH, KG_SERVICE
+from graph_service import GraphClient
+from agent_chat import chat, stream_chat
 app = Flask(__name__)
 
 
@@ -39,6 +42,11 @@ BACKEND_API_URL = "http://backend:5000"
 CV_EXTRACTION_URL = os.getenv('CV_EXTRACTION_URL')
 JOB_DESCRIPTION_URL = os.getenv('JOB_DESCRIPTION_URL')
 
+# KG persisted as snapshot + delta log; changes are exported to the read-only copy graph_tools workers attach to.
+# Loaded on first use. Every worker may write it: writes take the log's file lock and first
+# replay what the other workers wrote (see LoggedGraph), so they never overwrite each other
+KG_LOG = LoggedGraph(GRAPH_PATH, export_path=EXPORT_PATH)
+
 
 # ========================
 #   LOGIN
@@ -467,28 +475,56 @@ def visualise_graph():
 
     ## get all cv and applicanr graphs
     cv_response = requests.get(f"{BACKEND_API_URL}/get_applicants")
-    cv_graphs = cv_response.json().get('cv_graph', [])
+    applications = cv_response.json().get('applications', [])
 
 
     ## get all job and offered job graphs
     job_response = requests.get(f"{BACKEND_API_URL}/get_offered_job")
-    job_graphs = job_response.json().get('job_graph', [])
+    jobs = job_response.json().get('jobs', [])
     
 
 
-    # Build graphs
-    G_cv, _ = build_nx_from_graph(cv_graphs)
-    G_jd, _ = build_nx_from_graph(job_graphs)
-
-    # Merge into a single knowledge graph
-    KG = merge_graphs([G_cv, G_jd])
-
-    save_gpickle(KG, r"C:\Users\aline\Desktop\hackathon")
+    entities = {}
+    for prefix, rows, field in (("cv", applications, "cv_graph"), ("job", jobs, "job_graph")):
+        for row in rows:
+            graph = row.get(field)
+            if isinstance(graph, str):
+                graph = json.loads(graph)
+            if graph:
+                entities[f"{prefix}:{row.get('id')}"] = graph
+
+    if KG_SERVICE:
+        # the graph service is the single writer; it applies the diff and publishes the new version
+        GraphClient(KG_SERVICE).sync_entities(entities)
+        return jsonify({"status": "ok"})
+
+    # Apply only what changed to the long-lived knowledge graph, in one step under the
+    # log's write lock (other requests and other workers wait their turn);
+    # each change is one fsync'd log append, compaction happens periodically
+    changed = KG_LOG.sync(entities)
+
+    # publish an immutable version: agent requests in flight keep the one they pinned,
+    # and the next ingest writes to a copy-on-write fork instead of this graph
+    KG = KG_LOG.snapshot()
     set_KG(KG)  # Update the global KG in graph_tools
+    if changed:
+        # other workers map the exported copy and re-attach on the version bump;
+        # a burst of changed requests is exported once
+        KG_LOG.export_soon()
+
+    # Visualize (local debug): the neighborhood of ?node=<id> when given, else the densest part
+    center = request.args.get("node")
+    if center:
+        ego = ego_graph(KG, center, request.args.get("hops", 2, type=int), max_nodes=50)
+        simple_draw(ego_to_networkx(ego), node_limit=50)
+    else:
+        simple_draw(KG, node_limit=50)
 
-    # Visualize (local debug)
-    simple_draw(KG, node_limit=50)
 
+@app.route('/kg_status')
+def graph_status():
+    """Version and load time of the KG the agent is answering from (hot-reloaded in the background)."""
+    return jsonify(kg_status())
 
 # ===========================
 #   Agent prompt
@@ -500,16 +536,39 @@ def agent_chat():
     """
     # read the prompt from the chatbox
     user_prompt = request.form.get("prompt")
+    # optional mode per request: "react", "tools" or "rag" (default AGENT_MODE)
+    mode = request.form.get("mode") or None
 
     if not user_prompt:
         return jsonify({"error": "No prompt provided"}), 400
 
     print(f"User asked: {user_prompt}")
     try:
-        answer = chat(user_prompt)
+        answer = chat(user_prompt, mode=mode)
         return jsonify({"response": answer})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/Agent/stream', methods=['GET', 'POST'])
+def agent_chat_stream():
+    """
+    Same as /Agent, as Server-Sent Events: tool_start / tool_end while the agent
+    works, token events with the answer as it is written, then done (or error).
+    """
+    user_prompt = request.values.get("prompt")
+    mode = request.values.get("mode") or None
+
+    if not user_prompt:
+        return jsonify({"error": "No prompt provided"}), 400
+
+    print(f"User asked (stream): {user_prompt}")
+
+    def events():
+        for event in stream_chat(user_prompt, mode=mode):
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=3000)
\ No newline at end of file
@@ -0,0 +1,360 @@
+# graph_service.py
+"""
+Standalone graph service: one process per host owns the KG, its indexes and
+the delta log, and answers queries for the frontend workers / agent over a
+Unix socket (or localhost TCP where there are no Unix sockets).
+
+Run:    python graph_service.py            (address from KG_SERVICE)
+Client: graph_tools uses GraphClient when KG_SERVICE is set, e.g.
+        KG_SERVICE=unix:/tmp/kg.sock  or  KG_SERVICE=tcp:127.0.0.1:7690
+
+Protocol: length-prefixed frames, ">IB" header (body length, codec) then the
+body, msgpack ("M") when installed on the sending side, else JSON ("J").
+Requests are [id, op, args], responses [id, ok, result]. A connection may
+send any number of requests before reading (pipelining); responses come back
+in request order.
+"""
+import ipaddress
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import threading
+from typing import Any, Dict, Iterable, List, Tuple
+
+try:
+    import msgpack  # optional: smaller and faster frames than JSON
+except ImportError:
+    msgpack = None
+
+from nx_graph_store import (
+    LoggedGraph, find_nodes, neighbors_of, targets_of, sources_of,
+    skill_overlap, top_candidates_for_job, top_jobs_for_candidate, match_pattern,
+    ego_graph, skill_overlap_batch, node_labels, nodes_by_label, skills_of,
+)
+
+KG_SERVICE = os.getenv("KG_SERVICE", "")
+
+_HEADER = struct.Struct(">IB")
+_WINDOW = 128  # requests in flight per pipeline round, keeps both socket buffers from filling up
+_MSGPACK, _JSON = ord("M"), ord("J")
+
+class GraphServiceError(RuntimeError):
+    """The service answered a request with an error."""
+
+# ----- framing ----------------------------------------------------------------
+
+def _encode(obj) -> bytes:
+    if msgpack is not None:
+        body, codec = msgpack.packb(obj, use_bin_type=True, default=str), _MSGPACK
+    else:
+        body, codec = json.dumps(obj, separators=(",", ":"), default=str).encode(), _JSON
+    return _HEADER.pack(len(body), codec) + body
+
+def _read_frame(f):
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None  # peer closed
+    n, codec = _HEADER.unpack(header)
+    body = f.read(n)
+    if len(body) < n:
+        return None
+    return _decode(codec, body)
+
+def _decode(codec: int, body: bytes):
+    if codec == _MSGPACK:
+        if msgpack is None:
+            raise ValueError("peer sent msgpack but msgpack is not installed here")
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+def _parse_address(address: str) -> Tuple[str, Any]:
+    """'unix:/path' or 'tcp:host:port' -> (family, address)."""
+    kind, _, rest = address.partition(":")
+    if kind == "unix":
+        return "unix", rest
+    if kind == "tcp":
+        host, _, port = rest.rpartition(":")
+        return "tcp", (host or "127.0.0.1", int(port))
+    raise ValueError(f"KG_SERVICE must look like unix:/path or tcp:host:port, got {address!r}")
+
+# ----- server -----------------------------------------------------------------
+
+class GraphService:
+    """
+    The single writer: ingest goes through `log` (see LoggedGraph), readers get
+    the last published immutable version, so queries never wait for a write.
+    """
+    def __init__(self, snapshot_path: str, export_path: str | None = None):
+        self.log = LoggedGraph(snapshot_path, export_path=export_path)
+        self.write_lock = threading.Lock()
+        self.version = 1
+        self.current = self.log.snapshot()
+
+    def _publish(self, changed: bool) -> None:
+        if changed:
+            self.version += 1
+            self.current = self.log.snapshot()
+            self.log.export_soon()  # batched: the exported copy is a full rewrite
+
+    def sync(self, entities: Dict[str, Any]) -> bool:
+        """Make the KG hold exactly these entity graphs (what /visualise_graph sends)."""
+        with self.write_lock:
+            changed = self.log.sync(entities)
+            self._publish(changed)
+            return changed
+
+    def upsert(self, entity_id: str, graph: Dict[str, Any]) -> bool:
+        with self.write_lock:
+            changed = self.log.upsert_entity_graph(entity_id, graph)
+            self._publish(changed)
+            return changed
+
+    def remove(self, entity_id: str) -> bool:
+        with self.write_lock:
+            changed = self.log.remove_entity_graph(entity_id)
+            self._publish(changed)
+            return changed
+
+    def handle(self, op: str, args: Dict[str, Any]):
+        G = self.current
+        if op == "find_nodes":
+            return [[nid, data.get("type"), data.get("label")] for nid, data in find_nodes(G, **args)]
+        if op == "neighbors":
+            return neighbors_of(G, args["node_id"])
+        if op == "targets":
+            return targets_of(G, args["node_id"], args["relation"])
+        if op == "sources":
+            return sources_of(G, args["node_id"], args["relation"])
+        if op == "skills":
+            return skills_of(G, args["node_id"], args["relation"])
+        if op == "skill_overlap":
+            return skill_overlap(G, args["candidate_id"], args["job_id"])
+        if op == "top_candidates":
+            return top_candidates_for_job(G, args["job_id"], args.get("k", 10))
+        if op == "top_jobs":
+            return top_jobs_for_candidate(G, args["candidate_id"], args.get("k", 10))
+        if op == "match":
+            return match_pattern(G, args["pattern"], args.get("limit", 50))
+        if op == "ego":
+            return ego_graph(G, args["node_id"], args.get("hops", 1), relations=args.get("relations"),
+                             max_nodes=args.get("max_nodes", 50), direction=args.get("direction", "both"))
+        if op == "overlap_batch":
+            return skill_overlap_batch(G, [tuple(p) for p in args["pairs"]])
+        if op == "labels":
+            return node_labels(G, args["node_ids"])
+        if op == "by_label":
+            return nodes_by_label(G, args["labels"])
+        if op == "status":
+            return {"version": self.version, "nodes": G.number_of_nodes(), "edges": G.number_of_edges()}
+        if op == "sync":
+            return self.sync(args["entities"])
+        if op == "upsert":
+            return self.upsert(args["entity_id"], args["graph"])
+        if op == "remove":
+            return self.remove(args["entity_id"])
+        raise ValueError(f"unknown op {op!r}")
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        service = self.server.service
+        sock = self.request
+        buf = bytearray()
+        while True:
+            data = sock.recv(1 << 16)
+            if not data:
+                return
+            buf += data
+            # answer every complete request received so far, then reply in one write,
+            # so pipelined requests cost one round trip
+            out = []
+            while len(buf) >= _HEADER.size:
+                n, codec = _HEADER.unpack_from(buf)
+                end = _HEADER.size + n
+                if len(buf) < end:
+                    break
+                req_id, op, args = _decode(codec, bytes(buf[_HEADER.size:end]))
+                del buf[:end]
+                try:
+                    out.append(_encode([req_id, True, service.handle(op, args or {})]))
+                except Exception as e:
+                    out.append(_encode([req_id, False, f"{type(e).__name__}: {e}"]))
+            if out:
+                sock.sendall(b"".join(out))
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def make_server(address: str, service: GraphService) -> socketserver.BaseServer:
+    """
+    Server for `address`. The protocol has no authentication and sync/upsert/remove
+    rewrite the KG, so only local peers may connect: TCP binds to loopback only,
+    and the Unix socket is made owner-only (0600) before it accepts connections.
+    """
+    family, addr = _parse_address(address)
+    if family == "unix":
+        try:
+            st = os.lstat(addr)
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(st.st_mode):
+                raise FileExistsError(f"{addr} exists and is not a socket; not removing it")
+            os.remove(addr)  # stale socket from a previous run
+        server = _UnixServer(addr, _Handler, bind_and_activate=False)
+        try:
+            server.server_bind()
+            os.chmod(addr, 0o600)
+            server.server_activate()
+        except BaseException:
+            server.server_close()
+            raise
+    else:
+        if not _is_loopback(addr[0]):
+            raise ValueError(f"graph service only listens on loopback, not {addr[0]!r}")
+        server = _TCPServer(addr, _Handler)
+    server.service = service
+    return server
+
+# ----- client -----------------------------------------------------------------
+
+class GraphClient:
+    """
+    Talks to the graph service. Has the query methods of the in-process stores
+    (neighbors_of, find_nodes, skill_overlap, ...), so graph_tools can serve
+    from it unchanged. One connection per thread.
+    """
+    def __init__(self, address: str = KG_SERVICE, timeout: float = 30.0):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            family, addr = _parse_address(self.address)
+            sock = socket.socket(socket.AF_UNIX if family == "unix" else socket.AF_INET, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(addr)
+            conn = self._local.conn = (sock, sock.makefile("rb"), [0])
+        return conn
+
+    def pipeline(self, calls: Iterable[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """Send the (op, args) requests back to back, then read the answers in order."""
+        calls = list(calls)
+        if len(calls) > _WINDOW:
+            return [r for i in range(0, len(calls), _WINDOW) for r in self.pipeline(calls[i:i + _WINDOW])]
+        sock, rfile, counter = self._conn()
+        ids, frames = [], []
+        for op, args in calls:
+            counter[0] += 1
+            ids.append(counter[0])
+            frames.append(_encode([counter[0], op, args]))
+        try:
+            sock.sendall(b"".join(frames))
+            responses = [_read_frame(rfile) for _ in ids]
+        except OSError:
+            self.close()
+            raise
+        results = []
+        for req_id, resp in zip(ids, responses):
+            if resp is None:
+                self.close()
+                raise GraphServiceError("graph service closed the connection")
+            _, ok, result = resp
+            if not ok:
+                raise GraphServiceError(result)
+            results.append(result)
+        return results
+
+    def call(self, op: str, **args):
+        return self.pipeline([(op, args)])[0]
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+            self._local.conn = None
+
+    # same surface as the in-process stores
+
+    def neighbors_of(self, node_id: str) -> Dict[str, Any]:
+        return self.call("neighbors", node_id=node_id)
+
+    def targets_of(self, node_id: str, relation: str) -> List[str]:
+        return self.call("targets", node_id=node_id, relation=relation)
+
+    def sources_of(self, node_id: str, relation: str) -> List[str]:
+        return self.call("sources", node_id=node_id, relation=relation)
+
+    def find_nodes(self, **filters):
+        for nid, type_, label in self.call("find_nodes", **filters):
+            yield nid, {"type": type_, "label": label}
+
+    def skills_of(self, node_id: str, relation: str) -> List[str]:
+        return self.call("skills", node_id=node_id, relation=relation)
+
+    def skill_overlap(self, candidate_id: str, job_id: str) -> Dict[str, Any]:
+        return self.call("skill_overlap", candidate_id=candidate_id, job_id=job_id)
+
+    def top_candidates_for_job(self, job_id: str, k: int = 10) -> List[Dict[str, Any]]:
+        return self.call("top_candidates", job_id=job_id, k=k)
+
+    def top_jobs_for_candidate(self, candidate_id: str, k: int = 10) -> List[Dict[str, Any]]:
+        return self.call("top_jobs", candidate_id=candidate_id, k=k)
+
+    def match_pattern(self, pattern: str, limit: int = 50) -> Dict[str, Any]:
+        return self.call("match", pattern=pattern, limit=limit)
+
+    def ego_graph(self, node_id: str, hops: int = 1, relations=None, max_nodes: int = 50,
+                  direction: str = "both") -> Dict[str, Any]:
+        return self.call("ego", node_id=node_id, hops=hops, max_nodes=max_nodes, direction=direction,
+                         relations=None if relations is None else list(relations))
+
+    def skill_overlap_batch(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        return self.call("overlap_batch", pairs=[list(p) for p in pairs])
+
+    def node_labels(self, node_ids: List[str]) -> Dict[str, str | None]:
+        return self.call("labels", node_ids=node_ids)
+
+    def nodes_by_label(self, labels: List[str]) -> Dict[str, List[str]]:
+        return self.call("by_label", labels=labels)
+
+    def number_of_nodes(self) -> int:
+        return self.call("status")["nodes"]
+
+    def number_of_edges(self) -> int:
+        return self.call("status")["edges"]
+
+    def sync_entities(self, entities: Dict[str, Any]) -> bool:
+        return self.call("sync", entities=entities)
+
+def main():
+    from graph_tools import GRAPH_PATH, EXPORT_PATH
+
+    address = KG_SERVICE or "unix:/tmp/kg.sock"
+    service = GraphService(GRAPH_PATH, export_path=EXPORT_PATH)
+    server = make_server(address, service)
+    print(f"Graph service on {address} ({service.current.number_of_nodes()} nodes)")
+    try:
+        server.serve_forever()
+    finally:
+        service.log.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,392 @@
 # graph_tools.py
-from nx_graph_store import find_nodes, neighbors_of, skill_overlap, load_gpickle
+from nx_graph_store import (
+    find_nodes, skill_overlap, match_pattern, ego_graph, load_gpickle, GraphChannel,
+    top_candidates_for_job, top_jobs_for_candidate, skill_overlap_batch, node_labels, skills_of,
+)
 import json
 import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Tuple
 
 GRAPH_PATH = r"C:\Users\aline\Desktop\hackathon\graph.gpickle"
+# memory-mapped snapshot (see nx_graph_store.save_snapshot); preferred over the pickle when present
+SNAPSHOT_PATH = os.path.splitext(GRAPH_PATH)[0] + ".kgsnap"
+# out-of-core SQLite store (see nx_graph_store.SQLiteGraph) for graphs that don't fit in RAM
+SQLITE_PATH = os.path.splitext(GRAPH_PATH)[0] + ".sqlite"
 
-# Initialize KG as None, will be set when graph is created
-KG = None
+# "auto" (snapshot, then pickle), "snapshot", "sqlite" or "gpickle"
+KG_BACKEND = os.getenv("KG_BACKEND", "auto").lower()
+KG_CACHE_SIZE = int(os.getenv("KG_CACHE_SIZE", "50000"))
+# read-only copy the writer exports for the configured backend
+EXPORT_PATH = SQLITE_PATH if KG_BACKEND == "sqlite" else SNAPSHOT_PATH
+# address of a shared graph service (see graph_service.py), e.g. unix:/tmp/kg.sock;
+# when set, queries go there instead of to an in-process KG
+KG_SERVICE = os.getenv("KG_SERVICE", "")
+# seconds between checks for a changed KG file; 0 disables background reloads
+KG_RELOAD_INTERVAL = float(os.getenv("KG_RELOAD_INTERVAL", "2"))
+# workers map EXPORT_PATH read-only and re-attach when the writer publishes a new version
+_channel = GraphChannel(EXPORT_PATH)
+
+class KGVersion:
+    """One published, immutable KG. Readers hold on to it; writers publish a new one."""
+    __slots__ = ("version", "graph", "published_at", "load_seconds", "source")
+
+    def __init__(self, version: int, graph, published_at: float, load_seconds: float = 0.0, source=None):
+        self.version = version
+        self.graph = graph
+        self.published_at = published_at
+        self.load_seconds = load_seconds  # time spent loading it from disk (0 for set_KG)
+        self.source = source  # (channel version, file signature) it corresponds to
+
+# swapped as a whole (a single reference assignment), so readers never need a lock
+_current = KGVersion(0, None, 0.0)
+_publish_lock = threading.Lock()  # serializes writers only
+_pinned: ContextVar = ContextVar("kg_pinned", default=None)
+_watcher = None
+
+def _source_path():
+    """File the KG is loaded from: the exported copy if there is one, else the pickle."""
+    if KG_BACKEND != "gpickle" and os.path.exists(EXPORT_PATH):
+        return EXPORT_PATH
+    return GRAPH_PATH
+
+def _source_state():
+    """What is on disk right now: (channel version, (path, mtime, size, inode)) or None if missing."""
+    if KG_SERVICE:
+        return 0, (KG_SERVICE, 0, 0, 0)  # the service reloads and publishes on its own
+    path = _source_path()
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    version = _channel.version() if path == EXPORT_PATH else 0
+    return version, (path, st.st_mtime_ns, st.st_size, st.st_ino)
+
+def publish_KG(G) -> KGVersion:
+    """Make G the version new readers see. G must not be mutated afterwards (see LoggedGraph.snapshot)."""
+    with _publish_lock:
+        # G is at least as new as what is on disk, so the watcher must not reload over it
+        return _publish(G, source=_source_state())
+
+def _publish(G, load_seconds: float = 0.0, source=None) -> KGVersion:
+    global _current
+    _current = KGVersion(_current.version + 1, G, time.time(), load_seconds, source)
+    return _current
+
+def set_KG(G):
+    publish_KG(G)
+
+def current_version() -> KGVersion:
+    return _current
+
+def kg_status():
+    """Version, publish time and load time of the KG being served (for health checks)."""
+    v = _current
+    return {
+        "version": v.version,
+        "loaded": v.graph is not None,
+        "published_at": v.published_at,
+        "load_seconds": round(v.load_seconds, 3),
+        "source": v.source[1][0] if v.source else None,
+    }
+
+def _load_source():
+    """(source, graph, seconds) for what is on disk; graph is None if there is nothing."""
+    source = _source_state()
+    if source is None:
+        return None, None, 0.0
+    t = time.perf_counter()
+    if KG_SERVICE:
+        from graph_service import GraphClient
+        G = GraphClient(KG_SERVICE)
+    elif source[1][0] == EXPORT_PATH:
+        G = _channel.attach(cache_size=KG_CACHE_SIZE)[1]
+    else:
+        G = load_gpickle(GRAPH_PATH)
+    return source, G, time.perf_counter() - t
 
 def _ensure_kg_loaded():
     """Ensure KG is loaded, load from file if not already loaded."""
-    global KG
-    if KG is None:
-        if os.path.exists(GRAPH_PATH):
-            KG = load_gpickle(GRAPH_PATH)
-        else:
-            # Return empty results if no graph exists yet
-            return False
+    if _current.graph is None:
+        with _publish_lock:
+            if _current.graph is None:
+                source, G, seconds = _load_source()
+                if G is None:
+                    # Return empty results if no graph exists yet
+                    return False
+                _publish(G, seconds, source)
+    _start_watcher()
     return True
 
-def set_KG(G):
-    global KG
-    KG = G
+def reload_KG_if_changed() -> bool:
+    """
+    Load the KG again if its file changed since the served version, and swap it
+    in. Queries keep using the old version while the new one loads.
+    """
+    seen = _current
+    source = _source_state()
+    if source is None or source == seen.source:
+        return False
+    source, G, seconds = _load_source()
+    if G is None:
+        return False
+    with _publish_lock:
+        if _current is not seen:
+            return False  # someone published meanwhile; that version wins
+        _publish(G, seconds, source)
+    return True
 
-def tool_find_nodes(type_: str = None, label_contains: str = None) -> str:
-    """Find nodes in the graph. Can handle both correct parameters and agent's string format."""
+def _watch():
+    """Reload loop: inotify on the graph directory when available, mtime polling otherwise."""
+    try:
+        from inotify_simple import INotify, flags
+        inotify = INotify()
+        mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE
+        for path in {GRAPH_PATH, EXPORT_PATH, _channel.version_path}:
+            inotify.add_watch(os.path.dirname(path) or ".", mask)
+    except (ImportError, OSError):
+        inotify = None
+    while True:
+        if inotify is not None:
+            inotify.read(timeout=int(KG_RELOAD_INTERVAL * 1000))  # wake early on file events
+        else:
+            time.sleep(KG_RELOAD_INTERVAL)
+        try:
+            reload_KG_if_changed()
+        except Exception as e:  # a half-copied or corrupt file; keep serving and retry later
+            print(f"KG reload failed: {e}")
+
+def _start_watcher():
+    global _watcher
+    if _watcher is None and KG_RELOAD_INTERVAL > 0:
+        with _publish_lock:
+            if _watcher is None:
+                _watcher = threading.Thread(target=_watch, name="kg-reload", daemon=True)
+                _watcher.start()
+
+@contextmanager
+def pinned_KG():
+    """Serve every tool call inside the block (e.g. one agent request) from the same KG version."""
+    _ensure_kg_loaded()
+    token = _pinned.set(_current)
+    try:
+        yield _current
+    finally:
+        _pinned.reset(token)
+
+def get_KG():
+    """Graph for the running tool call: the pinned version, else the latest one."""
     if not _ensure_kg_loaded():
-        return json.dumps([], indent=2)
-    
+        return None
+    pinned = _pinned.get()
+    return pinned.graph if pinned is not None and pinned.graph is not None else _current.graph
+
+# ----- response shaping -------------------------------------------------------
+
+# results per page, and a rough cap on the size of one tool observation
+TOOL_LIMIT = int(os.getenv("KG_TOOL_LIMIT", "20"))
+TOOL_TOKEN_BUDGET = int(os.getenv("KG_TOOL_TOKEN_BUDGET", "1200"))
+# ids compared per bulk_skill_overlap call (candidates x jobs pairs)
+BULK_MAX_CANDIDATES = 200
+BULK_MAX_JOBS = 50
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1  # ~4 characters per token for JSON-ish text
+
+def fit_json(payload, lists, budget: int = None) -> str:
+    """
+    Serialize payload compactly. While it is over the token budget, cut the
+    tail of the longest of `lists` (ranked, best first), so the most relevant
+    entries survive; sets payload["truncated"] when anything was cut.
+    """
+    budget = budget or TOOL_TOKEN_BUDGET
+    text = _dumps(payload)
+    while _tokens(text) > budget:
+        longest = max(lists, key=len, default=None)
+        if longest is None or len(longest) <= 1:
+            break
+        del longest[max(1, len(longest) * 3 // 4):]
+        payload["truncated"] = True
+        text = _dumps(payload)
+    return text
+
+def _serving_version() -> int:
+    """Version of the KG the running tool call reads (see get_KG)."""
+    pinned = _pinned.get()
+    return (pinned if pinned is not None and pinned.graph is not None else _current).version
+
+def _cursor(offset: int) -> str:
+    """Opaque next-page token: "<KG version>:<offset>"."""
+    return f"{_serving_version()}:{offset}"
+
+def _offset(cursor) -> int | None:
+    """
+    Offset a cursor points at, or None if it was made on another KG version:
+    the results may have shifted since, so its offset would skip or repeat some.
+    """
+    version, _, offset = str(cursor).strip("'\" ").rpartition(":")
+    try:
+        if version and int(version) != _serving_version():
+            return None
+        return max(0, int(offset))
+    except ValueError:
+        return 0
+
+def _label_rank(label: str, q: str):
+    """Exact label matches first, then prefix, then word-start, then other substrings; shorter first."""
+    label = (label or "").lower()
+    if not q:
+        return (0, 0)
+    q = q.lower()
+    if label == q:
+        return (0, len(label))
+    if label.startswith(q):
+        return (1, len(label))
+    if f" {q}" in f" {label}":
+        return (2, len(label))
+    return (3, len(label))
+
+# ----- tools --------------------------------------------------------------------
+# kg_* take typed arguments as they are (function-calling agents, see agent_chat
+# mode "tools"); tool_* take the ReAct agent's free-text input, parse it and call them.
+
+def kg_find_nodes(type_: str = None, label_contains: str = None, limit: int = None, cursor: str = None) -> str:
+    """Find nodes by type and/or label substring, best matches first, one page at a time."""
+    KG = get_KG()
+    if KG is None:
+        return _dumps({"total": 0, "results": []})
+    results = [{"id": nid, "type": data.get("type"), "label": data.get("label")}
+               for nid, data in find_nodes(KG, type_=type_, label_contains=label_contains)]
+    # ties by id, so pages line up the same on every backend
+    results.sort(key=lambda r: (_label_rank(r["label"], label_contains), r["id"]))
+    offset = _offset(cursor) if cursor else 0
+    if offset is None:
+        return _dumps({"error": "stale cursor: the graph changed since that page; search again without a cursor"})
+    page = results[offset:offset + (limit or TOOL_LIMIT)]
+    payload = {"total": len(results), "results": page}
+    text = fit_json(payload, [page])
+    if offset + len(page) < len(results):
+        payload["next_cursor"] = _cursor(offset + len(page))
+        text = _dumps(payload)
+    return text
+
+def kg_neighbors(node_id: str, hops: int = 1) -> str:
+    """Outgoing neighbors grouped by relation (1 hop), or the ego graph up to 3 hops."""
+    KG = get_KG()
+    if KG is None:
+        return _dumps({})
+    if hops <= 1:
+        # outgoing edges grouped by relation, from the (cached) 1-hop ego graph
+        ego = ego_graph(KG, node_id, 1, max_nodes=None, direction="out")
+        grouped = {}
+        for u, rel, v in ego["edges"]:
+            if u == node_id:
+                grouped.setdefault(rel, []).append(v)
+        totals = {rel: len(targets) for rel, targets in grouped.items()}
+        grouped = {rel: targets[:TOOL_LIMIT] for rel, targets in grouped.items()}
+        payload = {"neighbors": grouped, "totals": totals}
+        if any(len(targets) < totals[rel] for rel, targets in grouped.items()):
+            payload["truncated"] = True
+        return fit_json(payload, list(grouped.values()))
+    ego = ego_graph(KG, node_id, min(hops, 3), max_nodes=50)
+    # nodes come in BFS order (closest first), so cutting the tail drops the farthest ones
+    nodes = [[n["id"], n["type"], n["label"], n["hop"]] for n in ego["nodes"]]
+    payload = {"center": node_id, "hops": ego["hops"], "nodes": nodes, "edges": [list(e) for e in ego["edges"]],
+               "truncated": ego["truncated"]}
+    text = fit_json(payload, [nodes])
+    if len(nodes) < len(ego["nodes"]):
+        kept = {n[0] for n in nodes}
+        payload["edges"] = [e for e in payload["edges"] if e[0] in kept and e[2] in kept]
+        text = _dumps(payload)
+    return text
+
+def kg_skill_overlap(candidate_id: str, job_id: str) -> str:
+    """Skills of a candidate and a job, their overlap and what is missing."""
+    KG = get_KG()
+    if KG is None:
+        return _dumps({"candidate_skills": [], "job_required_skills": [], "overlap": [], "missing": [], "jaccard": 0.0})
+    payload = skill_overlap(KG, candidate_id, job_id)
+    payload["jaccard"] = round(payload["jaccard"], 3)
+    payload["counts"] = {k: len(payload[k]) for k in ("candidate_skills", "job_required_skills", "overlap", "missing")}
+    # the full skill lists are the longest, so they are cut before overlap / missing
+    return fit_json(payload, [payload["candidate_skills"], payload["job_required_skills"], payload["missing"], payload["overlap"]])
+
+def kg_match_pattern(pattern: str, limit: int = None) -> str:
+    """Run a multi-hop path pattern (see nx_graph_store.parse_pattern) in one call."""
+    KG = get_KG()
+    if KG is None:
+        return _dumps({"rows": []})
+    try:
+        payload = match_pattern(KG, pattern, limit=limit or TOOL_LIMIT)
+    except ValueError as e:
+        return _dumps({"error": str(e)})
+    return fit_json(payload, [payload["rows"]])
+
+def kg_rank_candidates_for_job(job_id: str, k: int = 10) -> str:
+    """Top-k candidates for a job by share of its required skills they have, in one call."""
+    KG = get_KG()
+    if KG is None:
+        return _dumps({"results": []})
+    k = max(1, min(int(k or 10), 50))
+    ranked = top_candidates_for_job(KG, job_id, k)
+    labels = node_labels(KG, [r["candidate_id"] for r in ranked])
+    payload = {
+        "job_id": job_id,
+        "required_skills": len(skills_of(KG, job_id, "requires_skill")),
+        "columns": ["candidate_id", "label", "overlap", "score"],
+        "results": [[r["candidate_id"], labels.get(r["candidate_id"]), r["overlap"], round(r["score"], 3)] for r in ranked],
+    }
+    return fit_json(payload, [payload["results"]])
+
+def kg_rank_jobs_for_candidate(candidate_id: str, k: int = 10) -> str:
+    """Top-k jobs for a candidate by share of each job's required skills the candidate has."""
+    KG = get_KG()
+    if KG is None:
+        return _dumps({"results": []})
+    k = max(1, min(int(k or 10), 50))
+    ranked = top_jobs_for_candidate(KG, candidate_id, k)
+    labels = node_labels(KG, [r["job_id"] for r in ranked])
+    payload = {
+        "candidate_id": candidate_id,
+        "columns": ["job_id", "label", "overlap", "score"],
+        "results": [[r["job_id"], labels.get(r["job_id"]), r["overlap"], round(r["score"], 3)] for r in ranked],
+    }
+    return fit_json(payload, [payload["results"]])
+
+def kg_bulk_skill_overlap(candidate_ids: List[str], job_ids: List[str], k: int = 20) -> str:
+    """Skill overlap for every candidate x job pair, best pairs first (counts only)."""
+    KG = get_KG()
+    if KG is None:
+        return _dumps({"results": []})
+    candidate_ids, job_ids = list(candidate_ids or []), list(job_ids or [])
+    if not candidate_ids or not job_ids:
+        return _dumps({"error": "Need at least one candidate id and one job id"})
+    dropped = {"candidate_ids": max(0, len(candidate_ids) - BULK_MAX_CANDIDATES),
+               "job_ids": max(0, len(job_ids) - BULK_MAX_JOBS)}
+    candidate_ids, job_ids = candidate_ids[:BULK_MAX_CANDIDATES], job_ids[:BULK_MAX_JOBS]
+    rows = skill_overlap_batch(KG, [(c, j) for c in candidate_ids for j in job_ids])
+    rows.sort(key=lambda r: (-r["jaccard"], -r["overlap"], r["candidate_id"], r["job_id"]))
+    top = [[r["candidate_id"], r["job_id"], r["overlap"], r["missing"], round(r["jaccard"], 3)] for r in rows[:k]]
+    payload = {"pairs": len(rows), "columns": ["candidate_id", "job_id", "overlap", "missing", "score"], "results": top}
+    if any(dropped.values()):
+        payload.update(truncated=True, dropped=dropped,
+                       error=f"only the first {BULK_MAX_CANDIDATES} candidate ids and {BULK_MAX_JOBS} job ids "
+                             "were compared; call again with the rest")
+    return fit_json(payload, [top])
+
+def tool_find_nodes(type_: str = None, label_contains: str = None, limit: int = None, cursor: str = None) -> str:
+    """Find nodes in the graph. Can handle both correct parameters and agent's string format."""
     # Handle the case where agent passes a single string like "type_=None, label_contains=\"Some Name\""
     if isinstance(type_, str) and "=" in type_ and label_contains is None:
         try:
-            # Extract parameters from string like "type_=None, label_contains=\"Some Name\""
+            # Extract parameters from string like "type_=None, label_contains=\"Some Name\", limit=10"
             parts = type_.split(", ")
             parsed_type = None
             parsed_label = None
@@ -45,37 +400,28 @@ def tool_find_nodes(type_: str = None, label_contains: str = None) -> str:
                     label_val = part.split("label_contains=")[1].strip()
                     if label_val != "None":
                         parsed_label = label_val.strip('"\'')
+                elif "limit=" in part:
+                    limit = int(part.split("limit=")[1].strip().strip('"\''))
+                elif "cursor=" in part:
+                    cursor = part.split("cursor=")[1].strip()
             
             type_ = parsed_type
             label_contains = parsed_label
         except Exception:
             # If parsing fails, just return empty results instead of special-casing names
-            return json.dumps([], indent=2)
-    
-    results = list(find_nodes(KG, type_=type_, label_contains=label_contains))
-    return json.dumps(
-        [{"id": nid, "type": data.get("type"), "label": data.get("label")}
-         for nid, data in results],
-        indent=2
-    )
-
-def tool_neighbors(node_id: str) -> str:
+            return _dumps({"total": 0, "results": []})
+    return kg_find_nodes(type_, label_contains, limit, cursor)
+
+def tool_neighbors(node_id: str, hops: int = 1) -> str:
     """Get neighbors of a node. Can handle quoted node IDs from the agent."""
-    if not _ensure_kg_loaded():
-        return json.dumps({}, indent=2)
-    
-    # Handle quoted node IDs from the agent
-    if node_id.startswith("'") and node_id.endswith("'"):
-        node_id = node_id[1:-1]
-    elif node_id.startswith('"') and node_id.endswith('"'):
-        node_id = node_id[1:-1]
-    
-    return json.dumps(neighbors_of(KG, node_id), indent=2)
+    # Handle the agent passing "'cand:john_doe', 2" or "cand:john_doe, hops=2";
+    # ids may contain commas themselves ("company:acme, inc."), so only a trailing count is split off
+    node_id, count = _split_count(node_id, "hops")
+    if count is not None:
+        hops = count
+    return kg_neighbors(_strip_quotes(node_id), hops)
 
 def tool_skill_overlap(candidate_id: str, job_id: str = None) -> str:
-    if not _ensure_kg_loaded():
-        return json.dumps({"candidate_skills": [], "job_required_skills": [], "overlap": [], "missing": [], "jaccard": 0.0}, indent=2)
-    
     # Handle the case where agent passes a single string like "candidate_id='cand:john_doe', job_id='job:data_scientist'"
     if job_id is None and isinstance(candidate_id, str) and "=" in candidate_id:
         try:
@@ -95,26 +441,104 @@ def tool_skill_overlap(candidate_id: str, job_id: str = None) -> str:
             candidate_id = parsed_candidate_id
             job_id = parsed_job_id
         except Exception:
-            return json.dumps({"error": "Failed to parse arguments"}, indent=2)
+            return _dumps({"error": "Failed to parse arguments"})
+    elif job_id is None and isinstance(candidate_id, str):
+        # positional, as in the tool description: "'cand:john_doe', 'job:data_scientist'"
+        quoted = [a or b for a, b in re.findall(r"'([^']*)'|\"([^\"]*)\"", candidate_id)]
+        ids = quoted if len(quoted) == 2 else NODE_ID.findall(candidate_id)
+        if len(ids) == 2:
+            candidate_id, job_id = ids
     
     if candidate_id is None or job_id is None:
-        return json.dumps({"error": "Both candidate_id and job_id are required"}, indent=2)
+        return _dumps({"error": "Both candidate_id and job_id are required"})
     
     # Handle quoted node IDs from the agent
-    if candidate_id.startswith("'") and candidate_id.endswith("'"):
-        candidate_id = candidate_id[1:-1]
-    elif candidate_id.startswith('"') and candidate_id.endswith('"'):
-        candidate_id = candidate_id[1:-1]
-    
-    if job_id.startswith("'") and job_id.endswith("'"):
-        job_id = job_id[1:-1]
-    elif job_id.startswith('"') and job_id.endswith('"'):
-        job_id = job_id[1:-1]
-    
-    return json.dumps(skill_overlap(KG, candidate_id, job_id), indent=2)
+    return kg_skill_overlap(_strip_quotes(candidate_id), _strip_quotes(job_id))
+
+def tool_match_pattern(pattern: str, limit: int = None) -> str:
+    """Run a multi-hop path pattern; accepts the agent wrapping it in quotes or as pattern="..."."""
+    pattern = pattern.strip()
+    if pattern.startswith("pattern="):
+        pattern = pattern[len("pattern="):].strip()
+    if len(pattern) > 1 and pattern[0] == pattern[-1] and pattern[0] in "'`\"" and pattern[0] not in pattern[1:-1]:
+        pattern = pattern[1:-1]
+    return kg_match_pattern(pattern, limit)
+
+def _strip_quotes(value: str) -> str:
+    value = value.strip()
+    if len(value) > 1 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    return value
+
+def _split_count(text: str, name: str) -> Tuple[str, int | None]:
+    """Split a trailing ", 5" / ", name=5" off the agent's input: (rest, 5), or (text, None) without one."""
+    m = re.fullmatch(rf"(.*),\s*(?:{name}\s*=\s*)?['\"]?(\d+)['\"]?\s*", str(text), re.S)
+    if m is None:
+        return str(text), None
+    return m.group(1), int(m.group(2))
 
+def _id_and_k(text: str, name: str, k):
+    """Split the agent's "'job:x', 5" / "job_id='job:x', k=5" into (id, k)."""
+    node_id, count = _split_count(text, "k")
+    node_id = node_id.strip()
+    if node_id.startswith(name + "="):
+        node_id = node_id[len(name) + 1:]
+    if count is not None:
+        k = count
+    return _strip_quotes(node_id), k
+
+# a node id ("cand:42", "job:data-scientist") inside free text
+NODE_ID = re.compile(r"[A-Za-z_][\w\-]*:[^\s,'\"\[\]()]+")
+
+def tool_rank_candidates_for_job(job_id: str, k: int = 10) -> str:
+    """Top-k candidates for a job; accepts the agent's "'job:x', 5" form."""
+    return kg_rank_candidates_for_job(*_id_and_k(job_id, "job_id", k))
+
+def tool_rank_jobs_for_candidate(candidate_id: str, k: int = 10) -> str:
+    """Top-k jobs for a candidate; accepts the agent's "'cand:x', 5" form."""
+    return kg_rank_jobs_for_candidate(*_id_and_k(candidate_id, "candidate_id", k))
+
+def tool_bulk_skill_overlap(candidate_ids, job_ids=None, k: int = 20) -> str:
+    """Skill overlap for many pairs; accepts the agent's single-string forms."""
+    # Handle the agent's single string: "candidate_ids=['cand:a', 'cand:b'], job_ids=['job:x']",
+    # "['cand:a', 'cand:b'], ['job:x']" or just a mix of ids (job:... ids are taken as jobs)
+    if job_ids is None and isinstance(candidate_ids, str):
+        text = candidate_ids
+        if "job_ids" in text:
+            cand_part, _, job_part = text.partition("job_ids")
+        elif text.count("[") >= 2:
+            cand_part, _, job_part = text.partition("]")
+        else:
+            cand_part, job_part = text, ""
+        candidate_ids, job_ids = NODE_ID.findall(cand_part), NODE_ID.findall(job_part)
+        if "k=" in job_part:
+            try:
+                k = int(job_part.rpartition("k=")[2].strip(" '\")]"))
+            except ValueError:
+                pass
+        if not job_ids:
+            job_ids = [i for i in candidate_ids if i.startswith("job:")]
+            candidate_ids = [i for i in candidate_ids if not i.startswith("job:")]
+    return kg_bulk_skill_overlap(candidate_ids, job_ids, k)
+
+# ReAct agent: one free-text input per call
 TOOLS = {
     "find_nodes": tool_find_nodes,
     "neighbors": tool_neighbors,
     "skill_overlap": tool_skill_overlap,
+    "match_pattern": tool_match_pattern,
+    "rank_candidates_for_job": tool_rank_candidates_for_job,
+    "rank_jobs_for_candidate": tool_rank_jobs_for_candidate,
+    "bulk_skill_overlap": tool_bulk_skill_overlap,
+}
+
+# function-calling agents: arguments already typed by the schema
+TYPED_TOOLS = {
+    "find_nodes": kg_find_nodes,
+    "neighbors": kg_neighbors,
+    "skill_overlap": kg_skill_overlap,
+    "match_pattern": kg_match_pattern,
+    "rank_candidates_for_job": kg_rank_candidates_for_job,
+    "rank_jobs_for_candidate": kg_rank_jobs_for_candidate,
+    "bulk_skill_overlap": kg_bulk_skill_overlap,
 }
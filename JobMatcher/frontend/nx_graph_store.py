@@ -1,11 +1,28 @@
 # nx_graph_store.py
 from __future__ import annotations
+import copy
 import json
+import re
 import hashlib
-from typing import Dict, Any, Iterable, Tuple
+from typing import Dict, Any, Iterable, Tuple, List
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+from contextlib import contextmanager
+from bisect import bisect_left
 import networkx as nx
+import heapq
 import pickle
 import os
+import mmap
+import sqlite3
+import struct
+import threading
+import weakref
+import zlib
+try:
+    import fcntl  # advisory locks between processes writing one LoggedGraph (POSIX only)
+except ImportError:
+    fcntl = None
 
 # ----- utilities --------------------------------------------------------------
 
@@ -32,24 +49,240 @@ def _canonical_id(n: Dict[str, Any]) -> str:
     raw = json.dumps({"id": nid, "type": ntype, "label": label, "props": n.get("props", {})}, sort_keys=True)
     return f"node:{hashlib.sha1(raw.encode()).hexdigest()[:12]}"
 
-def _merge_props(dst: Dict[str, Any], src: Dict[str, Any]) -> Dict[str, Any]:
-    out = dict(dst or {})
+def _own(v: Any) -> Any:
+    """
+    Private copy of a props value that later merges may extend in place.
+    Dicts are copied all the way down; lists shallowly, since merges only
+    ever append to them and never modify their items.
+    """
+    if isinstance(v, dict):
+        return {k: _own(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return list(v)
+    return v
+
+def _fingerprint(x: Any) -> Any:
+    # scalars compare as (type, value), same outcome as their JSON without the dumps
+    if x is None or isinstance(x, (str, int)):
+        return (type(x), x)
+    return json.dumps(x, sort_keys=True)
+
+def _merge_props_into(dst: Dict[str, Any], src: Dict[str, Any] | None, fps: Dict[int, Tuple[list, set]]) -> None:
+    """
+    In-place _merge_props. `dst` must be owned (see _own). `fps` caches the
+    fingerprints of each dst list across calls (keyed by id, holding the list
+    so the id cannot be recycled), so a list shared by many inputs is only
+    fingerprinted once instead of on every merge.
+    """
     for k, v in (src or {}).items():
-        if k not in out or out[k] in (None, "", [], {}):
-            out[k] = v
+        cur = dst.get(k, _MISSING)
+        if cur is _MISSING or cur in (None, "", [], {}):
+            dst[k] = _own(v)
         # simple union for lists (best-effort)
-        elif isinstance(out[k], list) and isinstance(v, list):
-            seen = set(json.dumps(x, sort_keys=True) for x in out[k])
+        elif isinstance(cur, list) and isinstance(v, list):
+            entry = fps.get(id(cur))
+            if entry is None or entry[0] is not cur:
+                entry = fps[id(cur)] = (cur, {_fingerprint(x) for x in cur})
+            seen = entry[1]
             for item in v:
-                j = json.dumps(item, sort_keys=True)
-                if j not in seen:
-                    out[k].append(item)
-                    seen.add(j)
+                f = _fingerprint(item)
+                if f not in seen:
+                    cur.append(item)
+                    seen.add(f)
         # simple merge for dicts
-        elif isinstance(out[k], dict) and isinstance(v, dict):
-            out[k] = _merge_props(out[k], v)
+        elif isinstance(cur, dict) and isinstance(v, dict):
+            _merge_props_into(cur, v, fps)
+
+def _merge_props(dst: Dict[str, Any], src: Dict[str, Any]) -> Dict[str, Any]:
+    out = _own(dst or {})
+    _merge_props_into(out, src, {})
     return out
 
+def _owned_props(data: Dict[str, Any]) -> Dict[str, Any]:
+    props = data.get("props")
+    if not isinstance(props, dict):
+        props = data["props"] = {}
+    return props
+
+# `sources` are interned frozensets: nodes/edges with the same provenance share one object
+_SOURCES: Dict[frozenset, frozenset] = {}
+
+def _intern_sources(sources: Iterable[str]) -> frozenset:
+    fs = frozenset(sources)
+    return _SOURCES.setdefault(fs, fs)
+
+def _union_sources(a: Iterable[str] | None, b: Iterable[str] | None) -> frozenset:
+    a = a or _intern_sources(())
+    if type(a) is frozenset and (not b or a.issuperset(b)):
+        return a
+    return _intern_sources(set(a).union(b or ()))
+
+_LLM_SOURCES = _intern_sources(["llm"])
+_MISSING = object()
+
+# ----- indexes ----------------------------------------------------------------
+
+_EMPTY: Dict[str, None] = {}
+
+def _cow_slot(owned: set | None, table: dict, key, new=dict):
+    """
+    table[key] ready to be written: created if missing, copied first if it may
+    still be shared with a fork. `owned` holds (id(table), key) of the entries
+    copied since the last fork; None means nothing is shared.
+    """
+    inner = table.get(key)
+    if inner is None:
+        inner = table[key] = new()
+    elif owned is None or (id(table), key) in owned:
+        return inner
+    else:
+        inner = table[key] = inner.copy()
+    if owned is not None:
+        owned.add((id(table), key))
+    return inner
+
+def _search_label(data: Dict[str, Any]) -> str:
+    """Normalized label find_nodes matches against."""
+    return _norm(data.get("label", "")) or _norm((data.get("props") or {}).get("name", ""))
+
+def _trigrams(s: str) -> set[str]:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+class KGIndex:
+    """
+    Secondary indexes kept alongside a KG.
+    - out[(source, relation)] -> targets, inc[(target, relation)] -> sources,
+      so "jobs requiring skill:python" costs the size of the answer, not the
+      degree of the node. Dicts are used as insertion-ordered sets.
+    - by_type[type] -> nodes, plus normalized labels with an exact-match map
+      and a trigram index (labels padded with \x02/\x03 so prefixes get
+      their own grams) for find_nodes.
+    """
+    def __init__(self):
+        self.out: Dict[Tuple[str, str], Dict[str, None]] = {}
+        self.inc: Dict[Tuple[str, str], Dict[str, None]] = {}
+        self.out_rels: Dict[str, Dict[str, None]] = {}
+        self.in_rels: Dict[str, Dict[str, None]] = {}
+        self.types: Dict[str, str | None] = {}
+        self.by_type: Dict[str | None, Dict[str, None]] = {}
+        self.labels: Dict[str, str] = {}
+        self.by_label: Dict[str, Dict[str, None]] = {}
+        self.grams: Dict[str, set] = {}
+        self.version = 0  # bumped on every change; lets derived caches detect staleness
+        self.owned: set | None = None  # see _cow_slot; set once the index has been forked
+
+    def _slot(self, table: dict, key, new=dict):
+        return _cow_slot(self.owned, table, key, new)
+
+    def add_node(self, nid: str, data: Dict[str, Any]) -> None:
+        """Index a new node, or re-index one whose type/label changed."""
+        self.add_label(nid, data.get("type"), _search_label(data))
+
+    def add_label(self, nid, t: str | None, label: str) -> None:
+        """add_node for a node given by its type and normalized label (see _search_label)."""
+        if nid not in self.types or self.types[nid] != t:
+            if nid in self.types:
+                self._slot(self.by_type, self.types[nid]).pop(nid, None)
+            self.types[nid] = t
+            self._slot(self.by_type, t)[nid] = None
+            self.version += 1
+        old = self.labels.get(nid)
+        if old == label:
+            return
+        if old is not None:
+            self._slot(self.by_label, old).pop(nid, None)
+            for g in _trigrams(f"\x02{old}\x03"):
+                self._slot(self.grams, g, set).discard(nid)
+        self.labels[nid] = label
+        self._slot(self.by_label, label)[nid] = None
+        for g in _trigrams(f"\x02{label}\x03"):
+            self._slot(self.grams, g, set).add(nid)
+        self.version += 1
+
+    def remove_node(self, nid: str) -> None:
+        if nid not in self.types:
+            return
+        self._slot(self.by_type, self.types.pop(nid)).pop(nid, None)
+        label = self.labels.pop(nid)
+        self._slot(self.by_label, label).pop(nid, None)
+        for g in _trigrams(f"\x02{label}\x03"):
+            self._slot(self.grams, g, set).discard(nid)
+        self.version += 1
+
+    def remove_edge(self, u: str, v: str, rel: str) -> None:
+        for adj, rels, a, b in ((self.out, self.out_rels, u, v), (self.inc, self.in_rels, v, u)):
+            if (a, rel) not in adj:
+                continue
+            targets = self._slot(adj, (a, rel))
+            targets.pop(b, None)
+            if not targets:
+                del adj[(a, rel)]
+                self._slot(rels, a).pop(rel, None)
+        self.version += 1
+
+    def search_label(self, q: str, mode: str = "contains") -> Iterable[str]:
+        """Node ids whose normalized label equals / starts with / contains q."""
+        if mode == "exact":
+            return self.by_label.get(q, _EMPTY)
+        probe = f"\x02{q}" if mode == "prefix" else q
+        if mode == "prefix":
+            test = lambda nid: self.labels[nid].startswith(q)
+        else:
+            test = lambda nid: q in self.labels[nid]
+        if len(probe) < 3:
+            # too short for a trigram; still cheaper than re-normalizing every label
+            return [nid for nid in self.labels if test(nid)]
+        postings = sorted((self.grams.get(g, set()) for g in _trigrams(probe)), key=len)
+        hits = postings[0].intersection(*postings[1:])
+        return [nid for nid in hits if test(nid)]
+
+    def add_edge(self, u: str, v: str, rel: str) -> None:
+        self._slot(self.out, (u, rel))[v] = None
+        self._slot(self.inc, (v, rel))[u] = None
+        self._slot(self.out_rels, u)[rel] = None
+        self._slot(self.in_rels, v)[rel] = None
+        self.version += 1
+
+    def fork(self) -> "KGIndex":
+        """
+        Index for a forked KG. Only the tables are copied; both indexes share
+        the per-key containers and copy one on its first write (see _cow_slot).
+        """
+        idx = KGIndex.__new__(KGIndex)
+        for name in ("out", "inc", "out_rels", "in_rels", "types", "by_type", "labels", "by_label", "grams"):
+            setattr(idx, name, dict(getattr(self, name)))
+        idx.version = self.version
+        idx.owned = set()
+        self.owned = set()
+        return idx
+
+    def targets(self, node_id: str, rel: str) -> Dict[str, None]:
+        return self.out.get((node_id, rel), _EMPTY)
+
+    def sources(self, node_id: str, rel: str) -> Dict[str, None]:
+        return self.inc.get((node_id, rel), _EMPTY)
+
+# one index per live graph; dropped together with the graph
+_INDEXES: "weakref.WeakKeyDictionary[nx.MultiDiGraph, KGIndex]" = weakref.WeakKeyDictionary()
+
+def build_index(G: nx.MultiDiGraph) -> KGIndex:
+    """(Re)build the index of G from scratch, e.g. after editing G directly."""
+    idx = KGIndex()
+    for nid, data in G.nodes(data=True):
+        idx.add_node(nid, data)
+    for u, v, key, data in G.edges(keys=True, data=True):
+        idx.add_edge(u, v, data.get("relation") or key)
+    _INDEXES[G] = idx
+    return idx
+
+def get_index(G: nx.MultiDiGraph) -> KGIndex:
+    """Index of G, built lazily (e.g. for graphs coming from load_gpickle)."""
+    idx = _INDEXES.get(G)
+    return idx if idx is not None else build_index(G)
+
+def _indexed_skills(G: nx.MultiDiGraph, idx: KGIndex, node_id: str, rel: str) -> set[str]:
+    return {s for s in idx.targets(node_id, rel) if G.nodes[s].get("type") == "skill"}
+
 # ----- builders / mergers -----------------------------------------------------
 
 def build_nx_from_graph(graph_json: Dict[str, Any]) -> Tuple[nx.MultiDiGraph, Dict[str, str]]:
@@ -58,6 +291,8 @@ def build_nx_from_graph(graph_json: Dict[str, Any]) -> Tuple[nx.MultiDiGraph, Di
     Returns (G, id_map) where id_map maps original ids -> canonical ids.
     """
     G = nx.MultiDiGraph()
+    idx = _INDEXES[G] = KGIndex()
+    fps: Dict[int, Tuple[list, set]] = {}
     id_map: Dict[str, str] = {}
 
     # add nodes
@@ -71,11 +306,12 @@ def build_nx_from_graph(graph_json: Dict[str, Any]) -> Tuple[nx.MultiDiGraph, Di
         id_map[orig_id] = cid
 
         if cid not in G:
-            G.add_node(cid, type=ntype, label=label, props=props, sources=set(["llm"]))
+            G.add_node(cid, type=ntype, label=label, props=_own(props), sources=_LLM_SOURCES)
         else:
             # merge with existing
-            G.nodes[cid]["props"] = _merge_props(G.nodes[cid].get("props", {}), props)
-            G.nodes[cid]["sources"].add("llm")
+            _merge_props_into(_owned_props(G.nodes[cid]), props, fps)
+            G.nodes[cid]["sources"] = _union_sources(G.nodes[cid].get("sources"), _LLM_SOURCES)
+        idx.add_node(cid, G.nodes[cid])
 
     # add edges
     for e in graph_json.get("edges", []):
@@ -84,71 +320,456 @@ def build_nx_from_graph(graph_json: Dict[str, Any]) -> Tuple[nx.MultiDiGraph, Di
         rel = (e.get("relation") or "").lower()
         # store relation/weight; use key to keep parallel edges if needed
         key = rel or "related_to"
-        G.add_edge(src, tgt, key=key, relation=rel, weight=1, sources=set(["llm"]))
+        new = [n for n in (src, tgt) if n not in G]
+        G.add_edge(src, tgt, key=key, relation=rel, weight=1, sources=_LLM_SOURCES)
+        for n in new:
+            idx.add_node(n, G.nodes[n])  # created bare by add_edge, as in _merge_edge
+        idx.add_edge(src, tgt, rel or key)
     return G, id_map
 
+def _merge_node(KG: nx.MultiDiGraph, idx: KGIndex, nid: str, data: Dict[str, Any], fps: Dict[int, Tuple[list, set]]) -> None:
+    """Fold one node into KG. Inputs are never mutated; KG owns its props and merges into them in place."""
+    if nid not in KG:
+        attrs = dict(data)
+        if "props" in attrs:
+            attrs["props"] = _own(attrs["props"])
+        attrs["sources"] = _intern_sources(data.get("sources", ()))
+        KG.add_node(nid, **attrs)
+    else:
+        node = _writable_node(KG, nid)
+        _merge_props_into(_owned_props(node), data.get("props"), fps)
+        node["sources"] = _union_sources(node.get("sources"), data.get("sources"))
+        # ensure type/label preserved
+        if not node.get("label") and data.get("label"):
+            node["label"] = data["label"]
+        if not node.get("type") and data.get("type"):
+            node["type"] = data["type"]
+    idx.add_node(nid, KG.nodes[nid])
+
+def _merge_edge(KG: nx.MultiDiGraph, idx: KGIndex, u: str, v: str, key: str, edata: Dict[str, Any]) -> None:
+    if KG.has_edge(u, v, key=key):
+        e = _writable_edges(KG, u, v)[key]
+        e["weight"] = e.get("weight", 1) + edata.get("weight", 1)
+        e["sources"] = _union_sources(e.get("sources"), edata.get("sources"))
+    else:
+        # endpoints nobody declared are created bare by add_edge; index them like declared nodes
+        new = [n for n in (u, v) if n not in KG]
+        _writable_edges(KG, u, v)
+        KG.add_edge(u, v, key=key, **{**edata, "sources": _intern_sources(edata.get("sources", ()))})
+        for n in new:
+            idx.add_node(n, KG.nodes[n])
+        idx.add_edge(u, v, edata.get("relation") or key)
+
 def merge_graphs(graphs: Iterable[nx.MultiDiGraph]) -> nx.MultiDiGraph:
     """
     Merge multiple MultiDiGraphs into one. Coalesce nodes/edges and accumulate weights.
+    Cost is linear in the total input size (see bench_merge.py).
     """
     KG = nx.MultiDiGraph()
+    _merge_into(KG, _INDEXES.setdefault(KG, KGIndex()), graphs)
+    return KG
+
+def _merge_into(KG: nx.MultiDiGraph, idx, graphs: Iterable[nx.MultiDiGraph]) -> None:
+    fps: Dict[int, Tuple[list, set]] = {}
     for g in graphs:
         for nid, data in g.nodes(data=True):
-            if nid not in KG:
-                KG.add_node(nid, **{**data, "sources": set(data.get("sources", set()))})
-            else:
-                KG.nodes[nid]["props"] = _merge_props(KG.nodes[nid].get("props", {}), data.get("props", {}))
-                KG.nodes[nid]["sources"].update(data.get("sources", set()))
-                # ensure type/label preserved
-                if not KG.nodes[nid].get("label") and data.get("label"):
-                    KG.nodes[nid]["label"] = data["label"]
-                if not KG.nodes[nid].get("type") and data.get("type"):
-                    KG.nodes[nid]["type"] = data["type"]
-
+            _merge_node(KG, idx, nid, data, fps)
         for u, v, key, edata in g.edges(keys=True, data=True):
-            if KG.has_edge(u, v, key=key):
-                KG[u][v][key]["weight"] = KG[u][v][key].get("weight", 1) + edata.get("weight", 1)
-                KG[u][v][key]["sources"].update(edata.get("sources", set()))
-            else:
-                KG.add_edge(u, v, key=key, **{**edata, "sources": set(edata.get("sources", set()))})
+            _merge_edge(KG, idx, u, v, key, edata)
+
+# ----- parallel merge ---------------------------------------------------------
+
+def _to_parts(G: nx.MultiDiGraph) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[tuple]]:
+    """Compact, picklable form of a merged graph: node list + edges by node position."""
+    nodes = list(G.nodes(data=True))
+    pos = {nid: i for i, (nid, _) in enumerate(nodes)}
+    edges = [
+        (pos[u], pos[v], key, data.get("relation", ""), data.get("weight", 1), tuple(data.get("sources", ())))
+        for u, v, key, data in G.edges(keys=True, data=True)
+    ]
+    return nodes, edges
+
+def _from_parts(parts) -> nx.MultiDiGraph:
+    nodes, edges = parts
+    G = nx.MultiDiGraph()
+    for nid, data in nodes:
+        if "sources" in data:
+            data["sources"] = _intern_sources(data["sources"])
+        G.add_node(nid, **data)
+    for u, v, key, rel, weight, sources in edges:
+        G.add_edge(nodes[u][0], nodes[v][0], key=key, relation=rel, weight=weight, sources=_intern_sources(sources))
+    return G
+
+class _NoIndex:
+    """Stands in for KGIndex on intermediate partitions that are never queried."""
+    def add_node(self, nid, data):
+        pass
+
+    def add_edge(self, u, v, rel):
+        pass
+
+def _merge_unindexed(graphs: Iterable[nx.MultiDiGraph]):
+    KG = nx.MultiDiGraph()
+    _merge_into(KG, _NoIndex(), graphs)
+    return _to_parts(KG)
+
+def _merge_chunk(items: List[Any]):
+    # worker: JSON graphs are built here, so only the raw extraction output crosses the process boundary
+    return _merge_unindexed(build_nx_from_graph(g)[0] if isinstance(g, dict) else g for g in items)
+
+def _merge_pair(left, right):
+    return _merge_unindexed([_from_parts(left), _from_parts(right)])
+
+def merge_graphs_parallel(graphs: Iterable[Any], workers: int | None = None) -> nx.MultiDiGraph:
+    """
+    merge_graphs for backfills, spread over a process pool.
+    `graphs` may hold MultiDiGraphs or raw {"nodes","edges"} dicts (built in
+    the workers). Contiguous partitions are merged in parallel, then reduced
+    pairwise, left to right, so the result equals merge_graphs on the same
+    sequence (first label/props win, weights add up, sources union).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    items = list(graphs)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(items) < 2 * workers:
+        return merge_graphs(build_nx_from_graph(g)[0] if isinstance(g, dict) else g for g in items)
+
+    size = -(-len(items) // (workers * 2))
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(_merge_chunk, chunks))
+        while len(parts) > 1:
+            merged = list(pool.map(_merge_pair, parts[0::2], parts[1::2]))
+            if len(parts) % 2:
+                merged.append(parts[-1])
+            parts = merged
+    KG = _from_parts(parts[0])
+    build_index(KG)
     return KG
 
+# ----- incremental maintenance ------------------------------------------------
+
+BASE_ENTITY = "__base__"  # owner of content that was in the KG before any upsert
+
+class EntityLedger:
+    """
+    Which entity (CV / job) contributed which nodes and edges to a long-lived KG.
+    Lives in KG.graph["ledger"] so it survives save_gpickle/load_gpickle.
+    Node/edge refs are insertion-ordered, so merge order (first label wins,
+    first scalar prop wins) can be replayed when a contributor leaves.
+    """
+    def __init__(self):
+        self.entities: Dict[str, Dict[str, Any]] = {}
+        self.node_refs: Dict[str, Dict[str, None]] = {}
+        self.edge_refs: Dict[Tuple[str, str, str], Dict[str, None]] = {}
+        self.owned: set | None = None  # see _cow_slot; set once the ledger has been forked
+
+    def refs(self, table: dict, key) -> Dict[str, None]:
+        """node_refs/edge_refs entry to write to (created if missing)."""
+        return _cow_slot(self.owned, table, key)
+
+    def fork(self) -> "EntityLedger":
+        """
+        Ledger for a forked KG. Entity records are replaced, never edited, except
+        the base one; ref sets are shared until written, as in KGIndex.fork.
+        """
+        ledger = EntityLedger.__new__(EntityLedger)
+        ledger.entities = dict(self.entities)
+        base = self.entities.get(BASE_ENTITY)
+        if base is not None:
+            ledger.entities[BASE_ENTITY] = {**base, "nodes": dict(base["nodes"]), "edges": dict(base["edges"])}
+        ledger.node_refs = dict(self.node_refs)
+        ledger.edge_refs = dict(self.edge_refs)
+        ledger.owned = set()
+        self.owned = set()
+        return ledger
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k != "owned"}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.owned = None
+
+def _get_ledger(KG: nx.MultiDiGraph) -> EntityLedger:
+    ledger = KG.graph.get("ledger")
+    if ledger is None:
+        ledger = KG.graph["ledger"] = EntityLedger()
+        ledger.entities[BASE_ENTITY] = {"fingerprint": None, "nodes": {}, "edges": {}}
+    return ledger
+
+def _claim_base(KG: nx.MultiDiGraph, ledger: EntityLedger, nodes, edges) -> None:
+    """Pin pre-existing KG content that no entity owns yet under BASE_ENTITY."""
+    base = ledger.entities[BASE_ENTITY]
+    for nid in nodes:
+        if nid in KG and nid not in ledger.node_refs:
+            base["nodes"][nid] = copy.deepcopy(dict(KG.nodes[nid]))
+            ledger.node_refs[nid] = {BASE_ENTITY: None}
+    for e in edges:
+        if e not in ledger.edge_refs and KG.has_edge(*e):
+            base["edges"][e] = copy.deepcopy(dict(KG.edges[e]))
+            ledger.edge_refs[e] = {BASE_ENTITY: None}
+
+def _graph_fingerprint(graph_json: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(graph_json, sort_keys=True, default=str).encode()).hexdigest()
+
+def entity_ids(KG: nx.MultiDiGraph) -> List[str]:
+    """Entities ingested through upsert_entity_graph."""
+    return [eid for eid in _get_ledger(KG).entities if eid != BASE_ENTITY]
+
+def upsert_entity_graph(KG: nx.MultiDiGraph, entity_id: str, graph_json: Dict[str, Any]) -> bool:
+    """
+    Add or replace the graph of one CV / job in a long-lived KG, touching only
+    that entity's nodes and edges. Returns False if the graph is unchanged.
+    """
+    fingerprint = _graph_fingerprint(graph_json)
+    prev = _get_ledger(KG).entities.get(entity_id)
+    if prev is not None and prev["fingerprint"] == fingerprint:
+        return False
+    return _upsert_parts(KG, entity_id, fingerprint, _entity_parts(graph_json))
+
+def _entity_parts(graph_json: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[Tuple[str, str, str], Any]]:
+    """(nodes, edges) of one CV / job graph, built before the KG is touched; ValueError if it is malformed."""
+    try:
+        g, _ = build_nx_from_graph(graph_json)
+    except Exception as e:
+        raise ValueError(f"malformed entity graph: {type(e).__name__}: {e}") from e
+    nodes = {nid: data for nid, data in g.nodes(data=True) if data}
+    edges = {(u, v, k): data for u, v, k, data in g.edges(keys=True, data=True)}
+    return nodes, edges
+
+def _upsert_parts(KG: nx.MultiDiGraph, entity_id: str, fingerprint: str, parts) -> bool:
+    ledger = _get_ledger(KG)
+    prev = ledger.entities.get(entity_id)
+    if prev is not None and prev["fingerprint"] == fingerprint:
+        return False
+    if prev is not None:
+        remove_entity_graph(KG, entity_id)
+
+    nodes, edges = parts
+    _claim_base(KG, ledger, nodes, edges)
+
+    idx = get_index(KG)
+    fps: Dict[int, Tuple[list, set]] = {}
+    for nid, data in nodes.items():
+        # _merge_node copies what it keeps, so the ledger's copy stays pristine
+        _merge_node(KG, idx, nid, data, fps)
+        ledger.refs(ledger.node_refs, nid)[entity_id] = None
+    for (u, v, k), edata in edges.items():
+        _merge_edge(KG, idx, u, v, k, edata)
+        ledger.refs(ledger.edge_refs, (u, v, k))[entity_id] = None
+    ledger.entities[entity_id] = {"fingerprint": fingerprint, "nodes": nodes, "edges": edges}
+    return True
+
+def remove_entity_graph(KG: nx.MultiDiGraph, entity_id: str) -> bool:
+    """
+    Withdraw one entity's contribution. Shared nodes/edges stay as long as
+    another entity still references them; their data is re-derived from the
+    remaining contributors. Returns False if the entity is unknown.
+    """
+    ledger = _get_ledger(KG)
+    rec = ledger.entities.pop(entity_id, None)
+    if rec is None:
+        return False
+    idx = get_index(KG)
+
+    endpoints = set()
+    for e, edata in rec["edges"].items():
+        refs = ledger.refs(ledger.edge_refs, e)
+        refs.pop(entity_id, None)
+        u, v, k = e
+        if not refs:
+            del ledger.edge_refs[e]
+            _writable_edges(KG, u, v)
+            KG.remove_edge(u, v, key=k)
+            idx.remove_edge(u, v, edata.get("relation") or k)
+            endpoints.update((u, v))
+            continue
+        contribs = [ledger.entities[r]["edges"][e] for r in refs]
+        edata = _writable_edges(KG, u, v)[k]
+        edata["weight"] = sum(c.get("weight", 1) for c in contribs)
+        edata["sources"] = _intern_sources(set().union(*(c.get("sources", ()) for c in contribs)))
+
+    for nid in rec["nodes"]:
+        refs = ledger.refs(ledger.node_refs, nid)
+        refs.pop(entity_id, None)
+        if refs:
+            contribs = [ledger.entities[r]["nodes"][nid] for r in refs]
+            data = _own(contribs[0])
+            data["sources"] = _intern_sources(data.get("sources", ()))
+            fps: Dict[int, Tuple[list, set]] = {}
+            for c in contribs[1:]:
+                _merge_props_into(_owned_props(data), c.get("props"), fps)
+                data["sources"] = _union_sources(data["sources"], c.get("sources"))
+                if not data.get("label") and c.get("label"):
+                    data["label"] = c["label"]
+                if not data.get("type") and c.get("type"):
+                    data["type"] = c["type"]
+        else:
+            del ledger.node_refs[nid]
+            if KG.degree(nid) == 0:
+                KG.remove_node(nid)
+                idx.remove_node(nid)
+                continue
+            data = {}  # still an edge endpoint for someone else: back to a bare node
+        KG._node[nid] = data
+        _owned_by(KG).add((id(KG._node), nid))
+        idx.add_node(nid, data)
+
+    # bare endpoints nobody declared, left dangling by the removed edges
+    for nid in endpoints:
+        if nid in KG and nid not in ledger.node_refs and KG.degree(nid) == 0:
+            KG.remove_node(nid)
+            idx.remove_node(nid)
+    return True
+
+# ----- copy-on-write versions -------------------------------------------------
+
+# entries of a forked KG's node/adjacency tables copied since the fork (see _cow_slot);
+# graphs that were never forked have none and share nothing
+_OWNED: "weakref.WeakKeyDictionary[nx.MultiDiGraph, set]" = weakref.WeakKeyDictionary()
+
+def _owned_by(KG: nx.MultiDiGraph) -> set:
+    owned = _OWNED.get(KG)
+    return owned if owned is not None else set()
+
+def _writable_node(KG: nx.MultiDiGraph, nid: str) -> Dict[str, Any]:
+    """Attribute dict of an existing node, copied (props included) before the first write after a fork."""
+    owned = _OWNED.get(KG)
+    if owned is None or (id(KG._node), nid) in owned:
+        return KG._node[nid]
+    owned.add((id(KG._node), nid))
+    data = KG._node[nid] = dict(KG._node[nid])
+    if "props" in data:
+        data["props"] = _own(data["props"])
+    return data
+
+def _writable_edges(KG: nx.MultiDiGraph, u: str, v: str) -> Dict[str, Any]:
+    """
+    Make the u -> v adjacency safe to write (add_edge/remove_edge or edge data);
+    returns the key -> data dict, empty if there is no such edge yet. The succ
+    and pred entries hold the same key dict, so it is replaced in both.
+    """
+    owned = _OWNED.get(KG)
+    if owned is None:
+        return KG._succ.get(u, _EMPTY).get(v) or {}
+    # an endpoint not in KG yet gets fresh adjacency from add_edge
+    succ = _cow_slot(owned, KG._succ, u) if u in KG else _EMPTY
+    pred = _cow_slot(owned, KG._pred, v) if v in KG else _EMPTY
+    keys = succ.get(v)
+    if keys is None or ("edge", u, v) in owned:
+        return keys or {}
+    owned.add(("edge", u, v))
+    keys = succ[v] = pred[u] = {k: dict(d) for k, d in keys.items()}
+    return keys
+
+def fork_graph(KG: nx.MultiDiGraph) -> nx.MultiDiGraph:
+    """
+    Writable next version of KG that leaves KG itself untouched, so readers
+    can keep using it while the fork is updated and then published.
+    Structural sharing: only the node/adjacency tables, index tables and
+    ledger tables are copied (pointer copies, no per-node work); the
+    per-node containers are shared and each side copies one on its first
+    write, so a fork plus one CV upsert costs about what the upsert does.
+    """
+    H = KG.__class__()
+    H.graph = dict(KG.graph)
+    H._node = dict(KG._node)
+    H._adj = H._succ = dict(KG._succ)
+    H._pred = dict(KG._pred)
+    if "ledger" in KG.graph:
+        H.graph["ledger"] = KG.graph["ledger"].fork()
+    if KG in _INDEXES:
+        _INDEXES[H] = _INDEXES[KG].fork()
+    _OWNED[H] = set()
+    _OWNED[KG] = set()
+    return H
+
 # ----- quick queries ----------------------------------------------------------
 
 def neighbors_of(G: nx.MultiDiGraph, node_id: str) -> Dict[str, Any]:
     """Return a snapshot of immediate neighbors grouped by relation."""
-    out = {}
+    # alternative stores (CompactGraph, SQLiteGraph) answer the quick queries themselves
+    if not isinstance(G, nx.MultiDiGraph):
+        return G.neighbors_of(node_id)
     if node_id not in G:
-        return out
-    for _, v, key, data in G.out_edges(node_id, keys=True, data=True):
-        rel = data.get("relation", key) or key
-        out.setdefault(rel, []).append(v)
-    return out
+        return {}
+    idx = get_index(G)
+    return {rel: list(idx.targets(node_id, rel)) for rel in idx.out_rels.get(node_id, _EMPTY)}
+
+def targets_of(G: nx.MultiDiGraph, node_id: str, relation: str) -> List[str]:
+    """Nodes reached from node_id through `relation` (e.g. skills required by a job)."""
+    if not isinstance(G, nx.MultiDiGraph):
+        return G.targets_of(node_id, relation)
+    return list(get_index(G).targets(node_id, relation.lower()))
+
+def sources_of(G: nx.MultiDiGraph, node_id: str, relation: str) -> List[str]:
+    """Nodes pointing at node_id through `relation` (e.g. roles at a company)."""
+    if not isinstance(G, nx.MultiDiGraph):
+        return G.sources_of(node_id, relation)
+    return list(get_index(G).sources(node_id, relation.lower()))
+
+def _label_filters(label_exact, label_prefix, label_contains) -> List[Tuple[str, str]]:
+    """(mode, normalized query) for each label filter given."""
+    filters = []
+    for mode, q in (("exact", label_exact), ("prefix", label_prefix), ("contains", label_contains)):
+        q = _norm(q or "")
+        if q:
+            filters.append((mode, q))
+    return filters
 
-def find_nodes(G: nx.MultiDiGraph, *, type_: str | None = None, label_contains: str | None = None):
-    """Tiny search helper."""
+def _label_hits(idx: KGIndex, t: str, label_filters: List[Tuple[str, str]]) -> List[Any]:
+    """Nodes of idx (of type t, if given) passing every label filter."""
+    # start from the most selective filter, check the rest per hit
+    hits = min((idx.search_label(q, mode) for mode, q in label_filters), key=len)
+    if t:
+        by_t = idx.by_type.get(t, _EMPTY)
+        hits = [nid for nid in hits if nid in by_t]
+    labels = idx.labels
+    return [
+        nid for nid in hits
+        if all(
+            labels[nid] == q if mode == "exact" else labels[nid].startswith(q) if mode == "prefix" else q in labels[nid]
+            for mode, q in label_filters
+        )
+    ]
+
+def find_nodes(
+    G: nx.MultiDiGraph,
+    *,
+    type_: str | None = None,
+    label_contains: str | None = None,
+    label_prefix: str | None = None,
+    label_exact: str | None = None,
+):
+    """
+    Tiny search helper, served from the type/label indexes.
+    Label filters are normalized like the labels and may be combined.
+    """
+    if not isinstance(G, nx.MultiDiGraph):
+        yield from G.find_nodes(type_=type_, label_contains=label_contains,
+                                label_prefix=label_prefix, label_exact=label_exact)
+        return
+    idx = get_index(G)
     t = (type_ or "").lower().strip()
-    q = _norm(label_contains or "")
-    for nid, data in G.nodes(data=True):
-        if t and data.get("type") != t:
-            continue
-        label = _norm(data.get("label", "")) or _norm(data.get("props", {}).get("name", ""))
-        if q and q not in label:
-            continue
-        yield nid, data
+    label_filters = _label_filters(label_exact, label_prefix, label_contains)
+    if label_filters:
+        for nid in sorted(_label_hits(idx, t, label_filters)):
+            yield nid, G.nodes[nid]
+    elif t:
+        for nid in idx.by_type.get(t, _EMPTY):
+            yield nid, G.nodes[nid]
+    else:
+        yield from G.nodes(data=True)
 
 def skill_overlap(G: nx.MultiDiGraph, candidate_id: str, job_id: str) -> Dict[str, Any]:
     """Compute overlapping skills between a candidate and a job."""
-    def _skills_for(node_id: str, rel: str) -> set[str]:
-        skill_ids = set()
-        for _, v, key, data in G.out_edges(node_id, keys=True, data=True):
-            if (data.get("relation") or key) == rel:
-                if G.nodes[v].get("type") == "skill":
-                    skill_ids.add(v)
-        return skill_ids
-
-    cand_sk = _skills_for(candidate_id, "has_skill")
-    job_sk = _skills_for(job_id, "requires_skill")
+    if not isinstance(G, nx.MultiDiGraph):
+        return G.skill_overlap(candidate_id, job_id)
+    idx = get_index(G)
+    cand_sk = _indexed_skills(G, idx, candidate_id, "has_skill")
+    job_sk = _indexed_skills(G, idx, job_id, "requires_skill")
     overlap = cand_sk & job_sk
     missing = job_sk - cand_sk
     return {
@@ -159,6 +780,917 @@ def skill_overlap(G: nx.MultiDiGraph, candidate_id: str, job_id: str) -> Dict[st
         "jaccard": (len(overlap) / len(job_sk)) if job_sk else 0.0
     }
 
+def _skill_set(G, node_id: str, rel: str) -> set[str]:
+    if isinstance(G, nx.MultiDiGraph):
+        return _indexed_skills(G, get_index(G), node_id, rel)
+    return G._skills(node_id, rel)
+
+def skills_of(G, node_id: str, relation: str) -> List[str]:
+    """
+    Skill nodes node_id points at through relation ("has_skill" for a candidate,
+    "requires_skill" for a job), sorted: the sets the match scores are shares of.
+    """
+    if not isinstance(G, (nx.MultiDiGraph, CompactGraph, SQLiteGraph)):
+        return G.skills_of(node_id, relation)
+    return sorted(_skill_set(G, node_id, relation.lower()))
+
+def top_candidates_for_job(G: nx.MultiDiGraph, job_id: str, k: int = 10) -> List[Dict[str, Any]]:
+    """
+    Rank candidates by share of the job's required skills they have.
+    Only walks the postings of the job's skills, never the full candidate set.
+    """
+    if not isinstance(G, (nx.MultiDiGraph, CompactGraph, SQLiteGraph)):
+        return G.top_candidates_for_job(job_id, k)
+    job_sk = _skill_set(G, job_id, "requires_skill")
+    idx = get_index(G) if isinstance(G, nx.MultiDiGraph) else None
+    counts: Dict[str, int] = {}
+    for s in job_sk:
+        for c in (idx.sources(s, "has_skill") if idx is not None else sources_of(G, s, "has_skill")):
+            counts[c] = counts.get(c, 0) + 1
+    best = heapq.nsmallest(k, counts.items(), key=lambda kv: (-kv[1], kv[0]))
+    return [{"candidate_id": c, "overlap": n, "score": n / len(job_sk)} for c, n in best]
+
+def top_jobs_for_candidate(G: nx.MultiDiGraph, candidate_id: str, k: int = 10) -> List[Dict[str, Any]]:
+    """
+    Rank jobs by share of their required skills the candidate has
+    (same score as skill_overlap's "jaccard").
+    """
+    if not isinstance(G, (nx.MultiDiGraph, CompactGraph, SQLiteGraph)):
+        return G.top_jobs_for_candidate(candidate_id, k)
+    idx = get_index(G) if isinstance(G, nx.MultiDiGraph) else None
+    counts: Dict[str, int] = {}
+    for s in _skill_set(G, candidate_id, "has_skill"):
+        for j in (idx.sources(s, "requires_skill") if idx is not None else sources_of(G, s, "requires_skill")):
+            counts[j] = counts.get(j, 0) + 1
+    scored = [(j, n, n / len(_skill_set(G, j, "requires_skill"))) for j, n in counts.items()]
+    best = heapq.nsmallest(k, scored, key=lambda t: (-t[2], -t[1], t[0]))
+    return [{"job_id": j, "overlap": n, "score": score} for j, n, score in best]
+
+def node_labels(G, node_ids: Iterable[str]) -> Dict[str, str | None]:
+    """Display labels for a handful of ids (None for unknown ids or unlabeled nodes)."""
+    if not isinstance(G, (nx.MultiDiGraph, CompactGraph, SQLiteGraph)):
+        return G.node_labels(list(node_ids))
+    return {nid: _node_attrs(G, nid).get("label") if nid in G else None for nid in node_ids}
+
+def nodes_by_label(G, labels: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Ids of the nodes whose label equals each of labels (compared like
+    find_nodes' label_exact), sorted: one lookup for many names.
+    """
+    labels = list(dict.fromkeys(labels))
+    if not isinstance(G, (nx.MultiDiGraph, CompactGraph)):
+        return G.nodes_by_label(labels)
+    if isinstance(G, CompactGraph):
+        idx = G.label_index()
+        return {q: sorted(G.ids[i] for i in idx.search_label(_norm(q), "exact")) if _norm(q) else [] for q in labels}
+    by_label = get_index(G).by_label
+    return {q: sorted(by_label.get(_norm(q), _EMPTY)) if _norm(q) else [] for q in labels}
+
+# ----- path patterns ----------------------------------------------------------
+
+_PATTERN_NODE = re.compile(r'\s*(?:"([^"]+)"|([A-Za-z_][\w]*|\*)?(?:\{([=^]?)([^}]*)\})?)\s*')
+_PATTERN_EDGE = re.compile(r'\s*(<?)-\[([^\]]*)\]-(>?)\s*')
+
+def parse_pattern(pattern: str) -> Tuple[List[Dict[str, Any]], List[Tuple[Tuple[str, ...], bool]]]:
+    """
+    Parse a path pattern into (node steps, edge steps).
+      node: type | * | type{text} (label contains) | type{=text} (exact) | type{^text} (prefix) | "node:id"
+      edge: -[rel]-> | <-[rel]- ; rel may be a|b for alternatives, or empty / * for any
+    e.g. candidate-[worked_as]->role-[at_company]->company<-[at_company]-role<-[worked_as]-candidate-[has_skill]->skill{python}
+    """
+    nodes: List[Dict[str, Any]] = []
+    edges: List[Tuple[Tuple[str, ...], bool]] = []
+    pos = 0
+    while True:
+        m = _PATTERN_NODE.match(pattern, pos)
+        node_id, type_, mode, text = m.groups()
+        if m.end() == pos or not (node_id or type_ or text is not None):
+            raise ValueError(f"expected a node at position {pos} of {pattern!r}")
+        nodes.append({
+            "id": node_id,
+            "type": None if type_ in (None, "*") else type_.lower(),
+            "label": _norm(text or "") or None,
+            "mode": {"=": "exact", "^": "prefix"}.get(mode, "contains"),
+        })
+        pos = m.end()
+        if pos == len(pattern):
+            return nodes, edges
+        m = _PATTERN_EDGE.match(pattern, pos)
+        if m is None or bool(m.group(1)) == bool(m.group(3)):
+            raise ValueError(f"expected -[rel]-> or <-[rel]- at position {pos} of {pattern!r}")
+        rels = tuple(r.strip().lower() for r in m.group(2).split("|") if r.strip() not in ("", "*"))
+        edges.append((rels, bool(m.group(1))))
+        pos = m.end()
+
+class _PatternView:
+    """What the matcher needs from a store: index-backed for MultiDiGraph, generic otherwise."""
+    def __init__(self, G):
+        self.G = G
+        self.idx = get_index(G) if isinstance(G, nx.MultiDiGraph) else None
+
+    def type_label(self, nid: str) -> Tuple[str | None, str] | None:
+        if self.idx is not None:
+            return (self.idx.types[nid], self.idx.labels[nid]) if nid in self.idx.types else None
+        return self.G.type_label(nid)
+
+    def matches(self, nid: str, step: Dict[str, Any]) -> bool:
+        if step["id"] is not None:
+            return nid == step["id"]
+        tl = self.type_label(nid)
+        if tl is None:
+            return False
+        t, label = tl
+        if step["type"] and t != step["type"]:
+            return False
+        q = step["label"]
+        if q is None:
+            return True
+        mode = step["mode"]
+        return label == q if mode == "exact" else label.startswith(q) if mode == "prefix" else q in label
+
+    def candidates(self, step: Dict[str, Any]) -> Iterable[str] | None:
+        """Nodes matching `step` on its own, or None if it has no filter (matches everything)."""
+        if step["id"] is not None:
+            return [step["id"]] if self.type_label(step["id"]) is not None else []
+        if self.idx is not None:
+            if step["label"] is not None:
+                hits = self.idx.search_label(step["label"], step["mode"])
+                return [nid for nid in sorted(hits) if self.matches(nid, step)]
+            if step["type"]:
+                return self.idx.by_type.get(step["type"], _EMPTY)
+            return None
+        if step["label"] is None and not step["type"]:
+            return None
+        return [nid for nid, _ in find_nodes(self.G, type_=step["type"], **{f"label_{step['mode']}": step["label"]})]
+
+    def relations(self, nid: str, reverse: bool) -> Iterable[str]:
+        if self.idx is not None:
+            return (self.idx.in_rels if reverse else self.idx.out_rels).get(nid, _EMPTY)
+        return self.G.relations()
+
+    def expand(self, nid: str, rels: Tuple[str, ...], reverse: bool) -> Iterable[str]:
+        out: Dict[str, None] = {}
+        for rel in rels or self.relations(nid, reverse):
+            if self.idx is not None:
+                out.update(self.idx.sources(nid, rel) if reverse else self.idx.targets(nid, rel))
+            else:
+                out.update(dict.fromkeys(sources_of(self.G, nid, rel) if reverse else targets_of(self.G, nid, rel)))
+        return out
+
+# edges a single match_pattern call may look at; patterns come from the agent
+MATCH_MAX_STEPS = 200_000
+
+def match_pattern(G, pattern: str, limit: int = 50, max_steps: int = MATCH_MAX_STEPS) -> Dict[str, Any]:
+    """
+    Match a path pattern (see parse_pattern) in one call. The planner anchors
+    on the step with the fewest candidates according to the id / label / type
+    indexes, then walks the edges outwards from it in both directions,
+    checking each step's filters as it goes. Returns up to `limit` distinct
+    paths as rows of node ids, one column per node step. The walk gives up
+    after `max_steps` edges, matches or not: then "truncated" is set and
+    "error" says how to narrow the pattern.
+    """
+    if not isinstance(G, (nx.MultiDiGraph, CompactGraph, SQLiteGraph)):
+        return G.match_pattern(pattern, limit=limit)  # e.g. the graph service client
+    nodes, edges = parse_pattern(pattern)
+    view = _PatternView(G)
+    anchor, seeds = 0, None
+    for i, step in enumerate(nodes):
+        cands = view.candidates(step)
+        if cands is not None and (seeds is None or len(cands) < len(seeds)):
+            anchor, seeds = i, cands
+    if seeds is None:
+        seeds = list(G.nodes) if isinstance(G, nx.MultiDiGraph) else [nid for nid, _ in find_nodes(G)]
+    # walk right from the anchor, then left; each hop is (from column, to column, rels, reverse)
+    hops = [(i, i + 1, edges[i][0], edges[i][1]) for i in range(anchor, len(edges))]
+    hops += [(i + 1, i, edges[i][0], not edges[i][1]) for i in range(anchor - 1, -1, -1)]
+
+    rows: List[List[str]] = []
+    path: List[str | None] = [None] * len(nodes)
+    used: set = set()  # a path never walks the same edge twice (a-[r]->b<-[r]-a is not a match)
+    budget = [max_steps]
+
+    def walk(h: int) -> bool:
+        if h == len(hops):
+            rows.append(list(path))
+            return len(rows) > limit  # one extra row tells us the result was truncated
+        src, dst, rels, reverse = hops[h]
+        for nid in view.expand(path[src], rels, reverse):
+            budget[0] -= 1
+            if budget[0] < 0:
+                return True
+            edge = (nid, path[src], rels) if reverse else (path[src], nid, rels)
+            if edge in used or not view.matches(nid, nodes[dst]):
+                continue
+            path[dst] = nid
+            used.add(edge)
+            stop = walk(h + 1)
+            used.discard(edge)
+            if stop:
+                return True
+        return False
+
+    for nid in seeds:
+        path[anchor] = nid
+        if walk(0):
+            break
+    result = {
+        "columns": [step["id"] or step["type"] or "*" for step in nodes],
+        "anchor": anchor,
+        "anchor_candidates": len(seeds),
+        "rows": rows[:limit],
+        "truncated": len(rows) > limit or budget[0] < 0,
+    }
+    if budget[0] < 0:
+        result["error"] = (f"search stopped after {max_steps} edges; anchor the pattern on a node id or "
+                           'label (e.g. "cand:42" or skill{python}) or use fewer steps')
+    return result
+
+# ----- ego graphs ---------------------------------------------------------------
+
+# per graph: (index version it was filled at, LRU of ego_graph results)
+_EGO_CACHE: "weakref.WeakKeyDictionary[Any, Tuple[int, _LRU]]" = weakref.WeakKeyDictionary()
+EGO_CACHE_SIZE = 256
+
+def _node_attrs(G, nid: str) -> Dict[str, Any]:
+    if isinstance(G, nx.MultiDiGraph):
+        return G.nodes[nid]
+    if isinstance(G, CompactGraph):
+        pos = G.pos.get(nid)
+        return G.node_data(pos) if pos is not None else {}
+    return G.node_data(nid) or {}
+
+def _adjacent(G, idx: KGIndex | None, nid: str, relations, direction: str):
+    """(relation, other node, outgoing?) for the edges at nid, out-edges first."""
+    if direction in ("out", "both"):
+        if idx is not None:
+            out = ((rel, idx.targets(nid, rel)) for rel in idx.out_rels.get(nid, _EMPTY))
+        else:
+            out = neighbors_of(G, nid).items()
+        for rel, targets in out:
+            if relations is None or rel in relations:
+                for v in targets:
+                    yield rel, v, True
+    if direction in ("in", "both"):
+        rels = idx.in_rels.get(nid, _EMPTY) if idx is not None else G.relations()
+        for rel in rels:
+            if relations is None or rel in relations:
+                for u in (idx.sources(nid, rel) if idx is not None else sources_of(G, nid, rel)):
+                    yield rel, u, False
+
+def _induced_edges(G, idx: KGIndex | None, nodes: Dict[str, Any], relations) -> List[List[str]]:
+    """[u, rel, v] for the edges among `nodes`; each is an out-edge of one of them, so only those are looked up."""
+    edges = []
+    for u in nodes:
+        if idx is not None:
+            out = ((rel, idx.targets(u, rel)) for rel in idx.out_rels.get(u, _EMPTY))
+        else:
+            out = neighbors_of(G, u).items()
+        for rel, targets in out:
+            if relations is not None and rel not in relations:
+                continue
+            if idx is not None and len(targets) > len(nodes):
+                # a hub: probe it with the (smaller) node set instead of walking its targets
+                edges.extend([u, rel, v] for v in nodes if v in targets)
+            else:
+                edges.extend([u, rel, v] for v in dict.fromkeys(targets) if v in nodes)
+    return edges
+
+def ego_graph(
+    G,
+    node_id: str,
+    hops: int = 1,
+    relations: Iterable[str] | None = None,
+    max_nodes: int | None = 50,
+    direction: str = "both",
+) -> Dict[str, Any]:
+    """
+    Neighborhood of node_id up to `hops` edges away, as a small JSON-ready dict:
+    {"center", "hops", "nodes": [{"id", "type", "label", "hop"}], "edges": [[u, rel, v]], "truncated"}.
+    Bounded BFS: stops adding nodes at max_nodes (None: no bound). Results are cached per graph
+    and dropped when the graph changes; treat them as read-only.
+    """
+    if not isinstance(G, (nx.MultiDiGraph, CompactGraph, SQLiteGraph)):
+        return G.ego_graph(node_id, hops, relations=relations, max_nodes=max_nodes, direction=direction)
+    rels = None if relations is None else frozenset(r.lower() for r in relations)
+    idx = get_index(G) if isinstance(G, nx.MultiDiGraph) else None
+    version = idx.version if idx is not None else 0
+    entry = _EGO_CACHE.get(G)
+    if entry is None or entry[0] != version:
+        entry = _EGO_CACHE[G] = (version, _LRU(EGO_CACHE_SIZE))
+    key = (node_id, hops, rels, max_nodes, direction)
+    hit = entry[1].get(key)
+    if hit is not None:
+        return hit
+
+    result = {"center": node_id, "hops": hops, "nodes": [], "edges": [], "truncated": False}
+    if node_id in G:
+        seen = {node_id: 0}
+        frontier = [node_id]
+        for hop in range(1, hops + 1):
+            nxt = []
+            for u in frontier:
+                for _, v, _ in _adjacent(G, idx, u, rels, direction):
+                    if v in seen:
+                        continue
+                    if max_nodes is not None and len(seen) >= max_nodes:
+                        # one node past the cap: stop here instead of walking the rest (hub skills)
+                        result["truncated"] = True
+                        break
+                    seen[v] = hop
+                    nxt.append(v)
+                if result["truncated"]:
+                    break
+            frontier = nxt
+            if not frontier or result["truncated"]:
+                break
+        result["edges"] = _induced_edges(G, idx, seen, rels)
+        for nid, hop in seen.items():
+            data = _node_attrs(G, nid)
+            result["nodes"].append({"id": nid, "type": data.get("type"), "label": data.get("label"), "hop": hop})
+    entry[1].put(key, result)
+    return result
+
+def ego_to_networkx(ego: Dict[str, Any]) -> nx.MultiDiGraph:
+    """MultiDiGraph of an ego_graph result, e.g. for simple_draw."""
+    H = nx.MultiDiGraph()
+    for n in ego["nodes"]:
+        H.add_node(n["id"], **{k: n[k] for k in ("type", "label") if n[k] is not None})
+    for u, rel, v in ego["edges"]:
+        H.add_edge(u, v, key=rel, relation=rel)
+    return H
+
+# ----- bulk matching ----------------------------------------------------------
+
+def _nodes_of_type(G: nx.MultiDiGraph, type_: str) -> List[str]:
+    return sorted(nid for nid, t in G.nodes(data="type") if t == type_)
+
+def skill_incidence(G: nx.MultiDiGraph, node_ids: List[str], rel: str, skill_ids: List[str]):
+    """
+    0/1 CSR matrix (len(node_ids) x len(skill_ids)); row i marks the skills
+    node_ids[i] points to through `rel`.
+    """
+    import numpy as np
+    from scipy.sparse import csr_matrix
+
+    col = {s: j for j, s in enumerate(skill_ids)}
+    idx = get_index(G)
+    indptr, indices = [0], []
+    for nid in node_ids:
+        indices.extend(sorted(col[s] for s in idx.targets(nid, rel) if s in col))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.int32)
+    return csr_matrix((data, indices, indptr), shape=(len(node_ids), len(skill_ids)))
+
+def skill_overlap_matrix(
+    G: nx.MultiDiGraph,
+    candidate_ids: List[str] | None = None,
+    job_ids: List[str] | None = None,
+    top_k: int | None = None,
+) -> Dict[str, Any]:
+    """
+    Bulk skill_overlap: score every (candidate, job) pair with one sparse product.
+    Defaults to all candidate/job nodes. Metrics, as (candidates x jobs) arrays:
+      overlap  - shared skills
+      coverage - overlap / job skills (skill_overlap's "jaccard")
+      jaccard  - overlap / union of skills
+      missing  - job skills the candidate lacks
+    With top_k, returns {"top": {job_id: [best k candidates]}} instead of matrices.
+    """
+    import numpy as np
+
+    cands = sorted(candidate_ids) if candidate_ids is not None else _nodes_of_type(G, "candidate")
+    jobs = sorted(job_ids) if job_ids is not None else _nodes_of_type(G, "job")
+    skills = _nodes_of_type(G, "skill")
+
+    C = skill_incidence(G, cands, "has_skill", skills)
+    J = skill_incidence(G, jobs, "requires_skill", skills)
+    overlap = (C @ J.T).toarray()
+    cand_n = np.asarray(C.sum(axis=1)).reshape(-1, 1)
+    job_n = np.asarray(J.sum(axis=1)).reshape(1, -1)
+    union = cand_n + job_n - overlap
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coverage = np.where(job_n > 0, overlap / job_n, 0.0)
+        jaccard = np.where(union > 0, overlap / union, 0.0)
+    missing = np.broadcast_to(job_n, overlap.shape) - overlap
+
+    if top_k is None:
+        return {
+            "candidates": cands, "jobs": jobs,
+            "overlap": overlap, "coverage": coverage, "jaccard": jaccard, "missing": missing,
+        }
+
+    # stable sort keeps ties in candidate-id order, like top_candidates_for_job
+    order = np.argsort(-overlap, axis=0, kind="stable")[:top_k]
+    top: Dict[str, List[Dict[str, Any]]] = {}
+    for j, job_id in enumerate(jobs):
+        top[job_id] = [
+            {
+                "candidate_id": cands[i],
+                "overlap": int(overlap[i, j]),
+                "coverage": float(coverage[i, j]),
+                "jaccard": float(jaccard[i, j]),
+                "missing": int(missing[i, j]),
+            }
+            for i in order[:, j] if overlap[i, j] > 0
+        ]
+    return {"candidates": cands, "jobs": jobs, "top": top}
+
+# ----- bitset matching --------------------------------------------------------
+
+class SkillBitsets:
+    """
+    Skill sets packed as Python ints over a global skill-id dictionary
+    (bit i <=> skills[i]); overlap/missing are AND/ANDNOT + popcount.
+    Ids follow sorted skill ids, so decoding yields sorted lists for free.
+    """
+    def __init__(self, G: nx.MultiDiGraph, idx: KGIndex):
+        self.skills: List[str] = _nodes_of_type(G, "skill")
+        self.skill_ids: Dict[str, int] = {s: i for i, s in enumerate(self.skills)}
+        self.version = idx.version
+        self.bits: Dict[Tuple[str, str], int] = {}
+        for (nid, rel), targets in idx.out.items():
+            if rel not in ("has_skill", "requires_skill"):
+                continue
+            b = 0
+            for s in targets:
+                i = self.skill_ids.get(s)
+                if i is not None:
+                    b |= 1 << i
+            self.bits[(nid, rel)] = b
+
+    def encode(self, node_id: str, rel: str) -> int:
+        return self.bits.get((node_id, rel), 0)
+
+    def decode(self, b: int) -> List[str]:
+        out = []
+        while b:
+            low = b & -b
+            out.append(self.skills[low.bit_length() - 1])
+            b ^= low
+        return out
+
+_BITSETS: "weakref.WeakKeyDictionary[nx.MultiDiGraph, SkillBitsets]" = weakref.WeakKeyDictionary()
+
+def get_bitsets(G: nx.MultiDiGraph) -> SkillBitsets:
+    """Bitset encoding of G, rebuilt only when its index has changed."""
+    idx = get_index(G)
+    bs = _BITSETS.get(G)
+    if bs is None or bs.version != idx.version:
+        bs = _BITSETS[G] = SkillBitsets(G, idx)
+    return bs
+
+def skill_overlap_fast(G: nx.MultiDiGraph, candidate_id: str, job_id: str) -> Dict[str, Any]:
+    """Same result as skill_overlap, computed on bitsets."""
+    bs = get_bitsets(G)
+    cand = bs.encode(candidate_id, "has_skill")
+    job = bs.encode(job_id, "requires_skill")
+    overlap = cand & job
+    n_job = job.bit_count()
+    return {
+        "candidate_skills": bs.decode(cand),
+        "job_required_skills": bs.decode(job),
+        "overlap": bs.decode(overlap),
+        "missing": bs.decode(job & ~cand),
+        "jaccard": (overlap.bit_count() / n_job) if n_job else 0.0
+    }
+
+def skill_overlap_batch(G: nx.MultiDiGraph, pairs: Iterable[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Counts-only skill_overlap for many (candidate_id, job_id) pairs;
+    no skill lists are materialized.
+    """
+    if not isinstance(G, nx.MultiDiGraph):
+        if not isinstance(G, (CompactGraph, SQLiteGraph)):
+            return G.skill_overlap_batch(list(pairs))
+        return _skill_overlap_batch_sets(G, pairs)
+    bs = get_bitsets(G)
+    out = []
+    for candidate_id, job_id in pairs:
+        cand = bs.encode(candidate_id, "has_skill")
+        job = bs.encode(job_id, "requires_skill")
+        n_job = job.bit_count()
+        n_overlap = (cand & job).bit_count()
+        out.append({
+            "candidate_id": candidate_id,
+            "job_id": job_id,
+            "overlap": n_overlap,
+            "missing": n_job - n_overlap,
+            "jaccard": (n_overlap / n_job) if n_job else 0.0
+        })
+    return out
+
+def _skill_overlap_batch_sets(G, pairs: Iterable[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """skill_overlap_batch for the read-only stores: each id's skill set is fetched once."""
+    cand_sets: Dict[str, set] = {}
+    job_sets: Dict[str, set] = {}
+    out = []
+    for candidate_id, job_id in pairs:
+        cand = cand_sets.get(candidate_id)
+        if cand is None:
+            cand = cand_sets[candidate_id] = _skill_set(G, candidate_id, "has_skill")
+        job = job_sets.get(job_id)
+        if job is None:
+            job = job_sets[job_id] = _skill_set(G, job_id, "requires_skill")
+        n_overlap = len(cand & job)
+        out.append({
+            "candidate_id": candidate_id,
+            "job_id": job_id,
+            "overlap": n_overlap,
+            "missing": len(job) - n_overlap,
+            "jaccard": (n_overlap / len(job)) if job else 0.0
+        })
+    return out
+
+# ----- columnar node properties -----------------------------------------------
+
+class PropStore:
+    """
+    Node `props` stored column-wise by node index.
+    Frequent keys whose values share one scalar type get a typed column
+    (bool/int/float arrays with a presence mask, strings dictionary-encoded);
+    everything else stays in a per-row JSON fallback decoded only on read.
+    """
+    def __init__(self):
+        self.n = 0
+        self.present = None                          # bool: row has a props dict at all
+        self.columns: Dict[str, Dict[str, Any]] = {} # key -> {"kind", "values", "mask"[, "table"]}
+        self.rest: List[str | None] = []             # JSON of the remaining keys
+
+    @classmethod
+    def from_dicts(cls, rows: List[Dict[str, Any] | None], min_share: float = 0.01) -> "PropStore":
+        import numpy as np
+
+        ps = cls()
+        ps.n = len(rows)
+        ps.present = np.array([r is not None for r in rows], dtype=bool)
+        kinds: Dict[str, set] = {}
+        counts: Dict[str, int] = {}
+        for r in rows:
+            for k, v in (r or {}).items():
+                counts[k] = counts.get(k, 0) + 1
+                kinds.setdefault(k, set()).add(
+                    "bool" if isinstance(v, bool) else "int" if isinstance(v, int)
+                    else "float" if isinstance(v, float) else "str" if isinstance(v, str) else "other"
+                )
+        min_count = max(2, int(min_share * ps.n))
+        for k, ks in kinds.items():
+            if counts[k] < min_count or len(ks) != 1 or "other" in ks:
+                continue
+            kind = next(iter(ks))
+            mask = np.zeros(ps.n, dtype=bool)
+            col: Dict[str, Any] = {"kind": kind, "mask": mask}
+            if kind == "str":
+                table: Dict[str, int] = {}
+                values = np.full(ps.n, -1, dtype=np.int32)
+                for i, r in enumerate(rows):
+                    if r and k in r:
+                        values[i] = table.setdefault(r[k], len(table))
+                        mask[i] = True
+                col["table"] = list(table)
+            else:
+                dtype = {"bool": np.bool_, "int": np.int64, "float": np.float64}[kind]
+                values = np.zeros(ps.n, dtype=dtype)
+                for i, r in enumerate(rows):
+                    if r and k in r:
+                        values[i] = r[k]
+                        mask[i] = True
+            col["values"] = values
+            ps.columns[k] = col
+        for r in rows:
+            extra = {k: v for k, v in (r or {}).items() if k not in ps.columns}
+            ps.rest.append(json.dumps(extra, default=str) if extra else None)
+        return ps
+
+    def _value(self, key: str, i: int):
+        col = self.columns[key]
+        v = col["values"][i]
+        return col["table"][v] if col["kind"] == "str" else v.item()
+
+    def get(self, i: int) -> Dict[str, Any] | None:
+        """Props dict of row i (None if the node had none)."""
+        if not self.present[i]:
+            return None
+        out = {k: self._value(k, i) for k, col in self.columns.items() if col["mask"][i]}
+        if self.rest[i] is not None:
+            out.update(json.loads(self.rest[i]))
+        return out
+
+    def get_value(self, i: int, key: str, default=None):
+        col = self.columns.get(key)
+        if col is not None:
+            return self._value(key, i) if col["mask"][i] else default
+        if self.rest[i] is None:
+            return default
+        return json.loads(self.rest[i]).get(key, default)
+
+    def rows_equal(self, key: str, value):
+        """Row indices whose props[key] == value (vectorized for typed columns)."""
+        import numpy as np
+
+        col = self.columns.get(key)
+        if col is None:
+            return np.array([i for i in range(self.n) if self.get_value(i, key, _MISSING) == value], dtype=np.int64)
+        if col["kind"] == "str":
+            if value not in col["table"]:
+                return np.empty(0, dtype=np.int64)
+            return np.flatnonzero(col["values"] == col["table"].index(value))
+        if isinstance(value, (str, bytes)) or not isinstance(value, (bool, int, float)):
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(col["mask"] & (col["values"] == value))
+
+# ----- compact (CSR) backend ----------------------------------------------------
+
+class CompactGraph:
+    """
+    Read-only, integer-indexed copy of a KG.
+    Node ids are interned to ints; node attributes live in side arrays and
+    edges are CSR arrays per relation (forward for targets, reverse for
+    sources), so a traversal is an array slice instead of nested dict walks.
+    Serves the same neighbors_of / find_nodes / skill_overlap queries; use
+    from_networkx / to_networkx to convert (e.g. for simple_draw).
+    Edges are keyed by relation (relation or key); only relation, key,
+    weight and sources are kept per edge. Node props sit in a columnar
+    PropStore and are only decoded when a caller actually reads them.
+    """
+    def __init__(self):
+        self.ids: List[str] = []
+        self.pos: Dict[str, int] = {}
+        self.type_names: List[str | None] = []
+        self.type_codes = None                      # int16 per node -> type_names
+        self.labels: List[str | None] = []
+        self.search_labels: List[str] = []
+        self.props: PropStore = PropStore()
+        self.source_sets: List[frozenset] = []
+        self.node_sources = None                    # int16 per node -> source_sets (-1: none)
+        self.strings: List[str] = []                # edge keys / relation values
+        self.rels: Dict[str, Dict[str, Any]] = {}   # rel -> CSR arrays
+        self._label_index: KGIndex | None = None  # see label_index()
+
+    @classmethod
+    def from_networkx(cls, G: nx.MultiDiGraph) -> "CompactGraph":
+        import numpy as np
+
+        cg = cls()
+        cg.ids = list(G.nodes)
+        cg.pos = {nid: i for i, nid in enumerate(cg.ids)}
+        n = len(cg.ids)
+        type_code: Dict[str | None, int] = {}
+        source_code: Dict[frozenset, int] = {}
+        string_code: Dict[str, int] = {}
+        cg.type_codes = np.empty(n, dtype=np.int16)
+        cg.node_sources = np.full(n, -1, dtype=np.int16)
+        props = []
+        for i, (nid, data) in enumerate(G.nodes(data=True)):
+            cg.type_codes[i] = type_code.setdefault(data.get("type"), len(type_code))
+            cg.labels.append(data.get("label"))
+            cg.search_labels.append(_search_label(data))
+            props.append(data.get("props"))
+            if "sources" in data:
+                cg.node_sources[i] = source_code.setdefault(_intern_sources(data["sources"]), len(source_code))
+
+        groups: Dict[str, Dict[str, list]] = {}
+        for u, v, key, data in G.edges(keys=True, data=True):
+            grp = groups.setdefault(data.get("relation") or key, {k: [] for k in ("src", "tgt", "w", "key", "rel", "sources")})
+            grp["src"].append(cg.pos[u])
+            grp["tgt"].append(cg.pos[v])
+            grp["w"].append(data.get("weight", 1))
+            grp["key"].append(string_code.setdefault(str(key), len(string_code)))
+            grp["rel"].append(string_code.setdefault(data.get("relation", ""), len(string_code)))
+            grp["sources"].append(source_code.setdefault(_intern_sources(data.get("sources", ())), len(source_code)))
+
+        for rel, grp in groups.items():
+            src = np.asarray(grp["src"], dtype=np.int32)
+            tgt = np.asarray(grp["tgt"], dtype=np.int32)
+            fwd = np.argsort(src, kind="stable")
+            rev = np.argsort(tgt, kind="stable")
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+            rindptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(tgt, minlength=n), out=rindptr[1:])
+            cg.rels[rel] = {
+                "indptr": indptr,
+                "indices": tgt[fwd],
+                "weight": np.asarray(grp["w"])[fwd],
+                "key": np.asarray(grp["key"], dtype=np.int32)[fwd],
+                "relation": np.asarray(grp["rel"], dtype=np.int32)[fwd],
+                "sources": np.asarray(grp["sources"], dtype=np.int16)[fwd],
+                "rindptr": rindptr,
+                "rindices": src[rev],
+            }
+        cg.props = PropStore.from_dicts(props)
+        cg.type_names = list(type_code)
+        cg.source_sets = list(source_code)
+        cg.strings = list(string_code)
+        return cg
+
+    def to_networkx(self) -> nx.MultiDiGraph:
+        G = nx.MultiDiGraph()
+        for i, nid in enumerate(self.ids):
+            G.add_node(nid, **self.node_data(i))
+        for rel, csr in self.rels.items():
+            indptr = csr["indptr"]
+            for i in range(len(self.ids)):
+                for j in range(indptr[i], indptr[i + 1]):
+                    attrs = {
+                        "relation": self.strings[csr["relation"][j]],
+                        "weight": csr["weight"][j].item(),
+                        "sources": self.source_sets[csr["sources"][j]],
+                    }
+                    G.add_edge(self.ids[i], self.ids[csr["indices"][j]], key=self.strings[csr["key"][j]], **attrs)
+        return G
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.pos
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def number_of_nodes(self) -> int:
+        return len(self.ids)
+
+    def number_of_edges(self) -> int:
+        return sum(len(csr["indices"]) for csr in self.rels.values())
+
+    def node_data(self, i: int) -> Dict[str, Any]:
+        """Attribute dict of node #i, rebuilt from the side arrays."""
+        data: Dict[str, Any] = {}
+        t = self.type_names[self.type_codes[i]]
+        if t is not None:
+            data["type"] = t
+        if self.labels[i] is not None:
+            data["label"] = self.labels[i]
+        if self.props.present[i]:
+            data["props"] = self.props.get(i)
+        if self.node_sources[i] >= 0:
+            data["sources"] = self.source_sets[self.node_sources[i]]
+        return data
+
+    def node_view(self, i: int) -> "CompactNodeView":
+        return CompactNodeView(self, i)
+
+    def filter_by_prop(self, key: str, value, type_: str | None = None) -> List[str]:
+        rows = self.props.rows_equal(key, value)
+        t = (type_ or "").lower().strip()
+        if t:
+            if t not in self.type_names:
+                return []
+            rows = rows[self.type_codes[rows] == self.type_names.index(t)]
+        return [self.ids[i] for i in rows]
+
+    def type_label(self, node_id: str) -> Tuple[str | None, str] | None:
+        """(type, normalized label) of a node, without building its attribute dict."""
+        i = self.pos.get(node_id)
+        return None if i is None else (self.type_names[self.type_codes[i]], self.search_labels[i])
+
+    def relations(self) -> List[str]:
+        return list(self.rels)
+
+    def _targets(self, i: int, rel: str):
+        csr = self.rels.get(rel)
+        if csr is None:
+            return ()
+        return csr["indices"][csr["indptr"][i]:csr["indptr"][i + 1]]
+
+    def _sources(self, i: int, rel: str):
+        csr = self.rels.get(rel)
+        if csr is None:
+            return ()
+        return csr["rindices"][csr["rindptr"][i]:csr["rindptr"][i + 1]]
+
+    def neighbors_of(self, node_id: str) -> Dict[str, Any]:
+        i = self.pos.get(node_id)
+        if i is None:
+            return {}
+        out = {}
+        for rel in self.rels:
+            targets = self._targets(i, rel)
+            if len(targets):
+                out[rel] = [self.ids[j] for j in targets]
+        return out
+
+    def targets_of(self, node_id: str, relation: str) -> List[str]:
+        i = self.pos.get(node_id)
+        return [] if i is None else [self.ids[j] for j in self._targets(i, relation.lower())]
+
+    def sources_of(self, node_id: str, relation: str) -> List[str]:
+        i = self.pos.get(node_id)
+        return [] if i is None else [self.ids[j] for j in self._sources(i, relation.lower())]
+
+    def find_nodes(
+        self,
+        *,
+        type_: str | None = None,
+        label_contains: str | None = None,
+        label_prefix: str | None = None,
+        label_exact: str | None = None,
+    ):
+        import numpy as np
+
+        t = (type_ or "").lower().strip()
+        label_filters = _label_filters(label_exact, label_prefix, label_contains)
+        if label_filters:
+            # same index and order (by id) as the networkx path, keyed by row
+            hits = sorted((self.ids[i], i) for i in _label_hits(self.label_index(), t, label_filters))
+            for nid, i in hits:
+                yield nid, self.node_view(i)
+            return
+        if t:
+            if t not in self.type_names:
+                return
+            rows = np.flatnonzero(self.type_codes == self.type_names.index(t)).tolist()
+        else:
+            rows = range(len(self.ids))
+        for i in rows:
+            yield self.ids[i], self.node_view(i)
+
+    def label_index(self):
+        """
+        Type/label/trigram index over the rows: read from the snapshot (see
+        SnapshotLabelIndex), else built on first use (once per loaded version).
+        """
+        idx = self._label_index
+        if idx is None:
+            # threads racing here each build one; the last one is kept, both are equal
+            idx = KGIndex()
+            type_names, type_codes = self.type_names, self.type_codes
+            for i, label in enumerate(self.search_labels):
+                idx.add_label(i, type_names[type_codes[i]], label)
+            self._label_index = idx
+        return idx
+
+    def __getstate__(self):
+        return {**self.__dict__, "_label_index": None}  # rebuilt on demand
+
+    def _skills(self, node_id: str, rel: str) -> set[str]:
+        i = self.pos.get(node_id)
+        if i is None or "skill" not in self.type_names:
+            return set()
+        skill = self.type_names.index("skill")
+        return {self.ids[j] for j in self._targets(i, rel) if self.type_codes[j] == skill}
+
+    def skill_overlap(self, candidate_id: str, job_id: str) -> Dict[str, Any]:
+        cand_sk = self._skills(candidate_id, "has_skill")
+        job_sk = self._skills(job_id, "requires_skill")
+        overlap = cand_sk & job_sk
+        return {
+            "candidate_skills": sorted(cand_sk),
+            "job_required_skills": sorted(job_sk),
+            "overlap": sorted(overlap),
+            "missing": sorted(job_sk - cand_sk),
+            "jaccard": (len(overlap) / len(job_sk)) if job_sk else 0.0
+        }
+
+class CompactNodeView(Mapping):
+    """Read-only attribute mapping of one CompactGraph node; props decoded on access."""
+    __slots__ = ("_cg", "_i")
+
+    def __init__(self, cg: CompactGraph, i: int):
+        self._cg = cg
+        self._i = i
+
+    def _keys(self) -> List[str]:
+        cg, i = self._cg, self._i
+        keys = []
+        if cg.type_names[cg.type_codes[i]] is not None:
+            keys.append("type")
+        if cg.labels[i] is not None:
+            keys.append("label")
+        if cg.props.present[i]:
+            keys.append("props")
+        if cg.node_sources[i] >= 0:
+            keys.append("sources")
+        return keys
+
+    def __getitem__(self, key: str):
+        cg, i = self._cg, self._i
+        if key in self._keys():
+            if key == "type":
+                return cg.type_names[cg.type_codes[i]]
+            if key == "label":
+                return cg.labels[i]
+            if key == "props":
+                return cg.props.get(i)
+            return cg.source_sets[cg.node_sources[i]]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self) -> int:
+        return len(self._keys())
+
+def filter_nodes_by_prop(G, key: str, value, type_: str | None = None) -> List[str]:
+    """Ids of nodes with props[key] == value, e.g. all jobs with job_level "mid"."""
+    if not isinstance(G, nx.MultiDiGraph):
+        return G.filter_by_prop(key, value, type_=type_)
+    t = (type_ or "").lower().strip()
+    return [
+        nid for nid, data in G.nodes(data=True)
+        if (not t or data.get("type") == t) and (data.get("props") or {}).get(key, _MISSING) == value
+    ]
+
 # ----- visualization & persistence -------------------------------------------
 
 def simple_draw(G: nx.MultiDiGraph, node_limit: int = 80) -> None:
@@ -167,6 +1699,8 @@ def simple_draw(G: nx.MultiDiGraph, node_limit: int = 80) -> None:
     """
     import matplotlib.pyplot as plt
 
+    if not isinstance(G, nx.MultiDiGraph):
+        G = G.to_networkx()
     # limit nodes for readability
     H = G.copy()
     if H.number_of_nodes() > node_limit:
@@ -196,11 +1730,889 @@ def simple_draw(G: nx.MultiDiGraph, node_limit: int = 80) -> None:
 def save_gpickle(G: nx.MultiDiGraph, path: str) -> None:
     if not path.endswith(".gpickle"):
         path = os.path.join(path, "graph.gpickle")
-    with open(path, "wb") as f:
+    # write-then-rename so a crash never leaves a half-written graph behind
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
         pickle.dump(G, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
     print(f"[✓] Graph saved at {path}")
 
 def load_gpickle(path: str) -> nx.MultiDiGraph:
     with open(path, "rb") as f:
         return pickle.load(f)
 
+
+# ----- binary snapshots -------------------------------------------------------
+#
+# Layout: MAGIC | u16 version | u32 header length | JSON header | sections.
+# Every section is a raw little-endian array starting on a 64-byte boundary;
+# the header maps section name -> [offset, dtype, count]. Strings (ids,
+# labels, JSON props) are one utf-8 blob plus an int64 offsets array, so a
+# load only maps the file: nothing is decoded until a query touches it.
+
+SNAPSHOT_MAGIC = b"KGSNAP"
+SNAPSHOT_VERSION = 1
+_ALIGN = 64
+
+class StringTable(Sequence):
+    """Strings stored as a utf-8 blob + offsets (optionally None-masked), decoded per access."""
+    def __init__(self, offsets, blob, mask=None):
+        self.offsets = offsets
+        self.blob = blob
+        self.mask = mask
+
+    @staticmethod
+    def encode(strings: List[str | None]):
+        import numpy as np
+
+        data = [(x or "").encode() for x in strings]
+        offsets = np.zeros(len(data) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in data], out=offsets[1:])
+        blob = np.frombuffer(b"".join(data), dtype=np.uint8)
+        mask = np.array([x is not None for x in strings], dtype=bool)
+        return offsets, blob, mask
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        i = int(i)
+        if i < 0 or i >= len(self):
+            raise IndexError(i)
+        if self.mask is not None and not self.mask[i]:
+            return None
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode()
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+class _IdLookup:
+    """node id -> position, by binary search over the ids in sorted order."""
+    def __init__(self, ids: StringTable, order):
+        self.ids = ids
+        self.order = order
+
+    def get(self, node_id: str, default=None):
+        order, ids = self.order, self.ids
+        lo = bisect_left(range(len(order)), node_id, key=lambda j: ids[order[j]])
+        if lo < len(order) and ids[order[lo]] == node_id:
+            return int(order[lo])
+        return default
+
+    def __getitem__(self, node_id: str) -> int:
+        pos = self.get(node_id)
+        if pos is None:
+            raise KeyError(node_id)
+        return pos
+
+    def __contains__(self, node_id: str) -> bool:
+        return self.get(node_id) is not None
+
+class _RowsOfType:
+    """Rows of one node type, as a container (for SnapshotLabelIndex.by_type)."""
+    def __init__(self, type_codes, code: int):
+        self.type_codes = type_codes
+        self.code = code
+
+    def __contains__(self, i) -> bool:
+        return self.type_codes[i] == self.code
+
+class SnapshotLabelIndex:
+    """
+    The label lookups of KGIndex over sections of a snapshot, keyed by row:
+    rows sorted by normalized label (exact / prefix by binary search) and
+    trigram postings (sorted grams, CSR of ascending rows) for substrings.
+    Nothing is built on load; lookups touch only the pages they need.
+    """
+    def __init__(self, labels: StringTable, order, grams: StringTable, indptr, rows, type_names, type_codes):
+        self.labels = labels
+        self.order = order
+        self.grams = grams
+        self.indptr = indptr
+        self.rows = rows
+        self.type_names = type_names
+        self.type_codes = type_codes
+
+    @property
+    def by_type(self) -> Dict[str | None, _RowsOfType]:
+        return {t: _RowsOfType(self.type_codes, code) for code, t in enumerate(self.type_names)}
+
+    def _label_range(self, lo: str, hi: str | None = None):
+        order, labels = self.order, self.labels
+        key = lambda j: labels[order[j]]
+        start = bisect_left(range(len(order)), lo, key=key)
+        end = bisect_left(range(len(order)), hi, key=key) if hi is not None else start
+        if hi is None:
+            while end < len(order) and labels[order[end]] == lo:
+                end += 1
+        return order[start:end].tolist()
+
+    def _postings(self, gram: str):
+        import numpy as np
+
+        grams = self.grams
+        i = bisect_left(range(len(grams)), gram, key=grams.__getitem__)
+        if i == len(grams) or grams[i] != gram:
+            return np.empty(0, dtype=np.int32)
+        return self.rows[self.indptr[i]:self.indptr[i + 1]]
+
+    def search_label(self, q: str, mode: str = "contains") -> Iterable[int]:
+        import numpy as np
+
+        if mode == "exact":
+            return self._label_range(q)
+        if mode == "prefix":
+            return self._label_range(q, q + "\U0010ffff")
+        if len(q) < 3:
+            return [i for i in range(len(self.labels)) if q in self.labels[i]]
+        postings = sorted((self._postings(g) for g in _trigrams(q)), key=len)
+        hits = postings[0]
+        for p in postings[1:]:
+            if not len(hits):
+                break
+            hits = np.intersect1d(hits, p, assume_unique=True)
+        return hits.tolist()
+
+def save_snapshot(G, path: str) -> None:
+    """
+    Write G (MultiDiGraph or CompactGraph) as a memory-mappable snapshot.
+    Atomic: written to a temp file in the same directory, fsync'd, then renamed.
+    """
+    import numpy as np
+
+    if isinstance(G, SQLiteGraph):
+        G = G.to_networkx()
+    cg = G if isinstance(G, CompactGraph) else CompactGraph.from_networkx(G)
+    sections: List[Tuple[str, Any]] = []
+
+    def strings(name: str, values):
+        offsets, blob, mask = StringTable.encode(list(values))
+        sections.extend([(f"{name}.off", offsets), (f"{name}.blob", blob), (f"{name}.mask", mask)])
+
+    ids = list(cg.ids)
+    strings("ids", ids)
+    strings("labels", cg.labels)
+    search = list(cg.search_labels)
+    strings("search", search)
+    # label index (see SnapshotLabelIndex)
+    sections.append(("label_order", np.asarray(sorted(range(len(search)), key=search.__getitem__), dtype=np.int64)))
+    postings: Dict[str, List[int]] = {}
+    for i, label in enumerate(search):
+        for g in _trigrams(f"\x02{label}\x03"):
+            postings.setdefault(g, []).append(i)
+    grams = sorted(postings)
+    strings("grams", grams)
+    sections.append(("gram_indptr", np.cumsum([0] + [len(postings[g]) for g in grams], dtype=np.int64)))
+    sections.append(("gram_rows", np.asarray([i for g in grams for i in postings[g]], dtype=np.int32)))
+    sections.append(("id_order", np.asarray(sorted(range(len(ids)), key=ids.__getitem__), dtype=np.int64)))
+    sections.append(("type_codes", np.asarray(cg.type_codes)))
+    sections.append(("node_sources", np.asarray(cg.node_sources)))
+    sections.append(("props.present", np.asarray(cg.props.present)))
+    strings("props.rest", cg.props.rest)
+    props_meta = {}
+    for i, (key, col) in enumerate(cg.props.columns.items()):
+        props_meta[key] = {"kind": col["kind"], "section": f"props.{i}"}
+        sections.append((f"props.{i}.values", np.asarray(col["values"])))
+        sections.append((f"props.{i}.mask", np.asarray(col["mask"])))
+        if col["kind"] == "str":
+            strings(f"props.{i}.table", col["table"])
+    rels = list(cg.rels)
+    for i, rel in enumerate(rels):
+        for name, arr in cg.rels[rel].items():
+            sections.append((f"rel.{i}.{name}", np.asarray(arr)))
+
+    header: Dict[str, Any] = {
+        "version": SNAPSHOT_VERSION,
+        "type_names": cg.type_names,
+        "source_sets": [sorted(x) for x in cg.source_sets],
+        "strings": list(cg.strings),
+        "rels": rels,
+        "props": props_meta,
+        "sections": {},
+    }
+    offset = 0
+    layout = []
+    for name, arr in sections:
+        offset = -(-offset // _ALIGN) * _ALIGN
+        layout.append((name, offset, arr))
+        offset += arr.nbytes
+    end = -(-offset // _ALIGN) * _ALIGN
+
+    # section offsets depend on the header size and vice versa: grow until it fits
+    prefix = len(SNAPSHOT_MAGIC) + 6
+    base = 0
+    while True:
+        header["sections"] = {name: [base + off, arr.dtype.str, int(arr.size)] for name, off, arr in layout}
+        raw = json.dumps(header).encode()
+        need = -(-(prefix + len(raw)) // _ALIGN) * _ALIGN
+        if need <= base:
+            break
+        base = need
+    raw = raw.ljust(base - prefix)
+
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(SNAPSHOT_MAGIC + struct.pack("<HI", SNAPSHOT_VERSION, len(raw)) + raw)
+        for _, off, arr in layout:
+            f.seek(base + off)
+            f.write(np.ascontiguousarray(arr).tobytes())
+        f.truncate(base + end)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def load_snapshot(path: str) -> CompactGraph:
+    """
+    Map a snapshot read-only and wrap it as a CompactGraph. Arrays are views
+    into the mapping, so pages are faulted in on demand and shared between
+    processes through the page cache.
+    """
+    import numpy as np
+
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError(f"{path} is not a KG snapshot")
+    version, hlen = struct.unpack_from("<HI", mm, len(SNAPSHOT_MAGIC))
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version} (expected {SNAPSHOT_VERSION})")
+    start = len(SNAPSHOT_MAGIC) + 6
+    header = json.loads(mm[start:start + hlen])
+    secs = header["sections"]
+
+    def arr(name: str):
+        off, dtype, count = secs[name]
+        return np.frombuffer(mm, dtype=np.dtype(dtype), count=count, offset=off)
+
+    def strings(name: str) -> StringTable:
+        return StringTable(arr(f"{name}.off"), arr(f"{name}.blob"), arr(f"{name}.mask"))
+
+    cg = CompactGraph()
+    cg._mmap = mm  # keeps the mapping alive as long as the graph
+    cg.ids = strings("ids")
+    cg.pos = _IdLookup(cg.ids, arr("id_order"))
+    cg.labels = strings("labels")
+    cg.search_labels = strings("search")
+    cg.type_names = header["type_names"]
+    cg.type_codes = arr("type_codes")
+    cg.node_sources = arr("node_sources")
+    cg.source_sets = [_intern_sources(x) for x in header["source_sets"]]
+    cg.strings = header["strings"]
+    if "label_order" in secs:  # older snapshots have no label index; label_index() builds one
+        cg._label_index = SnapshotLabelIndex(cg.search_labels, arr("label_order"), strings("grams"),
+                                             arr("gram_indptr"), arr("gram_rows"), cg.type_names, cg.type_codes)
+
+    ps = PropStore()
+    ps.present = arr("props.present")
+    ps.n = len(ps.present)
+    ps.rest = strings("props.rest")
+    for key, meta in header["props"].items():
+        name = meta["section"]
+        col = {"kind": meta["kind"], "values": arr(f"{name}.values"), "mask": arr(f"{name}.mask")}
+        if meta["kind"] == "str":
+            col["table"] = strings(f"{name}.table")
+        ps.columns[key] = col
+    cg.props = ps
+
+    names = ("indptr", "indices", "weight", "key", "relation", "sources", "rindptr", "rindices")
+    cg.rels = {rel: {n: arr(f"rel.{i}.{n}") for n in names} for i, rel in enumerate(header["rels"])}
+    return cg
+
+def convert_gpickle_to_snapshot(src: str, dst: str | None = None) -> str:
+    """Convert an existing .gpickle KG into a snapshot (default: same name, .kgsnap)."""
+    dst = dst or os.path.splitext(src)[0] + ".kgsnap"
+    save_snapshot(load_gpickle(src), dst)
+    return dst
+
+# ----- write-ahead log --------------------------------------------------------
+
+class LoggedGraph:
+    """
+    Long-lived KG persisted as a snapshot plus an append-only delta log.
+    Each upsert/removal of an entity graph is appended (crc-checked JSON line,
+    fsync'd) before it is applied, so persisting a new CV costs one small
+    write instead of re-pickling the whole KG. Every `compact_every` records
+    the KG is written to the snapshot (gpickle, ledger included) and the log
+    restarts; on load the snapshot is read and the log tail replayed.
+    Writes hold a thread lock and an exclusive flock on <log>.lock, and first
+    replay what other processes appended (or reload after their compaction),
+    so several workers may write the same log.
+    Optionally also exports a read-only copy for query workers (.kgsnap /
+    .sqlite) through a GraphChannel, on compaction and on export(); a full
+    export rewrites the whole file, so export_soon() batches them.
+    """
+    def __init__(self, snapshot_path: str, log_path: str | None = None,
+                 compact_every: int = 500, export_path: str | None = None,
+                 export_delay: float = 2.0):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path or os.path.splitext(snapshot_path)[0] + ".wal"
+        self.compact_every = compact_every
+        self.export_path = export_path
+        self.export_delay = export_delay
+        self.channel = GraphChannel(export_path) if export_path else None
+        self.KG: nx.MultiDiGraph | None = None
+        self.frozen = False  # KG was handed out by snapshot(); the next write forks it
+        self.seq = 0
+        self.pending = 0
+        self._log = None
+        self._pos = 0  # bytes of the log read or written by this process
+        self._snapshot_id = None  # (inode, mtime) of the snapshot KG was loaded from
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._depth = 0  # nesting of _locked() in the thread holding _lock
+        self._export_lock = threading.Lock()  # guards _export_timer
+        self._export_timer: threading.Timer | None = None
+
+    def graph(self) -> nx.MultiDiGraph:
+        """The KG: snapshot + replayed log, loaded on first use."""
+        if self.KG is None:
+            with self._locked():
+                pass
+        return self.KG
+
+    def snapshot(self) -> nx.MultiDiGraph:
+        """
+        The current KG as an immutable version to publish to readers. Later
+        writes go to a fork (see fork_graph), so the returned graph never changes.
+        """
+        with self._lock:
+            KG = self.graph()
+            self.frozen = True
+            return KG
+
+    def _writable(self) -> nx.MultiDiGraph:
+        if self.frozen:
+            self.KG = fork_graph(self.KG)
+            self.frozen = False
+        return self.KG
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive write access, caught up with what other processes wrote to the log."""
+        with self._lock:
+            self._depth += 1
+            try:
+                if self._depth == 1:
+                    if self._lock_file is None:
+                        self._lock_file = open(self.log_path + ".lock", "ab")
+                    if fcntl is not None:
+                        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+                    if self.KG is None or self._stat_snapshot() != self._snapshot_id:
+                        self._load()  # first use, or another process compacted
+                    else:
+                        self._replay()
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0 and fcntl is not None and self._lock_file is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _stat_snapshot(self):
+        try:
+            st = os.stat(self.snapshot_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _load(self) -> None:
+        self._snapshot_id = self._stat_snapshot()
+        KG = load_gpickle(self.snapshot_path) if self._snapshot_id is not None else nx.MultiDiGraph()
+        self.KG, self.frozen = KG, False
+        self.seq = KG.graph.get("wal_seq", 0)
+        self.pending = 0
+        self._pos = 0
+        if self._log is None:
+            self._log = open(self.log_path, "ab")
+        self._replay()
+
+    def _replay(self) -> None:
+        """Apply the records appended to the log since this process last read or wrote it."""
+        if os.path.getsize(self.log_path) == self._pos:
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(self._pos)
+            for line in f:
+                rec = self._decode(line)
+                if rec is None:
+                    break  # torn tail from a crash mid-append; everything after it is dropped
+                self._pos += len(line)
+                if rec["seq"] <= self.seq:
+                    continue  # already in the snapshot (crash between compaction steps)
+                if rec["op"] == "upsert":
+                    try:
+                        parts = _entity_parts(rec["graph"])
+                    except ValueError as e:
+                        # logged by a writer from before validation: set it aside instead of failing every load
+                        self._quarantine(line, e)
+                    else:
+                        _upsert_parts(self._writable(), rec["entity"], _graph_fingerprint(rec["graph"]), parts)
+                elif rec["op"] == "remove":
+                    remove_entity_graph(self._writable(), rec["entity"])
+                self.seq = rec["seq"]
+                self.pending += 1
+        self._log.truncate(self._pos)
+
+    def _quarantine(self, line: bytes, error: Exception) -> None:
+        with open(self.log_path + ".rejected", "ab") as f:
+            f.write(line)
+        print(f"[!] Skipped a log record that does not apply ({error}); kept in {self.log_path}.rejected")
+
+    @staticmethod
+    def _decode(line: bytes) -> Dict[str, Any] | None:
+        crc, _, body = line.rstrip(b"\n").partition(b" ")
+        if not line.endswith(b"\n") or len(crc) != 8 or int(crc, 16) != zlib.crc32(body):
+            return None
+        return json.loads(body)
+
+    def _append(self, rec: Dict[str, Any]) -> None:
+        self.seq += 1
+        body = json.dumps({"seq": self.seq, **rec}, default=str).encode()
+        line = b"%08x %s\n" % (zlib.crc32(body), body)
+        self._log.write(line)
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._pos += len(line)
+        self.pending += 1
+
+    def upsert_entity_graph(self, entity_id: str, graph_json: Dict[str, Any]) -> bool:
+        """Log and apply one entity graph; ValueError (nothing logged or changed) if it is malformed."""
+        with self._locked():
+            fingerprint = _graph_fingerprint(graph_json)
+            prev = _get_ledger(self.KG).entities.get(entity_id)
+            if prev is not None and prev["fingerprint"] == fingerprint:
+                return False
+            parts = _entity_parts(graph_json)  # a record that can't be applied never reaches the log
+            self._append({"op": "upsert", "entity": entity_id, "graph": graph_json})
+            _upsert_parts(self._writable(), entity_id, fingerprint, parts)
+            self._maybe_compact()
+            return True
+
+    def remove_entity_graph(self, entity_id: str) -> bool:
+        with self._locked():
+            if entity_id not in _get_ledger(self.KG).entities:
+                return False
+            self._append({"op": "remove", "entity": entity_id})
+            remove_entity_graph(self._writable(), entity_id)
+            self._maybe_compact()
+            return True
+
+    def sync(self, entities: Dict[str, Dict[str, Any]]) -> bool:
+        """Make the KG hold exactly these entity graphs, in one locked step. Returns True if it changed."""
+        with self._locked():
+            changed = False
+            if not entity_ids(self.KG) and self.KG.number_of_nodes():
+                # snapshot from before incremental ingest: rebuild it from the entities once
+                self.reset()
+                changed = True
+            for entity_id, graph in entities.items():
+                try:
+                    changed |= self.upsert_entity_graph(entity_id, graph)
+                except ValueError as e:
+                    # one bad CV / job must not hold up the rest; its previous graph (if any) stays
+                    print(f"[!] Skipped {entity_id}: {e}")
+            for entity_id in set(entity_ids(self.KG)) - set(entities):
+                changed |= self.remove_entity_graph(entity_id)
+            return changed
+
+    def _maybe_compact(self) -> None:
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    def compact(self) -> None:
+        """Fold the log into the snapshot and start an empty log."""
+        with self._locked():
+            KG = self.KG
+            KG.graph["wal_seq"] = self.seq
+            save_gpickle(KG, self.snapshot_path)
+            self._snapshot_id = self._stat_snapshot()
+            self.export()
+            # every record is in the snapshot now, other writers' included (see _locked);
+            # truncate in place: the handle stays in append mode for everyone's next record
+            self._log.truncate(0)
+            os.fsync(self._log.fileno())
+            self._pos = 0
+            self.pending = 0
+
+    def export(self) -> int | None:
+        """Publish the current KG to query workers; returns the channel version."""
+        if self.channel is None:
+            return None
+        with self._locked():
+            # caught up with every writer, and the only publisher while it holds the lock:
+            # an older graph is never exported over a newer one
+            return self.channel.publish(self.snapshot())
+
+    def export_soon(self) -> None:
+        """
+        export() within export_delay seconds, from a timer thread. Changes made
+        meanwhile go out with that one export, so a burst of ingests costs one
+        full export instead of one each.
+        """
+        if self.channel is None:
+            return
+        with self._export_lock:
+            if self._export_timer is None:
+                self._export_timer = threading.Timer(self.export_delay, self._export_batched)
+                self._export_timer.daemon = True
+                self._export_timer.start()
+
+    def _export_batched(self) -> None:
+        with self._export_lock:
+            self._export_timer = None
+        self.export()
+
+    def reset(self) -> None:
+        """Drop everything: empty KG, compacted."""
+        with self._locked():
+            self.KG = nx.MultiDiGraph()
+            self.frozen = False
+            self.compact()
+
+    def close(self) -> None:
+        with self._export_lock:
+            timer, self._export_timer = self._export_timer, None
+        if timer is not None:
+            timer.cancel()
+            self.export()  # don't drop the batched export
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        if self.channel is not None:
+            self.channel.close()
+
+# ----- SQLite backend ---------------------------------------------------------
+
+_SQLITE_SCHEMA = """
+CREATE TABLE nodes (
+    id TEXT PRIMARY KEY, type TEXT, label TEXT, search_label TEXT NOT NULL,
+    props TEXT, sources TEXT
+);
+CREATE TABLE edges (
+    src TEXT NOT NULL, tgt TEXT NOT NULL, key TEXT NOT NULL, rel TEXT NOT NULL,
+    relation TEXT, weight REAL, sources TEXT,
+    PRIMARY KEY (src, tgt, key)
+);
+CREATE INDEX edges_out ON edges (src, rel);
+CREATE INDEX edges_in ON edges (tgt, rel);
+CREATE INDEX nodes_type ON nodes (type);
+CREATE INDEX nodes_label ON nodes (search_label);
+"""
+
+def save_sqlite(G, path: str) -> None:
+    """Write G to an indexed SQLite file (temp file + rename, like save_snapshot)."""
+    if not isinstance(G, nx.MultiDiGraph):
+        G = G.to_networkx()
+    tmp = f"{path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    con = sqlite3.connect(tmp)
+    try:
+        con.executescript(_SQLITE_SCHEMA)
+        con.executemany(
+            "INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (nid, data.get("type"), data.get("label"), _search_label(data),
+                 json.dumps(data["props"], default=str) if "props" in data else None,
+                 json.dumps(sorted(data["sources"])) if "sources" in data else None)
+                for nid, data in G.nodes(data=True)
+            ),
+        )
+        con.executemany(
+            "INSERT INTO edges VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (u, v, str(key), data.get("relation") or key, data.get("relation", ""),
+                 data.get("weight", 1), json.dumps(sorted(data.get("sources", ()))))
+                for u, v, key, data in G.edges(keys=True, data=True)
+            ),
+        )
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp, path)
+
+class _LRU:
+    """Small thread-safe LRU map."""
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.data: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.data:
+                return default
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def put(self, key, value) -> None:
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+class SQLiteGraph:
+    """
+    Out-of-core, read-only KG in an indexed SQLite file (see save_sqlite).
+    Node attributes and per-node adjacency are loaded on demand and kept in
+    bounded LRU caches, so resident memory stays flat as the KG grows.
+    Serves the same quick queries as a MultiDiGraph / CompactGraph.
+    """
+    def __init__(self, path: str, cache_size: int = 50_000):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        # one read-only connection for the graph's lifetime, shared by all threads: it
+        # keeps reading the file it opened after publish() replaces the path, where a
+        # connection opened later (e.g. per thread) would see the newer version
+        self._con = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._con.execute("PRAGMA schema_version").fetchone()
+        self._lock = threading.Lock()
+        self._nodes = _LRU(cache_size)
+        self._adj = _LRU(cache_size)
+
+    def _rows(self, sql: str, args=()) -> List[tuple]:
+        with self._lock:
+            return self._con.execute(sql, args).fetchall()
+
+    @staticmethod
+    def _row_data(row) -> Dict[str, Any]:
+        t, label, props, sources = row
+        data: Dict[str, Any] = {}
+        if t is not None:
+            data["type"] = t
+        if label is not None:
+            data["label"] = label
+        if props is not None:
+            data["props"] = json.loads(props)
+        if sources is not None:
+            data["sources"] = _intern_sources(json.loads(sources))
+        return data
+
+    def node_data(self, node_id: str) -> Dict[str, Any] | None:
+        data = self._nodes.get(node_id, _MISSING)
+        if data is _MISSING:
+            rows = self._rows("SELECT type, label, props, sources FROM nodes WHERE id = ?", (node_id,))
+            data = self._row_data(rows[0]) if rows else None
+            self._nodes.put(node_id, data)
+        return data
+
+    def type_label(self, node_id: str) -> Tuple[str | None, str] | None:
+        data = self.node_data(node_id)
+        return None if data is None else (data.get("type"), _search_label(data))
+
+    def relations(self) -> List[str]:
+        rels = getattr(self, "_rels", None)
+        if rels is None:
+            rels = self._rels = [rel for (rel,) in self._rows("SELECT DISTINCT rel FROM edges ORDER BY rel")]
+        return rels
+
+    def _out(self, node_id: str) -> Dict[str, List[str]]:
+        out = self._adj.get(node_id)
+        if out is None:
+            out = {}
+            for rel, tgt in self._rows("SELECT rel, tgt FROM edges WHERE src = ? ORDER BY rowid", (node_id,)):
+                out.setdefault(rel, {})[tgt] = None  # parallel edges collapse, like KGIndex
+            out = {rel: list(targets) for rel, targets in out.items()}
+            self._adj.put(node_id, out)
+        return out
+
+    def __contains__(self, node_id: str) -> bool:
+        return self.node_data(node_id) is not None
+
+    def __len__(self) -> int:
+        return self.number_of_nodes()
+
+    def number_of_nodes(self) -> int:
+        return self._rows("SELECT COUNT(*) FROM nodes")[0][0]
+
+    def number_of_edges(self) -> int:
+        return self._rows("SELECT COUNT(*) FROM edges")[0][0]
+
+    def neighbors_of(self, node_id: str) -> Dict[str, Any]:
+        if node_id not in self:
+            return {}
+        return {rel: list(targets) for rel, targets in self._out(node_id).items()}
+
+    def targets_of(self, node_id: str, relation: str) -> List[str]:
+        return list(self._out(node_id).get(relation.lower(), ()))
+
+    def sources_of(self, node_id: str, relation: str) -> List[str]:
+        rows = self._rows(
+            "SELECT src FROM edges WHERE tgt = ? AND rel = ? ORDER BY rowid", (node_id, relation.lower())
+        )
+        return list(dict.fromkeys(src for (src,) in rows))
+
+    def find_nodes(
+        self,
+        *,
+        type_: str | None = None,
+        label_contains: str | None = None,
+        label_prefix: str | None = None,
+        label_exact: str | None = None,
+    ):
+        where, args = [], []
+        t = (type_ or "").lower().strip()
+        if t:
+            where.append("type = ?")
+            args.append(t)
+        exact, prefix, contains = (_norm(q or "") for q in (label_exact, label_prefix, label_contains))
+        if exact:
+            where.append("search_label = ?")
+            args.append(exact)
+        if prefix:
+            # range scan on the label index; TEXT compares by code point
+            where.append("search_label >= ? AND search_label < ?")
+            args += [prefix, prefix + "\U0010ffff"]
+        if contains:
+            where.append("instr(search_label, ?) > 0")
+            args.append(contains)
+        sql = "SELECT id, type, label, props, sources FROM nodes"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # label hits come back sorted by id, type-only scans in insertion order
+        sql += " ORDER BY id" if exact or prefix or contains else " ORDER BY rowid"
+        for nid, *row in self._rows(sql, args):
+            data = self._row_data(row)
+            self._nodes.put(nid, data)
+            yield nid, data
+
+    def nodes_by_label(self, labels: List[str]) -> Dict[str, List[str]]:
+        wanted = {q: _norm(q) for q in labels}
+        ids: Dict[str, List[str]] = {}
+        rows = self._rows(
+            "SELECT search_label, id FROM nodes WHERE search_label IN (SELECT value FROM json_each(?)) ORDER BY id",
+            (json.dumps([n for n in set(wanted.values()) if n]),),
+        )
+        for label, nid in rows:
+            ids.setdefault(label, []).append(nid)
+        return {q: ids.get(n, []) if n else [] for q, n in wanted.items()}
+
+    def _skills(self, node_id: str, rel: str) -> set[str]:
+        rows = self._rows(
+            "SELECT e.tgt FROM edges e JOIN nodes n ON n.id = e.tgt WHERE e.src = ? AND e.rel = ? AND n.type = 'skill'",
+            (node_id, rel),
+        )
+        return {tgt for (tgt,) in rows}
+
+    def skill_overlap(self, candidate_id: str, job_id: str) -> Dict[str, Any]:
+        cand_sk = self._skills(candidate_id, "has_skill")
+        job_sk = self._skills(job_id, "requires_skill")
+        overlap = cand_sk & job_sk
+        return {
+            "candidate_skills": sorted(cand_sk),
+            "job_required_skills": sorted(job_sk),
+            "overlap": sorted(overlap),
+            "missing": sorted(job_sk - cand_sk),
+            "jaccard": (len(overlap) / len(job_sk)) if job_sk else 0.0
+        }
+
+    def filter_by_prop(self, key: str, value, type_: str | None = None) -> List[str]:
+        path = "$." + json.dumps(key)
+        if isinstance(value, (list, tuple, dict)):
+            # json_extract returns containers as JSON text in the stored key order, and
+            # sqlite3 can't bind them anyway: narrow down in SQL, compare decoded in Python
+            sql, args = "SELECT id, json_extract(props, ?) FROM nodes WHERE json_type(props, ?) = ?", \
+                [path, path, "object" if isinstance(value, dict) else "array"]
+            match = lambda v: json.loads(v) == value
+        else:
+            sql, args = "SELECT id, NULL FROM nodes WHERE json_extract(props, ?) = ?", [path, value]
+            match = lambda v: True
+        t = (type_ or "").lower().strip()
+        if t:
+            sql += " AND type = ?"
+            args.append(t)
+        return [nid for nid, v in self._rows(sql + " ORDER BY rowid", args) if match(v)]
+
+    def to_networkx(self) -> nx.MultiDiGraph:
+        G = nx.MultiDiGraph()
+        for nid, *row in self._rows("SELECT id, type, label, props, sources FROM nodes ORDER BY rowid"):
+            G.add_node(nid, **self._row_data(row))
+        for u, v, key, relation, weight, sources in self._rows(
+            "SELECT src, tgt, key, relation, weight, sources FROM edges ORDER BY rowid"
+        ):
+            weight = int(weight) if float(weight).is_integer() else weight
+            G.add_edge(u, v, key=key, relation=relation, weight=weight, sources=_intern_sources(json.loads(sources)))
+        return G
+
+def save_graph(G, path: str) -> None:
+    """Save in the format the extension names: .kgsnap (mmap), .sqlite, else gpickle."""
+    if path.endswith(".kgsnap"):
+        save_snapshot(G, path)
+    elif path.endswith(".sqlite"):
+        save_sqlite(G, path)
+    else:
+        save_gpickle(G, path)
+
+def load_graph(path: str, **kwargs):
+    """Counterpart of save_graph: CompactGraph, SQLiteGraph or MultiDiGraph by extension."""
+    if path.endswith(".kgsnap"):
+        return load_snapshot(path)
+    if path.endswith(".sqlite"):
+        return SQLiteGraph(path, **kwargs)
+    return load_gpickle(path)
+
+# ----- sharing across worker processes ----------------------------------------
+
+class GraphChannel:
+    """
+    Hands a read-only KG from one publishing process to any number of workers.
+    The graph lives in a file every worker maps read-only (.kgsnap arrays or
+    a .sqlite file), so the OS page cache holds one copy however many workers
+    attach. A version counter sits in a small mmap'd side file (<path>.ver):
+    publish() replaces the graph file atomically and then bumps it; workers
+    compare it on every call (a memory read, no syscall) and re-attach when it
+    moved. Graphs attached earlier stay valid, since the replaced file's
+    mapping lives on until they are dropped. One publisher at a time.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.version_path = path + ".ver"
+        self._mm = None
+
+    def _counter(self) -> mmap.mmap:
+        if self._mm is None:
+            if not os.path.exists(self.version_path):
+                tmp = f"{self.version_path}.tmp-{os.getpid()}"
+                with open(tmp, "wb") as f:
+                    f.write(bytes(8))
+                try:
+                    os.link(tmp, self.version_path)  # create once; never clobber a live counter
+                except FileExistsError:
+                    pass
+                finally:
+                    os.remove(tmp)
+            with open(self.version_path, "r+b") as f:
+                self._mm = mmap.mmap(f.fileno(), 8)
+        return self._mm
+
+    def version(self) -> int:
+        if self._mm is None and not os.path.exists(self.version_path):
+            return 0  # nothing published through this channel yet
+        return struct.unpack_from("<Q", self._counter())[0]
+
+    def publish(self, G) -> int:
+        """Write G where workers attach from and announce it. Returns the new version."""
+        save_graph(G, self.path)
+        mm = self._counter()
+        version = struct.unpack_from("<Q", mm)[0] + 1
+        struct.pack_into("<Q", mm, 0, version)
+        mm.flush()
+        return version
+
+    def attach(self, **kwargs) -> Tuple[int, Any]:
+        """(version, graph) as currently published; graph is None if nothing was published yet."""
+        version = self.version()
+        if not os.path.exists(self.path):
+            return version, None
+        return version, load_graph(self.path, **kwargs)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
@@ -0,0 +1,87 @@
+// Streams the agent's answer from /Agent/stream (Server-Sent Events) into the page:
+// one line per tool step while the agent works, then the answer as it is written.
+document.addEventListener("DOMContentLoaded", () => {
+  const form = document.getElementById("agentForm");
+  const prompt = document.getElementById("jobDescription");
+  const mode = document.getElementById("agentMode");
+  const steps = document.getElementById("agentSteps");
+  const answer = document.getElementById("agentAnswer");
+  const button = form?.querySelector("button[type='submit']");
+
+  if (!form || !window.ReadableStream) return; // no streaming: plain form post
+
+  form.addEventListener("submit", async (e) => {
+    e.preventDefault();
+    steps.innerHTML = "";
+    answer.textContent = "";
+    answer.classList.remove("error");
+    button.disabled = true;
+
+    const body = new FormData();
+    body.append("prompt", prompt.value);
+    if (mode?.value) body.append("mode", mode.value);
+
+    try {
+      const response = await fetch(form.dataset.streamUrl, { method: "POST", body });
+      if (!response.ok || !response.body) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || `Request failed (${response.status})`);
+      }
+      await readEvents(response.body, handleEvent);
+    } catch (err) {
+      showError(err.message);
+    } finally {
+      button.disabled = false;
+    }
+  });
+
+  // tool steps still running, by tool name (parallel calls of one tool queue up)
+  const running = {};
+
+  function handleEvent(type, data) {
+    if (type === "tool_start") {
+      const li = document.createElement("li");
+      li.textContent = `${data.tool}(${data.input})`;
+      steps.appendChild(li);
+      (running[data.tool] = running[data.tool] || []).push(li);
+    } else if (type === "tool_end") {
+      const li = (running[data.tool] || []).shift();
+      if (li) li.classList.add("done");
+    } else if (type === "token") {
+      answer.textContent += data.text;
+    } else if (type === "done") {
+      if (!answer.textContent) answer.textContent = data.answer;
+    } else if (type === "error") {
+      showError(data.message);
+    }
+  }
+
+  function showError(message) {
+    answer.classList.add("error");
+    answer.textContent = message;
+  }
+});
+
+// Parses an SSE body ("event: x\ndata: {...}\n\n" blocks) and calls onEvent(type, data) per event.
+async function readEvents(stream, onEvent) {
+  const reader = stream.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let end;
+    while ((end = buffer.indexOf("\n\n")) >= 0) {
+      const block = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      let type = "message";
+      let data = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event:")) type = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      if (data) onEvent(type, JSON.parse(data));
+    }
+  }
+}
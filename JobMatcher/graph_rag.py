@@ -0,0 +1,98 @@
+# graph_rag.py
+"""
+Context for single-shot answering (agent_chat mode "rag"): the entities named
+in the question are found through the label index, their 1-hop ego graphs and
+the skill overlaps between them are pulled, and the result is serialized as
+compact JSON under a token budget, so the answer takes exactly one LLM call.
+"""
+import os
+import re
+from typing import Any, Dict, List
+
+from nx_graph_store import (
+    node_labels, nodes_by_label, ego_graph, skill_overlap_batch,
+    top_candidates_for_job, top_jobs_for_candidate,
+)
+from graph_tools import get_KG, fit_json, NODE_ID
+
+RAG_TOKEN_BUDGET = int(os.getenv("KG_RAG_TOKEN_BUDGET", "3000"))
+RAG_MAX_ENTITIES = 5
+RAG_EGO_NODES = 40
+RAG_RANK_K = 5
+_MAX_SPAN = 4  # words per label looked up
+
+_WORD = re.compile(r"[\w+#.\-]+")
+_STOP = frozenset(
+    "a an and are as at be best by can candidate candidates do does for from has have how i in is it job jobs "
+    "me my of on or should skill skills tell than that the their them there these they this to top was we what "
+    "which who whom why will with would you your".split()
+)
+
+def find_mentions(G, query: str, limit: int = RAG_MAX_ENTITIES) -> List[str]:
+    """
+    Node ids mentioned in the question: explicit ids (cand:..., job:...) first,
+    then word spans equal to a node label, longest spans first, each word used once.
+    All spans are looked up in one call (nodes_by_label).
+    """
+    ids = list(dict.fromkeys(i.rstrip("?.!;:") for i in NODE_ID.findall(query)))
+    found = [i for i, label in node_labels(G, ids).items() if label is not None]
+    words = [w.strip(".") for w in _WORD.findall(query)]
+    spans = []
+    for n in range(min(_MAX_SPAN, len(words)), 0, -1):
+        for start in range(len(words) - n + 1):
+            span = words[start:start + n]
+            if all(w.lower() in _STOP for w in span) or ":" in "".join(span):
+                continue
+            spans.append((start, n, " ".join(span)))
+    hits_of = nodes_by_label(G, [text for _, _, text in spans]) if spans else {}
+    used = [False] * len(words)
+    for start, n, text in spans:
+        if len(found) >= limit:
+            break
+        if any(used[start:start + n]):
+            continue
+        hits = hits_of.get(text, [])
+        if 0 < len(hits) <= 3:  # more is a generic word (e.g. a common role title)
+            found += [h for h in hits if h not in found]
+            used[start:start + n] = [True] * n
+    return found[:limit]
+
+def graph_context(query: str, budget: int = None) -> str:
+    """Compact JSON context for the question from the current (pinned) KG version."""
+    G = get_KG()
+    if G is None:
+        return fit_json({"entities": []}, [])
+    entities = find_mentions(G, query)
+    nodes: Dict[str, List[Any]] = {}
+    edges: Dict[tuple, None] = {}
+    for e in entities:
+        ego = ego_graph(G, e, hops=1, max_nodes=RAG_EGO_NODES)
+        for n in ego["nodes"]:
+            nodes.setdefault(n["id"], [n["id"], n["type"], n["label"]])
+        for u, rel, v in ego["edges"]:
+            edges[(u, rel, v)] = None
+    types = {e: nodes[e][1] for e in entities if e in nodes}
+    cands = [e for e in entities if types.get(e) == "candidate"]
+    jobs = [e for e in entities if types.get(e) == "job"]
+
+    payload: Dict[str, Any] = {
+        "entities": [nodes[e] for e in entities if e in nodes],
+        "node_columns": ["id", "type", "label"],
+        "nodes": [row for nid, row in nodes.items() if nid not in types],
+        "edges": [list(e) for e in edges],
+    }
+    if cands and jobs:
+        rows = skill_overlap_batch(G, [(c, j) for c in cands for j in jobs])
+        payload["overlap_columns"] = ["candidate_id", "job_id", "overlap", "missing", "score"]
+        payload["overlaps"] = [[r["candidate_id"], r["job_id"], r["overlap"], r["missing"], round(r["jaccard"], 3)]
+                               for r in rows]
+    elif jobs:
+        payload["top_candidates"] = {
+            j: [[r["candidate_id"], r["overlap"], round(r["score"], 3)] for r in top_candidates_for_job(G, j, RAG_RANK_K)]
+            for j in jobs}
+    elif cands:
+        payload["top_jobs"] = {
+            c: [[r["job_id"], r["overlap"], round(r["score"], 3)] for r in top_jobs_for_candidate(G, c, RAG_RANK_K)]
+            for c in cands}
+    # over budget, the tail of the longer of edges / nodes goes first; entities and overlaps are kept
+    return fit_json(payload, [payload["edges"], payload["nodes"]], budget or RAG_TOKEN_BUDGET)
@@ -0,0 +1,159 @@
+# intent_router.py
+"""
+Fast path in front of the agent: template-like questions ("skills of X",
+"what does job Y require", "overlap between X and Y", "top candidates for Y")
+are recognized with patterns, their entities resolved through the label
+index, and answered straight from nx_graph_store, with no LLM call.
+Anything else, or a name that does not resolve to exactly one node, returns
+None and goes to the agent.
+"""
+import re
+from typing import Callable, List, Optional, Tuple
+
+from nx_graph_store import (
+    find_nodes, node_labels, targets_of, skill_overlap,
+    top_candidates_for_job, top_jobs_for_candidate, skills_of,
+)
+from graph_tools import get_KG
+
+_ID = re.compile(r"^[A-Za-z_][\w\-]*:\S+$")
+_ARTICLE = re.compile(r"^(?:the|a|an)\s+", re.I)
+_POLITE = re.compile(r"^(?:please\s+|can you\s+|could you\s+)?(?:tell me\s+|show me\s+|list\s+|give me\s+)?", re.I)
+
+# ----- entity resolution ------------------------------------------------------
+
+def _variants(text: str, type_: str) -> List[str]:
+    """The name as written, then without a leading/trailing type word ("candidate John", "Data Scientist job")."""
+    text = _ARTICLE.sub("", text.strip().strip("'\"`").strip())
+    bare = text
+    for w in ((type_,) if type_ != "job" else ("job", "position", "role")):
+        bare = re.sub(rf"^{w}\s+|\s+{w}$", "", bare, flags=re.I)
+    bare = bare.strip().strip("'\"`").strip()
+    return [v for v in dict.fromkeys((text, bare)) if v]
+
+def _starts_with_words(label: str, name: str) -> bool:
+    """Whether label begins with the whole words of name ("Ada" -> "Ada Lovelace", not "Adam Smith")."""
+    label, name = " ".join(label.lower().split()), " ".join(name.lower().split())
+    return label.startswith(name) and not label[len(name):len(name) + 1].isalnum()
+
+def resolve(G, text: str, type_: str) -> Optional[str]:
+    """
+    Node id for a name or id of the given type, or None if it is unknown or
+    ambiguous. A name must equal a label, or be the leading whole words of
+    exactly one; anything looser ("Ann" in "Joanne Smith") is left to the agent.
+    """
+    variants = _variants(text, type_)
+    for v in variants:
+        if _ID.match(v):
+            return v if node_labels(G, [v]).get(v) is not None else None
+    for v in variants:
+        hits = [nid for nid, _ in find_nodes(G, type_=type_, label_exact=v)]
+        if hits:
+            return hits[0] if len(hits) == 1 else None  # ambiguous: let the agent ask or disambiguate
+    for v in variants:
+        hits = [nid for nid, data in find_nodes(G, type_=type_, label_prefix=v)
+                if _starts_with_words(data.get("label") or "", v)]
+        if hits:
+            return hits[0] if len(hits) == 1 else None
+    return None
+
+def _name(labels, nid: str) -> str:
+    return f"{labels.get(nid) or nid} ({nid})"
+
+def _skill_names(G, skill_ids: List[str]) -> str:
+    labels = node_labels(G, skill_ids)
+    return ", ".join(sorted(labels.get(s) or s for s in skill_ids)) or "none"
+
+# ----- answers ----------------------------------------------------------------
+
+def _candidate_skills(G, m) -> Optional[str]:
+    cid = resolve(G, m["cand"], "candidate")
+    if cid is None:
+        return None
+    skills = targets_of(G, cid, "has_skill")
+    who = _name(node_labels(G, [cid]), cid)
+    if not skills:
+        return f"{who} has no skills recorded."
+    return f"{who} has {len(skills)} skills: {_skill_names(G, skills)}."
+
+def _job_requirements(G, m) -> Optional[str]:
+    jid = resolve(G, m["job"], "job")
+    if jid is None:
+        return None
+    skills = targets_of(G, jid, "requires_skill")
+    job = _name(node_labels(G, [jid]), jid)
+    if not skills:
+        return f"{job} has no required skills recorded."
+    return f"{job} requires {len(skills)} skills: {_skill_names(G, skills)}."
+
+def _overlap(G, m) -> Optional[str]:
+    cid, jid = resolve(G, m["cand"], "candidate"), resolve(G, m["job"], "job")
+    if cid is None or jid is None:
+        return None
+    o = skill_overlap(G, cid, jid)
+    labels = node_labels(G, [cid, jid])
+    required = len(o["job_required_skills"])
+    return (
+        f"{_name(labels, cid)} has {len(o['overlap'])} of the {required} skills required for "
+        f"{_name(labels, jid)} ({o['jaccard']:.0%}).\n"
+        f"Matching: {_skill_names(G, o['overlap'])}.\n"
+        f"Missing: {_skill_names(G, o['missing'])}."
+    )
+
+def _top_candidates(G, m) -> Optional[str]:
+    jid = resolve(G, m["job"], "job")
+    if jid is None:
+        return None
+    ranked = top_candidates_for_job(G, jid, int(m["k"] or 5))
+    labels = node_labels(G, [jid] + [r["candidate_id"] for r in ranked])
+    if not ranked:
+        return f"No candidate has any of the skills required for {_name(labels, jid)}."
+    required = len(skills_of(G, jid, "requires_skill"))
+    lines = [f"Top candidates for {_name(labels, jid)} ({required} required skills):"]
+    lines += [f"{i}. {_name(labels, r['candidate_id'])}: {r['overlap']}/{required} skills ({r['score']:.0%})"
+              for i, r in enumerate(ranked, 1)]
+    return "\n".join(lines)
+
+def _top_jobs(G, m) -> Optional[str]:
+    cid = resolve(G, m["cand"], "candidate")
+    if cid is None:
+        return None
+    ranked = top_jobs_for_candidate(G, cid, int(m["k"] or 5))
+    labels = node_labels(G, [cid] + [r["job_id"] for r in ranked])
+    if not ranked:
+        return f"{_name(labels, cid)} has none of the skills any job requires."
+    lines = [f"Best matching jobs for {_name(labels, cid)}:"]
+    lines += [f"{i}. {_name(labels, r['job_id'])}: {r['overlap']} matching skills ({r['score']:.0%} of required)"
+              for i, r in enumerate(ranked, 1)]
+    return "\n".join(lines)
+
+# (pattern over the whole question, answer); the first pattern that matches
+# and resolves its entities wins
+_TOP = r"(?:top|best|strongest)(?:\s+(?P<k>\d{1,2}))?"
+INTENTS: List[Tuple[re.Pattern, Callable]] = [(re.compile(p, re.I), fn) for p, fn in [
+    (rf"(?:who are )?(?:the )?{_TOP} (?:candidates|applicants|matches) (?:for|to fill) (?P<job>.+)", _top_candidates),
+    (rf"(?:which|what) (?:are the )?{_TOP} jobs (?:for|fit|suit|match) (?P<cand>.+)", _top_jobs),
+    (rf"(?:the )?{_TOP} (?:jobs|positions|roles) for (?P<cand>.+)", _top_jobs),
+    (r"(?:the )?(?:skill )?overlap between (?P<cand>.+?) and (?P<job>.+)", _overlap),
+    (r"how (?:well )?(?:does|do) (?P<cand>.+?) (?:fit|match|suit) (?P<job>.+)", _overlap),
+    (r"(?:what|which) skills (?:does|do) (?P<cand>.+?) have", _candidate_skills),
+    (r"(?:what are )?(?:the )?skills of (?P<cand>.+)", _candidate_skills),
+    (r"(?:what|which) (?:skills )?(?:does|do) (?P<job>.+?) require", _job_requirements),
+    (r"(?:what are )?(?:the )?(?:required skills|requirements|skills required) (?:of|for) (?P<job>.+)", _job_requirements),
+]]
+
+def route(query: str) -> Optional[str]:
+    """Answer a template-like question from the graph, or None to fall through to the agent."""
+    q = _POLITE.sub("", query.strip()).rstrip(" ?.!")
+    if not q:
+        return None
+    G = get_KG()
+    if G is None:
+        return None
+    for pattern, answer in INTENTS:
+        m = pattern.fullmatch(q)
+        if m is not None:
+            text = answer(G, m.groupdict())
+            if text is not None:
+                return text
+    return None
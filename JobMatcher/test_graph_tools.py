@@ -0,0 +1,533 @@
+# test_graph_tools.py
+# The agent tools, router and RAG context must give the same answers whether the
+# KG is the in-memory MultiDiGraph or the .kgsnap snapshot workers load.
+import copy
+import json
+import multiprocessing
+import os
+import stat
+import threading
+import time
+import pytest
+from graph_tools import set_KG, TOOLS, TYPED_TOOLS
+from nx_graph_store import (
+    build_nx_from_graph, merge_graphs, save_snapshot, load_snapshot, upsert_entity_graph,
+    remove_entity_graph, match_pattern, fork_graph, find_nodes, neighbors_of, sources_of,
+    LoggedGraph, GraphChannel, entity_ids, save_sqlite, SQLiteGraph, filter_nodes_by_prop, CompactGraph,
+    get_index, build_index,
+)
+
+def _corpus():
+    cvs = {
+        "cand:ada": ("Ada Lovelace", ["python", "sql", "statistics"], "company:acme, inc."),
+        "cand:alan": ("Alan Turing", ["python", "cryptography"], "company:acme, inc."),
+        "cand:grace": ("Grace Hopper", ["cobol", "sql"], "company:navy"),
+    }
+    jobs = {
+        "job:data_scientist": ("Data Scientist", ["python", "sql", "statistics", "ml"]),
+        "job:dba": ("Database Admin", ["sql", "cobol"]),
+        "job:engineer, backend": ("Engineer, Backend", ["python", "sql"]),
+    }
+    graphs = {}
+    for cid, (name, skills, company) in cvs.items():
+        nodes = [{"id": cid, "type": "candidate", "label": name, "props": {}},
+                 {"id": company, "type": "company", "label": company.split(":", 1)[1], "props": {}}]
+        nodes += [{"id": f"skill:{s}", "type": "skill", "label": s, "props": {}} for s in skills]
+        edges = [{"source": cid, "relation": "has_skill", "target": f"skill:{s}"} for s in skills]
+        edges.append({"source": cid, "relation": "worked_at", "target": company})
+        if company == "company:acme, inc.":
+            nodes.append({"id": "city:london", "type": "city", "label": "london", "props": {}})
+            edges.append({"source": company, "relation": "located_in", "target": "city:london"})
+        graphs[cid] = {"nodes": nodes, "edges": edges}
+    for jid, (title, skills) in jobs.items():
+        nodes = [{"id": jid, "type": "job", "label": title, "props": {}}]
+        nodes += [{"id": f"skill:{s}", "type": "skill", "label": s, "props": {}} for s in skills]
+        edges = [{"source": jid, "relation": "requires_skill", "target": f"skill:{s}"} for s in skills]
+        graphs[jid] = {"nodes": nodes, "edges": edges}
+    return graphs
+
+CALLS = [
+    ("find_nodes", ("candidate", None), {}),
+    ("find_nodes", (None, "acme"), {}),
+    ("neighbors", ("cand:ada",), {}),
+    ("neighbors", ("cand:ada", 2), {}),
+    ("neighbors", ("company:acme, inc.",), {}),  # canonical ids may contain commas
+    ("neighbors", ("'company:acme, inc.', hops=2",), {}),
+    ("skill_overlap", ("cand:ada", "job:data_scientist"), {}),
+    ("rank_candidates_for_job", ("job:data_scientist",), {"k": 2}),
+    ("rank_jobs_for_candidate", ("cand:grace",), {}),
+    ("bulk_skill_overlap", (["cand:ada", "cand:grace"], ["job:data_scientist", "job:dba"]), {}),
+    ("rank_candidates_for_job", ("'job:engineer, backend', k=1",), {}),
+    ("match_pattern", ("candidate-[worked_at]->company<-[worked_at]-candidate",), {}),
+]
+
+QUESTIONS = [
+    "skills of Ada Lovelace",
+    "what does the Data Scientist job require?",
+    "overlap between Grace Hopper and Database Admin",
+    "top 2 candidates for Data Scientist",
+]
+
+@pytest.fixture(scope="module")
+def graphs(tmp_path_factory):
+    KG = merge_graphs(build_nx_from_graph(g)[0] for g in _corpus().values())
+    path = str(tmp_path_factory.mktemp("kg") / "kg.kgsnap")
+    save_snapshot(KG, path)
+    return KG, load_snapshot(path)
+
+def _answers(G):
+    from intent_router import route
+    from graph_rag import graph_context
+    set_KG(G)
+    tools = [json.loads(TOOLS[name](*args, **kw)) for name, args, kw in CALLS]
+    routed = [route(q) for q in QUESTIONS]
+    context = json.loads(graph_context("Is Ada Lovelace a fit for the Data Scientist job?"))
+    return tools, routed, context
+
+def test_tools_on_snapshot_match_networkx(graphs):
+    KG, snap = graphs
+    expected = _answers(KG)
+    assert _answers(snap) == expected
+    tools, routed, context = expected
+    assert all(routed), routed
+    assert context["overlaps"]
+    assert tools[4]["neighbors"] == {"located_in": ["city:london"]}
+    assert tools[-2]["job_id"] == "job:engineer, backend" and len(tools[-2]["results"]) == 1
+    assert tools[5]["center"] == "company:acme, inc." and tools[5]["hops"] == 2
+
+def test_typed_tools_take_arguments_as_they_are(graphs):
+    KG, _ = graphs
+    set_KG(KG)
+    # no comma splitting or quote stripping on typed arguments
+    typed = json.loads(TYPED_TOOLS["rank_candidates_for_job"](job_id="job:engineer, backend", k=1))
+    assert typed == json.loads(TOOLS["rank_candidates_for_job"]("'job:engineer, backend', 1"))
+    typed = json.loads(TYPED_TOOLS["neighbors"](node_id="company:acme, inc.", hops=1))
+    assert typed["neighbors"] == {"located_in": ["city:london"]}
+    assert json.loads(TYPED_TOOLS["skill_overlap"](candidate_id="'cand:ada'", job_id="job:dba"))["candidate_skills"] == []
+
+def test_upsert_indexes_undeclared_endpoints():
+    graphs = _corpus()
+    graphs["cand:ada"]["edges"].append({"source": "cand:ada", "relation": "mentions", "target": "topic:engines"})
+    merged = merge_graphs(build_nx_from_graph(g)[0] for g in graphs.values())
+    KG = merge_graphs([])
+    for entity_id, g in graphs.items():
+        upsert_entity_graph(KG, entity_id, g)
+    rows = match_pattern(KG, "candidate-[mentions]->*")["rows"]
+    assert rows == match_pattern(merged, "candidate-[mentions]->*")["rows"] == [["cand:ada", "topic:engines"]]
+    remove_entity_graph(KG, "cand:ada")
+    assert "topic:engines" not in KG and match_pattern(KG, "candidate-[mentions]->*")["rows"] == []
+
+def test_ego_graph_stops_at_max_nodes(graphs):
+    from nx_graph_store import ego_graph
+    for G in graphs:
+        ego = ego_graph(G, "skill:sql", hops=2, max_nodes=3)
+        ids = [n["id"] for n in ego["nodes"]]
+        assert ego["truncated"] and len(ids) == 3 and ids[0] == "skill:sql"
+        # exactly the edges among the kept nodes
+        KG = graphs[0]
+        induced = sorted([u, d["relation"], v] for u, v, d in KG.subgraph(ids).edges(data=True))
+        assert sorted(ego["edges"]) == induced
+        assert not ego_graph(G, "skill:sql", hops=2, max_nodes=None)["truncated"]
+
+def _dump(KG):
+    """Everything a reader can see of KG: data, indexed lookups and the ledger's refs."""
+    enc = lambda d: json.dumps(d, sort_keys=True, default=sorted)
+    ledger = KG.graph["ledger"]
+    return (
+        sorted((n, enc(d)) for n, d in KG.nodes(data=True)),
+        sorted((u, v, k, enc(d)) for u, v, k, d in KG.edges(keys=True, data=True)),
+        {n: (neighbors_of(KG, n), sources_of(KG, n, "has_skill")) for n in KG},
+        sorted(nid for nid, _ in find_nodes(KG, label_contains="a")),
+        enc({str(k): list(v) for k, v in {**ledger.node_refs, **ledger.edge_refs}.items()}),
+    )
+
+def test_fork_shares_until_written():
+    graphs = _corpus()
+    ada = copy.deepcopy(graphs["cand:ada"])
+    ada["nodes"][0]["props"] = {"years": 3}
+    ada["nodes"].append({"id": "skill:ml", "type": "skill", "label": "ml", "props": {}})
+    ada["edges"].append({"source": "cand:ada", "relation": "has_skill", "target": "skill:ml"})
+    edits = [("upsert", "cand:new", {
+        # merges into skill:sql, which the parent's entities share
+        "nodes": [{"id": "cand:new", "type": "candidate", "label": "New", "props": {}},
+                  {"id": "skill:sql", "type": "skill", "label": "sql", "props": {"level": "expert"}}],
+        "edges": [{"source": "cand:new", "relation": "has_skill", "target": "skill:sql"}]}),
+        ("upsert", "cand:ada", ada), ("remove", "cand:grace", None)]
+
+    def apply(KG, ops):
+        for op, eid, g in ops:
+            upsert_entity_graph(KG, eid, g) if op == "upsert" else remove_entity_graph(KG, eid)
+        return KG
+
+    base = [("upsert", eid, g) for eid, g in graphs.items()]
+    KG = apply(merge_graphs([]), base)
+    before = _dump(KG)
+    H = apply(fork_graph(KG), edits)
+    assert _dump(KG) == before
+    assert _dump(H) == _dump(apply(merge_graphs([]), base + edits))
+    # the parent may be written too; the fork keeps what it had
+    after = _dump(H)
+    apply(KG, [("remove", "cand:ada", None), ("upsert", "cand:grace", ada)])
+    assert _dump(H) == after
+
+def test_export_soon_batches_changes(tmp_path):
+    export = str(tmp_path / "kg.kgsnap")
+    log = LoggedGraph(str(tmp_path / "kg.gpickle"), export_path=export, export_delay=0.1)
+    try:
+        for entity_id, g in _corpus().items():
+            log.upsert_entity_graph(entity_id, g)
+            log.snapshot()
+            log.export_soon()
+        assert GraphChannel(export).version() == 0
+        time.sleep(0.5)
+        version, snap = GraphChannel(export).attach()
+        assert version == 1 and snap.number_of_nodes() == log.graph().number_of_nodes()
+        log.upsert_entity_graph("cand:new", {"nodes": [{"id": "cand:new", "type": "candidate", "label": "New"}]})
+        log.snapshot()
+        log.export_soon()
+    finally:
+        log.close()  # flushes the pending export
+    assert GraphChannel(export).version() == 2
+
+def _write_entities(path, worker, n):
+    log = LoggedGraph(path, compact_every=3)
+    for i in range(n):
+        cid = f"cand:w{worker}_{i}"
+        log.upsert_entity_graph(cid, {"nodes": [{"id": cid, "type": "candidate", "label": cid}],
+                                      "edges": [{"source": cid, "relation": "has_skill", "target": "skill:sql"}]})
+    log.close()
+
+def test_logged_graph_writers_share_the_log(tmp_path):
+    path = str(tmp_path / "kg.gpickle")
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_write_entities, args=(path, w, 10)) for w in range(3)]
+    threads = [threading.Thread(target=_write_entities, args=(path, w, 10)) for w in range(3, 5)]
+    for t in procs + threads:
+        t.start()
+    for t in procs + threads:
+        t.join()
+    assert all(p.exitcode == 0 for p in procs)
+    log = LoggedGraph(path)
+    expected = {f"cand:w{w}_{i}" for w in range(5) for i in range(10)}
+    assert set(entity_ids(log.graph())) == expected
+    assert sorted(sources_of(log.graph(), "skill:sql", "has_skill")) == sorted(expected)
+    log.close()
+
+@pytest.mark.parametrize("backend", ["networkx", "snapshot"])
+def test_find_nodes_cursor_is_tied_to_the_kg_version(graphs, backend):
+    KG, snap = graphs if backend == "networkx" else graphs[::-1]
+    set_KG(KG)
+    pages, cursor = [], None
+    while cursor is not None or not pages:
+        page = json.loads(TYPED_TOOLS["find_nodes"](label_contains="a", limit=2, cursor=cursor))
+        pages.append([r["id"] for r in page["results"]])
+        cursor = page.get("next_cursor")
+    # same order on every backend: rank by label match, then by id
+    assert pages == [["company:acme, inc.", "cand:alan"], ["cand:ada", "job:dba"],
+                     ["company:navy", "skill:statistics"], ["cand:grace", "skill:cryptography"],
+                     ["job:data_scientist", "job:engineer, backend"]]
+    first = json.loads(TYPED_TOOLS["find_nodes"](type_="skill", limit=2))
+    second = json.loads(TYPED_TOOLS["find_nodes"](type_="skill", limit=2, cursor=first["next_cursor"]))
+    assert [r["id"] for r in first["results"] + second["results"]] == ["skill:cobol", "skill:cryptography",
+                                                                       "skill:ml", "skill:python"]
+    set_KG(snap)  # a new version: the old offsets may not line up any more
+    assert "error" in json.loads(TYPED_TOOLS["find_nodes"](type_="skill", limit=2, cursor=first["next_cursor"]))
+
+def test_graph_service_stays_local(tmp_path):
+    from graph_service import GraphService, GraphClient, make_server
+    service = GraphService(str(tmp_path / "kg.gpickle"))
+    path = tmp_path / "kg.sock"
+    path.write_text("not a socket")
+    with pytest.raises(FileExistsError):
+        make_server(f"unix:{path}", service)
+    assert path.read_text() == "not a socket"
+    path.unlink()
+    server = make_server(f"unix:{path}", service)
+    try:
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        assert GraphClient(f"unix:{path}").number_of_nodes() == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+    make_server(f"unix:{path}", service).server_close()  # a stale socket is replaced
+    with pytest.raises(ValueError):
+        make_server("tcp:0.0.0.0:0", service)
+    make_server("tcp:127.0.0.1:0", service).server_close()
+    service.log.close()
+
+def test_sqlite_filter_by_prop_matches_networkx(tmp_path):
+    graphs = _corpus()
+    graphs["job:dba"]["nodes"][0]["props"] = {"level": "mid", "tags": ["sql", "ops"], "salary": {"min": 1, "max": 2}}
+    graphs["job:data_scientist"]["nodes"][0]["props"] = {"level": "mid", "tags": ["ops", "sql"], "salary": {"max": 2, "min": 1}}
+    KG = merge_graphs(build_nx_from_graph(g)[0] for g in graphs.values())
+    save_sqlite(KG, str(tmp_path / "kg.sqlite"))
+    db = SQLiteGraph(str(tmp_path / "kg.sqlite"))
+    for key, value in [("level", "mid"), ("tags", ["sql", "ops"]), ("tags", ("sql", "ops")),
+                       ("salary", {"min": 1, "max": 2}), ("tags", "sql"), ("salary", 1)]:
+        expected = filter_nodes_by_prop(KG, key, value, type_="job")
+        assert filter_nodes_by_prop(db, key, value, type_="job") == expected, (key, value)
+    assert filter_nodes_by_prop(db, "tags", ["sql", "ops"]) == ["job:dba"]
+
+def test_malformed_entity_graph_is_not_logged(tmp_path):
+    path = str(tmp_path / "kg.gpickle")
+    graphs = _corpus()
+    log = LoggedGraph(path)
+    log.sync({"cand:ada": graphs["cand:ada"]})
+    with pytest.raises(ValueError):
+        log.upsert_entity_graph("cand:ada", {"nodes": ["oops"]})
+    assert log.sync({"cand:ada": {"nodes": ["oops"]}, "cand:alan": graphs["cand:alan"]})
+    assert set(entity_ids(log.graph())) == {"cand:ada", "cand:alan"}  # ada's previous graph stays
+    # a bad record an older writer did log is set aside on load instead of failing it
+    log._append({"op": "upsert", "entity": "cand:bad", "graph": {"nodes": ["oops"]}})
+    log.close()
+    log = LoggedGraph(path)
+    assert set(entity_ids(log.graph())) == {"cand:ada", "cand:alan"}
+    assert log.upsert_entity_graph("cand:grace", graphs["cand:grace"])
+    log.close()
+    assert (tmp_path / "kg.wal.rejected").read_bytes().count(b"cand:bad") == 1
+    assert "cand:grace" in entity_ids(LoggedGraph(path).graph())
+
+def test_find_nodes_same_on_every_backend(graphs, tmp_path):
+    KG, snap = graphs
+    save_sqlite(KG, str(tmp_path / "kg.sqlite"))
+    built = CompactGraph.from_networkx(KG)  # no persisted label index: built on first use
+    queries = [{"label_contains": "a"}, {"label_contains": "acme, "}, {"type_": "skill", "label_contains": "sql"},
+               {"label_prefix": "da"}, {"label_exact": "python"}, {"type_": "job", "label_prefix": "d"},
+               {"label_contains": "zzz"}, {"type_": "nope", "label_contains": "a"}]
+    for q in queries:
+        expected = [nid for nid, _ in find_nodes(KG, **q)]
+        for G in (snap, built, SQLiteGraph(str(tmp_path / "kg.sqlite"))):
+            assert sorted(nid for nid, _ in find_nodes(G, **q)) == sorted(expected), (G, q)
+        assert [nid for nid, _ in find_nodes(snap, **q)] == expected
+    assert snap._label_index is not None and type(snap.label_index()).__name__ == "SnapshotLabelIndex"
+
+def test_match_pattern_stops_at_its_step_budget(graphs):
+    pattern = "candidate-[has_skill]->skill<-[has_skill]-candidate-[has_skill]->skill<-[has_skill]-candidate-[worked_at]->*"
+    for G in graphs:
+        full = match_pattern(G, pattern, limit=1000)
+        assert not full["truncated"] and "error" not in full and full["rows"]
+        cut = match_pattern(G, pattern, limit=1000, max_steps=10)
+        assert cut["truncated"] and "error" in cut and len(cut["rows"]) < len(full["rows"])
+
+def test_find_mentions_looks_labels_up_in_one_call(graphs, tmp_path, monkeypatch):
+    import graph_rag
+    KG, snap = graphs
+    save_sqlite(KG, str(tmp_path / "kg.sqlite"))
+    calls = []
+    lookup = graph_rag.nodes_by_label
+    monkeypatch.setattr(graph_rag, "nodes_by_label", lambda G, labels: calls.append(labels) or lookup(G, labels))
+    question = "Is Ada Lovelace or cand:grace a fit for the Data Scientist job, knowing SQL?"
+    for G in (KG, snap, SQLiteGraph(str(tmp_path / "kg.sqlite"))):
+        assert graph_rag.find_mentions(G, question) == ["cand:grace", "cand:ada", "job:data_scientist", "skill:sql"], G
+    assert len(calls) == 3
+
+def test_router_leaves_loose_name_matches_to_the_agent():
+    from intent_router import route
+    graphs = _corpus()
+    graphs["cand:joanne"] = {"nodes": [{"id": "cand:joanne", "type": "candidate", "label": "Joanne Smith", "props": {}}],
+                             "edges": []}
+    set_KG(merge_graphs(build_nx_from_graph(g)[0] for g in graphs.values()))
+    assert route("skills of Ada").startswith("Ada Lovelace (cand:ada) has 3 skills")
+    for question in ("skills of Ann", "skills of Lovelace", "skills of Ad", "top candidates for Scientist"):
+        assert route(question) is None, question
+
+@pytest.mark.parametrize("mode", ["react", "tools"])
+def test_streamed_tool_steps_preview_their_arguments(graphs, mode):
+    import asyncio
+    from agent_chat import _build_agent_executor, astream_turn
+    from bench_agent import ScriptedLLM, ScriptedChatModel, react_script, tools_script
+    KG, _ = graphs
+    set_KG(KG)
+    top = ["cand:ada", "cand:alan"]
+    llm = ScriptedLLM(script=react_script(top)) if mode == "react" else ScriptedChatModel(script=tools_script(top))
+    executor = _build_agent_executor(llm, mode)
+    executor.verbose = False
+
+    async def turn():
+        return [ev async for ev in astream_turn("Who fits the Data Scientist job?", mode, executor)]
+
+    events = asyncio.run(turn())
+    starts = [(ev["tool"], ev["input"]) for ev in events if ev["type"] == "tool_start"]
+    if mode == "react":
+        assert starts[2:] == [("rank_candidates_for_job", "'job:data_scientist', 3"),
+                              ("skill_overlap", "'cand:ada', 'job:data_scientist'"),
+                              ("skill_overlap", "'cand:alan', 'job:data_scientist'")]
+    else:
+        assert starts[1:] == [("rank_candidates_for_job", '{"job_id": "job:data_scientist", "k": 3}'),
+                              ("skill_overlap", '{"candidate_id": "cand:ada", "job_id": "job:data_scientist"}'),
+                              ("skill_overlap", '{"candidate_id": "cand:alan", "job_id": "job:data_scientist"}')]
+    assert [ev["type"] for ev in events[-2:]] == ["token", "done"] and events[-1]["answer"] == "cand:ada, cand:alan"
+    assert sum(ev["type"] == "tool_end" for ev in events) == len(starts)
+
+def test_sqlite_version_keeps_its_file_after_publish(graphs, tmp_path):
+    KG, _ = graphs
+    channel = GraphChannel(str(tmp_path / "kg.sqlite"))
+    channel.publish(KG)
+    _, old = channel.attach()
+    channel.publish(merge_graphs(build_nx_from_graph(g)[0] for eid, g in _corpus().items() if eid != "cand:ada"))
+    seen = []
+    reader = threading.Thread(target=lambda: seen.append(("cand:ada" in old, old.number_of_nodes())))
+    reader.start()
+    reader.join()
+    assert seen == [(True, KG.number_of_nodes())]
+    assert "cand:ada" not in channel.attach()[1]
+
+def test_bulk_overlap_reports_dropped_ids_and_rank_reads_required_skills():
+    from intent_router import route
+    graphs = _corpus()
+    graphs["job:pilot"] = {"nodes": [{"id": "job:pilot", "type": "job", "label": "Pilot", "props": {}},
+                                     {"id": "skill:flying", "type": "skill", "label": "flying", "props": {}}],
+                           "edges": [{"source": "job:pilot", "relation": "requires_skill", "target": "skill:flying"}]}
+    set_KG(merge_graphs(build_nx_from_graph(g)[0] for g in graphs.values()))
+    cands = ["cand:ada"] + [f"cand:x{i}" for i in range(249)]
+    bulk = json.loads(TYPED_TOOLS["bulk_skill_overlap"](candidate_ids=cands, job_ids=["job:dba"] * 52, k=1))
+    assert bulk["truncated"] and bulk["dropped"] == {"candidate_ids": 50, "job_ids": 2} and "error" in bulk
+    assert bulk["pairs"] == 200 * 50
+    bulk = json.loads(TYPED_TOOLS["bulk_skill_overlap"](candidate_ids=["cand:ada"], job_ids=["job:dba"]))
+    assert "dropped" not in bulk and "truncated" not in bulk
+    ranked = json.loads(TYPED_TOOLS["rank_candidates_for_job"](job_id="job:pilot"))
+    assert ranked["required_skills"] == 1 and ranked["results"] == []
+    assert json.loads(TYPED_TOOLS["rank_candidates_for_job"](job_id="job:data_scientist"))["required_skills"] == 4
+    assert "(4 required skills)" in route("top candidates for Data Scientist")
+
+def _index_state(idx):
+    """Contents of a KGIndex, without the empty postings removals leave behind."""
+    tables = {name: {k: set(v) for k, v in getattr(idx, name).items() if v}
+              for name in ("out", "inc", "out_rels", "in_rels", "by_type", "by_label", "grams")}
+    return tables, dict(idx.types), dict(idx.labels)
+
+def test_upsert_index_equals_full_rebuild():
+    graphs = _corpus()
+    graphs["cand:ada"]["edges"].append({"source": "cand:ada", "relation": "mentions", "target": "topic:engines"})
+    graphs["job:dba"]["edges"].append({"source": "team:ops", "relation": "hires_for", "target": "job:dba"})
+    for g in graphs.values():
+        G = build_nx_from_graph(g)[0]
+        assert _index_state(get_index(G)) == _index_state(build_index(G))
+    KG = merge_graphs([])
+    for entity_id, g in _corpus().items():
+        upsert_entity_graph(KG, entity_id, g)
+    for entity_id, g in graphs.items():  # re-upsert, now with the undeclared endpoints
+        upsert_entity_graph(KG, entity_id, g)
+    remove_entity_graph(KG, "cand:grace")
+    del graphs["cand:grace"]
+    merged = merge_graphs(build_nx_from_graph(g)[0] for g in graphs.values())
+    assert _index_state(get_index(KG)) == _index_state(get_index(merged)) == _index_state(build_index(merged))
+    assert _index_state(get_index(KG)) == _index_state(build_index(KG))
+
+def test_pinned_version_survives_hot_reload(graphs, tmp_path, monkeypatch):
+    import graph_tools
+    KG, _ = graphs
+    path = str(tmp_path / "kg.kgsnap")
+    for name, value in (("KG_RELOAD_INTERVAL", 0), ("KG_SERVICE", ""), ("KG_BACKEND", "kgsnap"),
+                        ("EXPORT_PATH", path), ("_channel", GraphChannel(path))):
+        monkeypatch.setattr(graph_tools, name, value)
+    graph_tools._channel.publish(KG)
+    set_KG(KG)
+    outside = []
+    read = lambda: outside.append("cand:ada" in graph_tools.get_KG())  # threads start unpinned
+    with graph_tools.pinned_KG() as pinned:
+        before = TYPED_TOOLS["neighbors"](node_id="cand:ada")
+        graph_tools._channel.publish(
+            merge_graphs(build_nx_from_graph(g)[0] for eid, g in _corpus().items() if eid != "cand:ada"))
+        graph_tools.reload_KG_if_changed()
+        assert graph_tools.current_version().version > pinned.version
+        assert TYPED_TOOLS["neighbors"](node_id="cand:ada") == before
+        reader = threading.Thread(target=read)
+        reader.start()
+        reader.join()
+    assert outside == [False] and "cand:ada" not in graph_tools.get_KG()
+
+def test_sqlite_and_snapshot_round_trip(graphs, tmp_path):
+    KG, _ = graphs
+    save_sqlite(KG, str(tmp_path / "kg.sqlite"))
+    db = SQLiteGraph(str(tmp_path / "kg.sqlite"))
+    enc = lambda d: json.dumps(d, sort_keys=True, default=sorted)
+    back = db.to_networkx()
+    assert sorted((n, enc(d)) for n, d in back.nodes(data=True)) == sorted((n, enc(d)) for n, d in KG.nodes(data=True))
+    assert sorted((u, v, k, enc(d)) for u, v, k, d in back.edges(keys=True, data=True)) == \
+        sorted((u, v, k, enc(d)) for u, v, k, d in KG.edges(keys=True, data=True))
+    save_snapshot(db, str(tmp_path / "kg.kgsnap"))  # SQLite -> .kgsnap -> SQLite
+    save_sqlite(load_snapshot(str(tmp_path / "kg.kgsnap")), str(tmp_path / "again.sqlite"))
+    expected = _answers(KG)
+    for G in (db, load_snapshot(str(tmp_path / "kg.kgsnap")), SQLiteGraph(str(tmp_path / "again.sqlite"))):
+        assert _answers(G) == expected, G
+
+@pytest.mark.parametrize("pattern, rows", [
+    ("candidate-[has_skill]->skill{^sq}<-[requires_skill]-job{=database admin}",
+     [["cand:ada", "skill:sql", "job:dba"], ["cand:grace", "skill:sql", "job:dba"]]),
+    ('"job:dba"-[requires_skill]->skill<-[has_skill]-candidate',
+     [["job:dba", "skill:cobol", "cand:grace"], ["job:dba", "skill:sql", "cand:ada"], ["job:dba", "skill:sql", "cand:grace"]]),
+    ("candidate{grace}-[has_skill|worked_at]->*",
+     [["cand:grace", "company:navy"], ["cand:grace", "skill:cobol"], ["cand:grace", "skill:sql"]]),
+    ("company<-[worked_at]-candidate-[has_skill]->skill{crypto}", [["company:acme, inc.", "cand:alan", "skill:cryptography"]]),
+    ("candidate<-[has_skill]-skill", []),
+])
+def test_match_pattern_on_every_backend(graphs, tmp_path, pattern, rows):
+    KG, snap = graphs
+    save_sqlite(KG, str(tmp_path / "kg.sqlite"))
+    results = [match_pattern(G, pattern) for G in (KG, snap, SQLiteGraph(str(tmp_path / "kg.sqlite")))]
+    assert sorted(results[0]["rows"]) == rows and not results[0]["truncated"]
+    assert results[1] == results[2] == results[0]
+
+def test_match_pattern_tool_reports_bad_patterns(graphs):
+    set_KG(graphs[0])
+    for pattern, where in (("candidate-[x]-skill", "-[rel]-> or <-[rel]- at position 9"),
+                           ("-[x]->skill", "a node at position 0"), ("candidate-[x]->", "a node at position 15")):
+        assert where in json.loads(TYPED_TOOLS["match_pattern"](pattern=pattern))["error"]
+
+def _scripted_executor(mode, top):
+    from agent_chat import _build_agent_executor
+    from bench_agent import ScriptedLLM, ScriptedChatModel, react_script, tools_script
+    llm = ScriptedLLM(script=react_script(top)) if mode == "react" else ScriptedChatModel(script=tools_script(top))
+    executor = _build_agent_executor(llm, mode)
+    executor.verbose = False
+    return executor
+
+@pytest.mark.parametrize("mode", ["react", "tools"])
+def test_agent_modes_call_the_graph_tools(graphs, monkeypatch, mode):
+    from agent_chat import run_agent
+    set_KG(graphs[0])
+    calls = []
+    table = TOOLS if mode == "react" else TYPED_TOOLS
+    for name, fn in list(table.items()):
+        monkeypatch.setitem(table, name, lambda *a, _fn=fn, _name=name, **kw: calls.append(
+            (_name, a or kw, json.loads(_fn(*a, **kw)))) or json.dumps(calls[-1][2]))
+    top = ["cand:ada", "cand:alan"]
+    assert run_agent(_scripted_executor(mode, top), "Who fits the Data Scientist job?", mode) == "cand:ada, cand:alan"
+    assert [name for name, _, _ in calls][-3:] == ["rank_candidates_for_job", "skill_overlap", "skill_overlap"]
+    assert not [out for _, _, out in calls if "error" in out]
+    ranked = calls[-3][2]
+    assert ranked["job_id"] == "job:data_scientist" and [r[0] for r in ranked["results"]] == ["cand:ada", "cand:alan", "cand:grace"]
+    assert [out["overlap"] for _, _, out in calls[-2:]] == [["skill:python", "skill:sql", "skill:statistics"],
+                                                            ["skill:python"]]
+    if mode == "tools":  # typed arguments arrive as the model wrote them
+        assert calls[-2][1] == {"candidate_id": "cand:ada", "job_id": "job:data_scientist"}
+
+def test_graph_context_keeps_entities_under_budget(graphs):
+    from graph_rag import graph_context
+    set_KG(graphs[0])
+    question = "Is Ada Lovelace a fit for the Data Scientist job?"
+    full = json.loads(graph_context(question))
+    assert [e[0] for e in full["entities"]] == ["cand:ada", "job:data_scientist"] and "truncated" not in full
+    assert full["overlaps"] == [["cand:ada", "job:data_scientist", 3, 1, 0.75]]
+    small = json.loads(graph_context(question, budget=60))
+    assert small["truncated"] and small["entities"] == full["entities"] and small["overlaps"] == full["overlaps"]
+    assert len(small["edges"]) < len(full["edges"])
+    assert json.loads(graph_context("What is the weather like?"))["entities"] == []
+
+def test_stream_chat_event_sequence(graphs, monkeypatch):
+    import agent_chat
+    set_KG(graphs[0])
+    routed = list(agent_chat.stream_chat("skills of Ada Lovelace", "tools"))
+    assert [ev["type"] for ev in routed] == ["token", "done"] and routed[1]["answer"] == routed[0]["text"]
+    monkeypatch.setattr(agent_chat, "_agent_executors", {"tools": _scripted_executor("tools", ["cand:ada"])})
+    events = list(agent_chat.stream_chat("Who fits the Data Scientist job?", "tools"))
+    assert [ev["type"] for ev in events] == ["tool_start", "tool_end"] * 3 + ["token", "done"]
+    assert [ev["tool"] for ev in events[:6:2]] == ["find_nodes", "rank_candidates_for_job", "skill_overlap"]
+    assert events[-1] == {"type": "done", "answer": "cand:ada"}
+    monkeypatch.setattr(agent_chat, "_agent_executors", {})
+    monkeypatch.setattr(agent_chat, "_llm", None)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    errors = list(agent_chat.stream_chat("Who fits the Data Scientist job?", "tools"))
+    assert [ev["type"] for ev in errors] == ["error"] and "OPENAI_API_KEY" in errors[0]["message"]